@@ -0,0 +1,131 @@
+import argparse
+import gc
+import json
+import os
+import resource
+import inputCache
+import profiling
+import rosterIndex
+import scoringRules
+from scoreWeeks import scoreUnits, seasonUnits
+from localStorage import saveToFiles, resetStore, storeRosterBulk, acquireWriter
+
+# seasons already backfilled. Weeks of an interrupted season don't need tracking here, the ones that
+# were written kept their input fingerprints and are skipped when the season is picked up again
+CHECKPOINT_FILE = os.path.join("local_data", "backfill_checkpoint.json")
+
+# first season nflverse has play-by-play for
+FIRST_SEASON = 1999
+
+def currentMemory() -> int:
+    """Resident memory of this process in bytes"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # no procfs, fall back to the peak so far (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if peak > 1 << 32 else peak * 1024
+
+def loadCheckpoint():
+    if not os.path.exists(CHECKPOINT_FILE):
+        return {"finished": []}
+    with open(CHECKPOINT_FILE, 'r') as f:
+        return json.load(f)
+
+def saveCheckpoint(checkpoint):
+    """Write the checkpoint atomically"""
+    os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
+    tmpPath = CHECKPOINT_FILE + ".tmp"
+    with open(tmpPath, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmpPath, CHECKPOINT_FILE)
+
+class MemoryCeiling:
+    """Keeps the process under a memory ceiling by writing out and dropping the in-memory store"""
+
+    def __init__(self, limitBytes: int):
+        self.limitBytes = limitBytes
+        self.peak = 0
+
+    def check(self) -> bool:
+        """Whether memory is over the ceiling (also tracks the peak seen)"""
+        memory = currentMemory()
+        self.peak = max(self.peak, memory)
+        return memory > self.limitBytes
+
+def flushStore():
+    """Write everything scored so far in bulk and forget it, keeping only what the next weeks need"""
+    saveToFiles()
+    resetStore()
+    gc.collect()
+
+def backfillUnits(year, ceiling, refresh=False):
+    """Stream one season's weeks, writing out and dropping the store whenever memory goes over the ceiling"""
+    for unit in seasonUnits(year, None, refresh):
+        if ceiling.check():
+            flushStore()
+            if ceiling.check():
+                raise MemoryError(f"still above the {ceiling.limitBytes >> 20} MB ceiling in {year} week {unit[1]} "
+                                  "after flushing, rerun with a higher --memory-limit to resume")
+        yield unit
+
+def backfill(firstYear: int, lastYear: int, memoryLimitMb: int = 2048, jobs: int = 1, loadRosters: bool = True,
+             refresh: bool = False, rules=None, saveEvery: int = 1):
+    """Score every season in a range, one season at a time with a save every saveEvery weeks and a
+    checkpoint after each season"""
+    checkpoint = loadCheckpoint()
+    ceiling = MemoryCeiling(memoryLimitMb << 20)
+
+    for year in range(firstYear, lastYear + 1):
+        if year in checkpoint["finished"]:
+            print("season", year, "already backfilled")
+            continue
+
+        seasonRosters = None
+        if loadRosters:
+            # that season's listings, so positions match the season being scored. Players who aren't on
+            # the roster yet are added so their weeks are kept, the others keep their current listing.
+            # It's saved before any week is scored, so the roster is on disk for every week written
+            allPlayers = inputCache.loadSource("rosters", year, ['player_id', 'player_name', 'position', 'team'], refresh)
+            seasonRosters = {year: rosterIndex.rosterRecords(rosterIndex.rosterTable(allPlayers))}
+            storeRosterBulk(seasonRosters[year], replace=False)
+            saveToFiles()
+            del allPlayers
+
+        try:
+            scoreUnits(backfillUnits(year, ceiling, refresh), jobs, rules=rules, seasonRosters=seasonRosters,
+                       saveEvery=saveEvery)
+        finally:
+            # weeks scored before an interruption are kept, and the next season starts from an empty store
+            flushStore()
+
+        checkpoint["finished"].append(year)
+        saveCheckpoint(checkpoint)
+        ceiling.check()
+        print(f"backfilled {year}, memory peak so far {ceiling.peak >> 20} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every season in a range, resuming from the last checkpoint")
+    parser.add_argument("firstYear", type=int, nargs="?", default=FIRST_SEASON)
+    parser.add_argument("lastYear", type=int, nargs="?", default=inputCache.currentSeason())
+    parser.add_argument("--memory-limit", type=int, default=2048, help="memory ceiling in MB")
+    parser.add_argument("--jobs", type=int, default=1, help="score each season's weeks in this many worker processes")
+    parser.add_argument("--no-rosters", action="store_true", help="don't load each season's roster before scoring it")
+    parser.add_argument("--refresh", action="store_true", help="refetch the nflverse inputs even if the cache is fresh")
+    parser.add_argument("--offline", action="store_true", help="only read nflverse inputs from the local cache")
+    parser.add_argument("--rules", help="score with a TOML rules file instead of the league defaults")
+    parser.add_argument("--save-every", type=int, default=1,
+                        help="save the store after this many scored weeks, a killed run resumes from the last save")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    profiling.addArguments(parser)
+    args = parser.parse_args()
+
+    inputCache.offline = inputCache.offline or args.offline
+    if args.restart and os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+    rules = scoringRules.loadRules(args.rules) if args.rules else None
+    acquireWriter()
+    with profiling.profiled(args):
+        backfill(args.firstYear, args.lastYear, args.memory_limit, args.jobs, not args.no_rosters, args.refresh, rules,
+                 args.save_every)
@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Times every scoring stage on synthetic seasons and writes the timings as JSON, so runs on two
+# commits can be compared (--compare). Run from the fantasyFootball directory:
+#   python -m benchmarks.runBenchmarks --seasons 2 --weeks 18
+# Each repeat runs in a fresh interpreter against its own scratch store, set FF_STORAGE=sqlite to
+# benchmark the SQLite store.
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+sys.path.insert(0, REPO_DIR)
+
+STAGES = ["generate", "yardage", "td", "fg", "dst", "save", "load", "sync", "resync", "bundles"]
+
+# a stage is reported as a regression when it gets this much slower than the baseline
+REGRESSION_THRESHOLD = 1.10
+
+class StageTimer:
+    """Wall time, calls and rows processed per stage"""
+
+    def __init__(self):
+        self.stages = {stage: {"seconds": 0.0, "calls": 0, "rows": 0} for stage in STAGES}
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            totals = self.stages[name]
+            totals["seconds"] += time.perf_counter() - started
+            totals["calls"] += 1
+            totals["rows"] += rows
+
+def currentCommit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def runBenchmark(seasons: int, weeks: int, playsPerGame: int, seed: int = 0) -> StageTimer:
+    """Score synthetic seasons stage by stage into the store in the current directory, then save,
+    reload and sync it to a fake Firestore client and write its season bundles"""
+    # the store modules work on ./local_data, so they're imported once the scratch directory is current
+    import numpy as np
+    import inputCache
+    import liveScoring
+    import rosterIndex
+    import seasonBundles
+    from benchmarks import syntheticData
+    from fakeFirestore import FakeClient
+    from scoring import yardageScoring, tdScoring, fgScoring, dstScoring
+    from localStorage import (storeRosterBulk, getRoster, clearWeek, saveToFiles, loadFromFiles, resetStore,
+                              syncToFirebase, allDocuments)
+
+    weeklyColumns = inputCache.unionColumns({'week': 'int8'}, yardageScoring.WEEKLY_COLUMNS)
+    timer = StageTimer()
+    for year in range(2000, 2000 + seasons):
+        with timer.stage("generate"):
+            plays, weekly, roster = syntheticData.generateSeason(year, weeks, playsPerGame, seed)
+            # typed the way the input cache loads them
+            plays = inputCache.applyColumnTypes(plays, liveScoring.PLAY_COLUMNS)
+            weekly = inputCache.applyColumnTypes(weekly, weeklyColumns)
+        timer.stages["generate"]["rows"] += len(plays) + len(weekly)
+
+        storeRosterBulk(rosterIndex.rosterRecords(rosterIndex.rosterTable(roster)))
+        positions = rosterIndex.positionIndex(getRoster())['position'].astype(object)
+        playsByWeek = dict(iter(plays.groupby('week', sort=True)))
+        playersByWeek = dict(iter(weekly.groupby('week', sort=True)))
+        for week in range(1, weeks + 1):
+            weekPlays, weekPlayers = playsByWeek[np.int8(week)], playersByWeek[np.int8(week)]
+            clearWeek(year, week)
+            with timer.stage("yardage", len(weekPlayers)):
+                yardageScoring.scoreYardage(weekPlayers, week, year)
+            touchdownRows = weekPlays[weekPlays['touchdown'] == 1]
+            with timer.stage("td", len(touchdownRows)):
+                tdScoring.score(touchdownRows, week, year, positions=positions)
+            fgRows = weekPlays[(weekPlays['field_goal_result'] == 'made') | (weekPlays['extra_point_result'] == 'good')]
+            with timer.stage("fg", len(fgRows)):
+                fgScoring.scoreFg(fgRows, week, year)
+            with timer.stage("dst", len(weekPlays)):
+                dstScoring.scoreDST(weekPlays, week, year)
+
+    with timer.stage("save", seasons * weeks):
+        saveToFiles()
+    resetStore()
+    with timer.stage("load", seasons * weeks):
+        loadFromFiles()
+
+    # a first sync uploads everything, a second one finds nothing changed
+    db = FakeClient()
+    with timer.stage("sync"):
+        summary = syncToFirebase(db, full=True)
+    timer.stages["sync"]["rows"] += summary["written"]
+    with timer.stage("resync"):
+        summary = syncToFirebase(db)
+    timer.stages["resync"]["rows"] += summary["skipped"]
+    with timer.stage("bundles"):
+        seasonBundles.buildBundles(allDocuments())
+    timer.stages["bundles"]["rows"] += sum(entry["players"] + entry["defense"]
+                                           for entry in seasonBundles.loadManifest()["seasons"].values())
+    return timer
+
+def runRepeat(args, scratch: str):
+    """Run the benchmark once in a fresh interpreter with the scratch directory as its store, so no
+    module state or cache carries over between repeats. Returns the stage timings"""
+    stagesPath = os.path.join(scratch, "stages.json")
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--seasons", str(args.seasons), "--weeks", str(args.weeks),
+                    "--plays-per-game", str(args.plays_per_game), "--seed", str(args.seed), "--run-once", stagesPath],
+                   cwd=scratch, check=True)
+    with open(stagesPath, 'r') as f:
+        return json.load(f)
+
+def compareResults(baseline, current):
+    """Print every stage's time against a baseline run, flagging the ones that got slower"""
+    print(f"{'stage':<10}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for stage, totals in current["stages"].items():
+        before = baseline["stages"].get(stage, {}).get("seconds")
+        if not before:
+            continue
+        ratio = totals["seconds"] / before
+        flag = "  slower" if ratio > REGRESSION_THRESHOLD else ""
+        print(f"{stage:<10}{before:>11.3f}s{totals['seconds']:>11.3f}s{ratio:>8.2f}{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scoring, storage and sync on synthetic seasons")
+    parser.add_argument("--seasons", type=int, default=1)
+    parser.add_argument("--weeks", type=int, default=18, help="weeks per season")
+    parser.add_argument("--plays-per-game", type=int, default=160)
+    parser.add_argument("--repeat", type=int, default=3, help="runs to take the fastest time of each stage from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="where to write the results (default benchmarks/results/{commit}.json)")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    parser.add_argument("--run-once", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_once:
+        # one repeat, in the scratch directory and fresh interpreter runRepeat started
+        stages = runBenchmark(args.seasons, args.weeks, args.plays_per_game, args.seed).stages
+        with open(args.run_once, 'w') as f:
+            json.dump(stages, f)
+        sys.exit(0)
+
+    import numpy as np
+    import pandas as pd
+
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, f"{currentCommit()}.json"))
+    compare = os.path.abspath(args.compare) if args.compare else None
+    runs = []
+    for run in range(args.repeat):
+        scratch = tempfile.mkdtemp(prefix="ffbench-")
+        try:
+            runs.append(runRepeat(args, scratch))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    # fastest of the runs, the least disturbed by whatever else the machine was doing
+    stages = {stage: min((run[stage] for run in runs), key=lambda totals: totals["seconds"]) for stage in STAGES}
+    results = {
+        "commit": currentCommit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"seasons": args.seasons, "weeks": args.weeks, "playsPerGame": args.plays_per_game,
+                   "repeat": args.repeat, "seed": args.seed, "storage": os.environ.get("FF_STORAGE", "json")},
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+                        "machine": platform.machine(), "cpus": os.cpu_count()},
+        "stages": stages
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for stage, totals in stages.items():
+        perRow = f"{totals['seconds'] / totals['rows'] * 1e6:8.1f} us/row" if totals["rows"] else ""
+        print(f"{stage:<10}{totals['seconds']:9.3f}s {totals['rows']:>9} rows {perRow}")
+    print("wrote", output)
+    if compare:
+        with open(compare, 'r') as f:
+            compareResults(json.load(f), results)
@@ -0,0 +1,77 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Startup budget of the command line tools: each command is run in a fresh interpreter against a
+# scratch store with a synthetic season in the input cache, and its fastest wall time is checked
+# against its budget. Exits non-zero when a command goes over, run from the fantasyFootball directory:
+#   python -m benchmarks.startupTime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+YEAR = 2000
+
+# (name, script and arguments, budget in seconds)
+COMMANDS = [
+    ("status", ["status.py"], 0.3),
+    ("scoreWeeks --help", ["scoreWeeks.py", "--help"], 0.8),
+    ("rescore unchanged week", ["scoreWeeks.py", str(YEAR), "1", "--offline"], 0.9),
+    ("rescore week", ["scoreWeeks.py", str(YEAR), "1", "--offline", "--force"], 0.9)
+]
+
+def prepareScratch(playsPerGame: int):
+    """Cache one synthetic season and store its roster in the current directory, then score week 1
+    so the unchanged rescore has a fingerprint to match"""
+    import json
+    import inputCache
+    import rosterIndex
+    import storeVersions
+    from benchmarks import syntheticData
+    from localStorage import storeRosterBulk, saveToFiles
+
+    plays, weekly, roster = syntheticData.generateSeason(YEAR, weeks=2, playsPerGame=playsPerGame)
+    for source, frame in (("pbp", plays), ("weekly", weekly)):
+        os.makedirs(os.path.dirname(inputCache.cachePath(source, YEAR)), exist_ok=True)
+        frame.reset_index(drop=True).to_feather(inputCache.cachePath(source, YEAR), compression='uncompressed')
+        with open(inputCache.metadataPath(source, YEAR), 'w') as f:
+            json.dump({"fetchedAt": time.time(), "rows": len(frame), "columns": len(frame.columns)}, f)
+    storeRosterBulk(rosterIndex.rosterRecords(rosterIndex.rosterTable(roster)))
+    saveToFiles()
+    # hand the writer lock over to the scorer runs
+    storeVersions.releaseWriter()
+    runCommand(["scoreWeeks.py", str(YEAR), "1", "--offline"])
+
+def runCommand(arguments) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, arguments[0])] + arguments[1:], check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the startup time of the command line tools against their budgets")
+    parser.add_argument("--repeat", type=int, default=5, help="runs to take the fastest time of each command from")
+    parser.add_argument("--plays-per-game", type=int, default=160)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="ffstartup-")
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    overBudget = []
+    try:
+        prepareScratch(args.plays_per_game)
+        print(f"{'command':<26}{'fastest':>9}{'budget':>9}")
+        for name, arguments, budget in COMMANDS:
+            fastest = min(runCommand(arguments) for _ in range(args.repeat))
+            flag = "  over budget" if fastest > budget else ""
+            print(f"{name:<26}{fastest:>8.3f}s{budget:>8.1f}s{flag}")
+            if flag:
+                overBudget.append(name)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+    sys.exit(1 if overBudget else 0)
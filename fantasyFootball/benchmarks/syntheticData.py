@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+# Synthetic nflverse-shaped inputs for the benchmarks: play-by-play with every column the
+# scoring modules (and live scoring) declare, weekly player stats and a seasonal roster.
+# Everything is drawn from one seeded generator so a given configuration is always the same data.
+
+TEAMS = ['ARI', 'ATL', 'BAL', 'BUF', 'CAR', 'CHI', 'CIN', 'CLE', 'DAL', 'DEN', 'DET', 'GB', 'HOU', 'IND', 'JAX', 'KC',
+         'LA', 'LAC', 'LV', 'MIA', 'MIN', 'NE', 'NO', 'NYG', 'NYJ', 'PHI', 'PIT', 'SEA', 'SF', 'TB', 'TEN', 'WAS']
+
+# roster make-up of every team, roughly what a seasonal roster lists at the fantasy positions
+TEAM_POSITIONS = ['QB'] * 3 + ['RB'] * 5 + ['WR'] * 7 + ['TE'] * 4 + ['K'] * 1
+
+# play types and how often they happen
+PLAY_TYPES = np.array(['run', 'pass', 'punt', 'kickoff', 'field_goal', 'extra_point'])
+PLAY_TYPE_ODDS = [0.42, 0.44, 0.05, 0.05, 0.02, 0.02]
+
+RETURN_DESCRIPTIONS = np.array([
+    "{kicker} punts 45 yards to {team} 20. {returner} to {team} 35 for 15 yards.",
+    "{kicker} kicks 65 yards from 35 to end zone, Touchback.",
+    "{kicker} kicks 64 yards, {returner} returned for 22 yards. Lateral to {other} for 8 yards.",
+    "{kicker} punts 50 yards, {returner} LATERAL to {other} for 11 yards (tackle)."
+])
+
+def rosterFrame(rng: np.random.Generator) -> pd.DataFrame:
+    """Seasonal roster listing, shaped like nfl_data_py.import_seasonal_rosters"""
+    rows = len(TEAMS) * len(TEAM_POSITIONS)
+    return pd.DataFrame({
+        "player_id": [f"00-{n:07d}" for n in range(rows)],
+        "player_name": [f"Player {n}" for n in range(rows)],
+        "position": TEAM_POSITIONS * len(TEAMS),
+        "team": np.repeat(TEAMS, len(TEAM_POSITIONS))
+    })
+
+def teamPlayers(roster: pd.DataFrame, positions) -> dict:
+    """team -> player ids at the given positions"""
+    players = roster[roster['position'].isin(positions)]
+    return {team: ids.to_numpy() for team, ids in players.groupby('team')['player_id']}
+
+def pickPlayers(rng: np.random.Generator, byTeam: dict, teams: np.ndarray) -> np.ndarray:
+    """One random player of each play's team"""
+    picked = np.empty(len(teams), dtype=object)
+    for team in np.unique(teams):
+        rows = np.flatnonzero(teams == team)
+        picked[rows] = rng.choice(byTeam[team], len(rows))
+    return picked
+
+def playByPlayFrame(rng: np.random.Generator, year: int, weeks: int, roster: pd.DataFrame,
+                    playsPerGame: int = 160) -> pd.DataFrame:
+    """A season of play-by-play, shaped like nfl_data_py.import_pbp_data"""
+    games = []
+    for week in range(1, weeks + 1):
+        teams = rng.permutation(TEAMS)
+        # every team plays every week, byes make no difference to the cost of scoring
+        for home, away in zip(teams[0::2], teams[1::2]):
+            games.append((week, f"{year}_{week:02d}_{away}_{home}", home, away))
+    games = pd.DataFrame(games, columns=['week', 'game_id', 'home_team', 'away_team'])
+
+    n = len(games) * playsPerGame
+    game = np.repeat(np.arange(len(games)), playsPerGame)
+    homeTeam = games['home_team'].to_numpy()[game]
+    awayTeam = games['away_team'].to_numpy()[game]
+    homeBall = rng.random(n) < 0.5
+    posteam = np.where(homeBall, homeTeam, awayTeam)
+    defteam = np.where(homeBall, awayTeam, homeTeam)
+
+    playType = PLAY_TYPES[rng.choice(len(PLAY_TYPES), n, p=PLAY_TYPE_ODDS)]
+    isRun, isPass = playType == 'run', playType == 'pass'
+    isReturn = (playType == 'punt') | (playType == 'kickoff')
+    isKick = (playType == 'field_goal') | (playType == 'extra_point')
+
+    yards = np.round(rng.gamma(1.5, 5, n) - 2)
+    offenseTd = (isRun | isPass) & (rng.random(n) < 0.035)
+    returnTd = isReturn & (rng.random(n) < 0.01)
+    interception = isPass & (rng.random(n) < 0.025)
+    fumbleLost = (isRun | isPass) & (rng.random(n) < 0.01)
+    sack = isPass & (rng.random(n) < 0.06)
+    safety = (isRun | isPass) & (rng.random(n) < 0.0005)
+    returned2pts = (playType == 'extra_point') & (rng.random(n) < 0.002)
+    twoPoint = (playType == 'extra_point') & (rng.random(n) < 0.1)
+    twoPointPass = twoPoint & (rng.random(n) < 0.5)
+    fgMade = (playType == 'field_goal') & (rng.random(n) < 0.85)
+    xpGood = (playType == 'extra_point') & ~twoPoint & (rng.random(n) < 0.95)
+    returned = isReturn & (rng.random(n) < 0.6)
+    lateral = returned & (rng.random(n) < 0.02)
+
+    quarterbacks = teamPlayers(roster, ['QB'])
+    rushers = teamPlayers(roster, ['RB', 'QB', 'WR'])
+    receivers = teamPlayers(roster, ['WR', 'TE', 'RB'])
+    kickers = teamPlayers(roster, ['K'])
+    returners = teamPlayers(roster, ['WR', 'RB'])
+    passer = np.where(isPass | twoPointPass, pickPlayers(rng, quarterbacks, posteam), None)
+    rusher = np.where(isRun | (twoPoint & ~twoPointPass), pickPlayers(rng, rushers, posteam), None)
+    receiver = np.where(isPass | twoPointPass, pickPlayers(rng, receivers, posteam), None)
+    kicker = np.where(isKick | (playType == 'kickoff'), pickPlayers(rng, kickers, posteam), None)
+    returner = pickPlayers(rng, returners, defteam)
+    tdPlayer = np.where(offenseTd, np.where(isPass, receiver, rusher), np.where(returnTd, returner, None))
+
+    # running score of every game, each row shows the score before its own play
+    points = np.where(offenseTd, 7, 0) + np.where(fgMade, 3, 0) + np.where(safety, 2, 0)
+    scored = pd.DataFrame({"game": game, "home": np.where(homeBall, points, 0), "away": np.where(homeBall, 0, points)})
+    homeScore = scored.groupby('game')['home'].cumsum().to_numpy() - scored['home'].to_numpy()
+    awayScore = scored.groupby('game')['away'].cumsum().to_numpy() - scored['away'].to_numpy()
+
+    # conversions are logged as the pass or run they were
+    playType = np.where(twoPoint, np.where(twoPointPass, 'pass', 'run'), playType)
+
+    template = rng.choice(len(RETURN_DESCRIPTIONS), n)
+    template = np.where(lateral, 2 + template % 2, template % 2)
+    desc = np.where(isReturn, RETURN_DESCRIPTIONS[template], "run or pass for a few yards")
+
+    return pd.DataFrame({
+        "week": games['week'].to_numpy()[game].astype(np.float64),
+        "game_id": games['game_id'].to_numpy()[game],
+        "play_id": np.tile(np.arange(1, playsPerGame + 1) * 25, len(games)).astype(np.float64),
+        "home_team": homeTeam,
+        "away_team": awayTeam,
+        "home_score": homeScore.astype(np.float64),
+        "away_score": awayScore.astype(np.float64),
+        "posteam": posteam,
+        "defteam": defteam,
+        "play_type": playType,
+        "yards_gained": yards,
+        "passing_yards": np.where(isPass & ~sack, yards, np.nan),
+        "rushing_yards": np.where(isRun, yards, np.nan),
+        "receiving_yards": np.where(isPass & ~sack, yards, np.nan),
+        "touchdown": (offenseTd | returnTd).astype(np.float64),
+        "pass_touchdown": (offenseTd & isPass).astype(np.float64),
+        "rush_touchdown": (offenseTd & isRun).astype(np.float64),
+        "return_touchdown": returnTd.astype(np.float64),
+        "td_team": np.where(offenseTd, posteam, np.where(returnTd, defteam, None)),
+        "td_player_id": tdPlayer,
+        "passer_player_id": passer,
+        "rusher_player_id": rusher,
+        "receiver_player_id": receiver,
+        "kicker_player_id": kicker,
+        "field_goal_result": np.where(playType == 'field_goal', np.where(fgMade, 'made', 'missed'), None),
+        "extra_point_result": np.where((playType == 'extra_point') & ~twoPoint, np.where(xpGood, 'good', 'failed'), None),
+        "two_point_conv_result": np.where(twoPoint, np.where(rng.random(n) < 0.5, 'success', 'failure'), None),
+        "kick_distance": np.where(isKick | isReturn, rng.integers(20, 66, n), np.nan),
+        "interception": interception.astype(np.float64),
+        "fumble_lost": fumbleLost.astype(np.float64),
+        "fumble_recovery_1_team": np.where(fumbleLost, defteam, None),
+        "kickoff_attempt": (playType == 'kickoff').astype(np.float64),
+        "punt_attempt": (playType == 'punt').astype(np.float64),
+        "sack": sack.astype(np.float64),
+        "safety": safety.astype(np.float64),
+        "defensive_extra_point_conv": returned2pts.astype(np.float64),
+        "return_team": np.where(returned, defteam, None),
+        "return_yards": np.where(returned, rng.integers(0, 60, n), 0).astype(np.float64),
+        "lateral_return": lateral.astype(np.float64),
+        "desc": desc
+    })
+
+def weeklyFrame(plays: pd.DataFrame) -> pd.DataFrame:
+    """Weekly player stats summed from the play-by-play, shaped like nfl_data_py.import_weekly_data"""
+    converted = (plays['two_point_conv_result'] == 'success').astype(np.int64)
+    isPass = plays['play_type'] == 'pass'
+    credits = pd.concat([
+        pd.DataFrame({"player_id": plays['passer_player_id'], "week": plays['week'],
+                      "passing_yards": plays['passing_yards'], "passing_2pt_conversions": converted.where(isPass, 0)}),
+        pd.DataFrame({"player_id": plays['rusher_player_id'], "week": plays['week'],
+                      "rushing_yards": plays['rushing_yards'], "rushing_2pt_conversions": converted}),
+        pd.DataFrame({"player_id": plays['receiver_player_id'], "week": plays['week'],
+                      "receiving_yards": plays['receiving_yards'], "receiving_2pt_conversions": converted.where(isPass, 0)})
+    ], ignore_index=True)
+    credits = credits[credits['player_id'].notna()]
+    # nflverse lists 0 for the stats a player didn't record
+    return credits.groupby(['player_id', 'week'], sort=False).sum().reset_index()
+
+def generateSeason(year: int, weeks: int = 18, playsPerGame: int = 160, seed: int = 0):
+    """(plays, weekly, roster) frames for one synthetic season"""
+    rng = np.random.default_rng([seed, year])
+    roster = rosterFrame(rng)
+    plays = playByPlayFrame(rng, year, weeks, roster, playsPerGame)
+    return plays, weeklyFrame(plays), roster
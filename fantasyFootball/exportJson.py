@@ -0,0 +1,8 @@
+import argparse
+from localStorage import exportJson
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the local store as readable JSON")
+    parser.add_argument("directory", nargs="?", default="local_data/export")
+    args = parser.parse_args()
+    print("exported the store to", exportJson(args.directory))
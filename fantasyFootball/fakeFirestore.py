@@ -0,0 +1,129 @@
+import copy
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# In-process stand-in for a firestore.Client, covering the calls the sync and
+# matchup code make. Point firebase_admin at the emulator (FIRESTORE_EMULATOR_HOST)
+# to test against the real thing instead.
+
+class FakeUnavailable(Exception):
+    """Raised by a commit the fake was told to fail"""
+
+def deepMerge(current: Dict[str, Any], data: Dict[str, Any]):
+    """set(merge=True): maps are merged key by key at every level, anything else is replaced"""
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(current.get(key), dict):
+            deepMerge(current[key], value)
+        else:
+            current[key] = copy.deepcopy(value)
+
+def updateFields(current: Dict[str, Any], data: Dict[str, Any]):
+    """update(): each key is a field path ("a.b" reaches into map a), its value replaces the field"""
+    for fieldPath, value in data.items():
+        *parents, name = fieldPath.split(".")
+        target = current
+        for parent in parents:
+            if not isinstance(target.get(parent), dict):
+                target[parent] = {}
+            target = target[parent]
+        target[name] = copy.deepcopy(value)
+
+class FakeSnapshot:
+    def __init__(self, docId: str, data: Optional[Dict[str, Any]]):
+        self.id = docId
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+class FakeDocument:
+    def __init__(self, client: "FakeClient", path: Tuple[str, ...]):
+        self._client = client
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, name: str) -> "FakeCollection":
+        return FakeCollection(self._client, self.path + tuple(name.split("/")))
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self._client._write([("set", self.path, data, merge)])
+
+    def update(self, data: Dict[str, Any]):
+        self._client._write([("update", self.path, data, True)])
+
+    def get(self) -> FakeSnapshot:
+        with self._client._lock:
+            self._client.reads += 1
+            return FakeSnapshot(self.id, self._client.documents.get(self.path))
+
+class FakeCollection:
+    def __init__(self, client: "FakeClient", path: Tuple[str, ...]):
+        self._client = client
+        self.path = path
+
+    def document(self, docId: str) -> FakeDocument:
+        return FakeDocument(self._client, self.path + tuple(docId.split("/")))
+
+    def stream(self):
+        with self._client._lock:
+            found = [
+                FakeSnapshot(path[-1], data) for path, data in sorted(self._client.documents.items())
+                if len(path) == len(self.path) + 1 and path[:-1] == self.path
+            ]
+            self._client.reads += len(found)
+        return iter(found)
+
+class FakeBatch:
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+        self._writes = []
+
+    def set(self, ref: FakeDocument, data: Dict[str, Any], merge: bool = False):
+        self._writes.append(("set", ref.path, data, merge))
+
+    def update(self, ref: FakeDocument, data: Dict[str, Any]):
+        self._writes.append(("update", ref.path, data, True))
+
+    def commit(self):
+        with self._client._lock:
+            if self._client.failCommits > 0:
+                self._client.failCommits -= 1
+                raise FakeUnavailable("fake commit failure")
+            self._client.commits += 1
+        self._client._write(self._writes)
+
+class FakeClient:
+    """Documents live in a dict keyed by their path tuple, e.g. ("players", "00-0023459")"""
+
+    def __init__(self):
+        self.documents = {}
+        self.writes = 0
+        self.reads = 0
+        self.commits = 0
+        self.failCommits = 0  # make this many upcoming batch commits raise FakeUnavailable
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, tuple(name.split("/")))
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def _write(self, writes):
+        with self._lock:
+            for kind, path, data, merge in writes:
+                current = self.documents.get(path)
+                if kind == "update" and current is None:
+                    raise KeyError(f"no document at {'/'.join(path)}")
+                if kind == "update":
+                    current = copy.deepcopy(current)
+                    updateFields(current, data)
+                    self.documents[path] = current
+                elif merge and current is not None:
+                    current = copy.deepcopy(current)
+                    deepMerge(current, data)
+                    self.documents[path] = current
+                else:
+                    self.documents[path] = copy.deepcopy(data)
+                self.writes += 1
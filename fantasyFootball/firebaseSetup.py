@@ -1,6 +1,14 @@
-from firebase_admin import credentials, firestore, initialize_app
+# Firestore client for the commands that talk to Firebase, created on first use so scoring
+# and other local commands never import the SDK or need firebase-key.json
+KEY_FILE = "firebase-key.json"
 
-# initialize firebase
-cred = credentials.Certificate("firebase-key.json")
-initialize_app(cred)
-db = firestore.client()
\ No newline at end of file
+db = None
+
+def getDb():
+    """The Firestore client, initializing the Firebase app the first time it's asked for"""
+    global db
+    if db is None:
+        from firebase_admin import credentials, firestore, initialize_app
+        initialize_app(credentials.Certificate(KEY_FILE))
+        db = firestore.client()
+    return db
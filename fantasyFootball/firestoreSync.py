@@ -0,0 +1,141 @@
+import fcntl
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Tuple
+import storeVersions
+
+# content hash of every document as of its last successful upload, keyed "collection/id"
+MANIFEST_FILE = os.path.join("local_data", "sync_manifest.json")
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_SIZE = 500
+DEFAULT_WORKERS = 8
+MAX_ATTEMPTS = 5
+BASE_BACKOFF = 0.5  # seconds, doubled after every failed attempt
+
+def documentHash(doc: Dict[str, Any]) -> str:
+    """Stable content hash of a document"""
+    encoded = json.dumps(doc, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+def loadManifest() -> Dict[str, str]:
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    with open(MANIFEST_FILE, 'r') as f:
+        return json.load(f)
+
+@contextmanager
+def manifestLock():
+    """Held while the manifest is read and written back, so syncs running at the same time (a live
+    poll and a full sync) don't drop each other's entries"""
+    os.makedirs(os.path.dirname(MANIFEST_FILE), exist_ok=True)
+    with open(MANIFEST_FILE + ".lock", 'a') as lockFile:
+        fcntl.flock(lockFile, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+def updateManifest(updates: Dict[str, str], removed: Iterable[str] = ()):
+    """Apply one sync's new hashes and dropped entries to the manifest as it is now, atomically"""
+    with manifestLock():
+        manifest = loadManifest()
+        manifest.update(updates)
+        for key in removed:
+            manifest.pop(key, None)
+        storeVersions.writeAtomically(MANIFEST_FILE, json.dumps(manifest, indent=2, sort_keys=True))
+
+def commitWithRetry(db, writes: List[Tuple[str, str, Dict[str, Any]]], merge: bool = False):
+    """Commit one batch of (collection, id, doc) writes, retrying with exponential backoff and jitter.
+    With merge the fields are merged into the existing documents instead of replacing them"""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        batch = db.batch()
+        for collection, docId, doc in writes:
+            batch.set(db.collection(collection).document(docId), doc, merge=merge)
+        try:
+            batch.commit()
+            return
+        except Exception as error:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            delay = BASE_BACKOFF * 2 ** (attempt - 1)
+            print(f"batch of {len(writes)} failed ({error}), retrying in {delay:.1f}s")
+            time.sleep(delay * (1 + random.random()))
+
+def syncDocuments(db, documents: Iterable[Tuple[str, str, Dict[str, Any]]], full: bool = False,
+                  batchSize: int = MAX_BATCH_SIZE, workers: int = DEFAULT_WORKERS,
+                  merge: bool = False, prune: bool = False) -> Dict[str, int]:
+    """Upload the (collection, id, doc) documents whose content changed since the last sync.
+    Writes are grouped into batched writes and committed on a bounded thread pool, merge
+    writes just the given fields of documents other code also writes to. prune says the
+    documents are all there are in their collections, so manifest entries of those collections
+    that weren't among them are dropped.
+    Returns a summary of documents written, skipped, failed and pruned."""
+    batchSize = min(batchSize, MAX_BATCH_SIZE)
+    stored = loadManifest()
+    # a full sync uploads everything but still only replaces the entries it uploads
+    manifest = {} if full else stored
+    uploaded = {}
+    seen, collections = set(), set()
+    summary = {"written": 0, "skipped": 0, "failed": 0, "batches": 0, "pruned": 0}
+    lock = threading.Lock()
+
+    def commitBatch(writes, hashes):
+        commitWithRetry(db, writes, merge)
+        with lock:
+            uploaded.update(hashes)
+
+    def collect(done):
+        for future in done:
+            size = pending.pop(future)
+            summary["batches"] += 1
+            try:
+                future.result()
+                summary["written"] += size
+            except Exception as error:
+                print(f"giving up on a batch of {size} documents: {error}")
+                summary["failed"] += size
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(writes, hashes):
+            # keep at most two batches per worker in flight so documents stream through
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(commitBatch, writes, hashes)] = len(writes)
+
+        writes, hashes = [], {}
+        for collection, docId, doc in documents:
+            key = f"{collection}/{docId}"
+            seen.add(key)
+            collections.add(collection)
+            contentHash = documentHash(doc)
+            if manifest.get(key) == contentHash:
+                summary["skipped"] += 1
+                continue
+            writes.append((collection, docId, doc))
+            hashes[key] = contentHash
+            if len(writes) == batchSize:
+                submit(writes, hashes)
+                writes, hashes = [], {}
+        if writes:
+            submit(writes, hashes)
+        collect(wait(pending).done)
+
+    removed = []
+    if prune:
+        # documents that no longer exist locally
+        removed = [key for key in stored if key not in seen and key.rsplit("/", 1)[0] in collections]
+        summary["pruned"] = len(removed)
+
+    # only documents that actually made it are recorded, failed ones are retried next sync
+    if uploaded or removed:
+        updateManifest(uploaded, removed)
+    return summary
@@ -1,13 +1,223 @@
-# Welcome to Cloud Functions for Firebase for Python!
-# To get started, simply uncomment the below code or create your own.
-# Deploy with `firebase deploy`
-
-from firebase_functions import https_fn
-from firebase_admin import initialize_app
-
-# initialize_app()
+# HTTP read API over the scoring data, deployed as the "api" function (`firebase deploy --only functions`).
+#
+#   GET /players/{playerId}/seasons/{year}           a player's weekly stats and season totals
+#   GET /leaderboards/{year}/weeks/{week}?position=  a week's leaderboard, overall or by position
+#   GET /defense/{team}/seasons/{year}               a defense's weekly breakdown and season totals
 #
+# Responses are built from the synced player, defense and leaderboard documents and kept in an
+# in-process LRU cache for a short TTL, so on game day repeat requests are answered from memory
+# instead of every client reading Firestore. Every response carries an ETag, If-None-Match gets a
+# 304 and bodies are gzipped for clients that accept it.
 #
-# @https_fn.on_request()
-# def on_request_example(req: https_fn.Request) -> https_fn.Response:
-#     return https_fn.Response("Hello world!")
\ No newline at end of file
+# The API is a plain WSGI app over a data source, so it runs locally under the functions emulator,
+# any WSGI test client, or wsgiref.simple_server.make_server("", 8000, ScoresApi(DictSource(documents)))
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+try:
+    from firebase_functions import https_fn
+except ImportError:
+    # plain WSGI use (local runs, tests) doesn't need the Functions SDK
+    https_fn = None
+
+# seconds a response is served from memory, and how long clients may reuse it
+CACHE_TTL = 60
+CACHE_ENTRIES = 2048
+# bodies smaller than this aren't worth compressing
+GZIP_MIN_BYTES = 512
+LEADERBOARD_LIMIT = 50
+MAX_LEADERBOARD_LIMIT = 200
+POSITIONS = ("QB", "RB", "WR", "TE", "K", "DST")
+
+class NotFound(Exception):
+    """Raised by a handler for a document that doesn't exist"""
+
+class BadRequest(Exception):
+    """Raised by a handler for a malformed query"""
+
+class DictSource:
+    """Documents held in memory, keyed "collection/id" like the sync manifest. Counts its reads"""
+
+    def __init__(self, documents: Dict[str, Dict[str, Any]]):
+        self.documents = documents
+        self.reads = 0
+
+    def document(self, collection: str, docId: str) -> Optional[Dict[str, Any]]:
+        self.reads += 1
+        return self.documents.get(f"{collection}/{docId}")
+
+class FirestoreSource:
+    """Documents read from Firestore, one document read per response built"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def document(self, collection: str, docId: str) -> Optional[Dict[str, Any]]:
+        snapshot = self.db.collection(collection).document(docId).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+class Response:
+    """A rendered response: JSON body, its gzipped form and the ETag both share"""
+
+    def __init__(self, status: str, payload: Dict[str, Any]):
+        self.status = status
+        self.body = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()
+        self.gzipped = gzip.compress(self.body, mtime=0) if len(self.body) >= GZIP_MIN_BYTES else None
+        # weak, so the plain and gzipped bodies revalidate with the same tag
+        self.etag = f'W/"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+class ResponseCache:
+    """LRU of rendered responses that also expire after a TTL"""
+
+    def __init__(self, maxEntries: int = CACHE_ENTRIES, ttl: float = CACHE_TTL, clock: Callable[[], float] = time.monotonic):
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: "OrderedDict[str, Tuple[float, Response]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Response]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, response: Response):
+        with self._lock:
+            self.entries[key] = (self.clock() + self.ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+def addTotals(weeks: List[Dict[str, int]]) -> Dict[str, int]:
+    """Every stat summed over the weeks"""
+    totals = {}
+    for stats in weeks:
+        for key, value in stats.items():
+            if key != "week":
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+def byWeek(yearData: Dict[str, Dict[str, int]]) -> List[Dict[str, int]]:
+    """A season's weeks as a list in week order, each week's stats with its number. Bodies are
+    rendered with sorted keys, which would put week "10" before "2" in an object"""
+    return [dict(stats, week=int(week)) for week, stats in sorted(yearData.items(), key=lambda item: int(item[0]))]
+
+def playerSeason(source, query, playerId: str, year: str) -> Dict[str, Any]:
+    player = source.document("players", playerId)
+    if player is None:
+        raise NotFound(f"no player {playerId}")
+    weeks = byWeek(player.get("scoring", {}).get(year, {}))
+    return {"id": playerId, "roster": player.get("roster", {}), "year": int(year), "weeks": weeks,
+            "totals": addTotals(weeks)}
+
+def defenseSeason(source, query, team: str, year: str) -> Dict[str, Any]:
+    defense = source.document("defense", team)
+    if defense is None or year not in defense:
+        raise NotFound(f"no {year} scoring for {team}")
+    weeks = byWeek(defense[year])
+    return {"team": team, "year": int(year), "weeks": weeks, "totals": addTotals(weeks)}
+
+def weekLeaderboard(source, query, year: str, week: str) -> Dict[str, Any]:
+    position = query.get("position", [None])[0]
+    if position is not None and position not in POSITIONS:
+        raise BadRequest(f"position must be one of {', '.join(POSITIONS)}")
+    try:
+        limit = min(int(query.get("limit", [LEADERBOARD_LIMIT])[0]), MAX_LEADERBOARD_LIMIT)
+    except ValueError:
+        raise BadRequest("limit must be a number") from None
+
+    board = source.document(f"leaderboards/{year}/weeks", week)
+    if board is None:
+        raise NotFound(f"no leaderboard for week {week} of {year}")
+    if position == "DST":
+        leaders = board.get("defense", [])
+    elif position is not None:
+        leaders = board.get("positions", {}).get(position, [])
+    else:
+        leaders = board.get("leaders", [])
+    return {"year": int(year), "week": int(week), "position": position, "leaders": leaders[:max(limit, 0)]}
+
+ROUTES = [
+    (re.compile(r"^/players/(?P<playerId>[^/]+)/seasons/(?P<year>\d{4})$"), playerSeason),
+    (re.compile(r"^/leaderboards/(?P<year>\d{4})/weeks/(?P<week>\d{1,2})$"), weekLeaderboard),
+    (re.compile(r"^/defense/(?P<team>[A-Z]{2,3})/seasons/(?P<year>\d{4})$"), defenseSeason)
+]
+
+class ScoresApi:
+    """WSGI app serving the read endpoints from a data source through a response cache"""
+
+    def __init__(self, source, cache: Optional[ResponseCache] = None):
+        self.source = source
+        self.cache = cache or ResponseCache()
+
+    def render(self, path: str, query: Dict[str, Any]) -> Response:
+        for pattern, handler in ROUTES:
+            match = pattern.match(path)
+            if match:
+                try:
+                    return Response("200 OK", handler(self.source, query, **match.groupdict()))
+                except NotFound as error:
+                    return Response("404 Not Found", {"error": str(error)})
+                except BadRequest as error:
+                    return Response("400 Bad Request", {"error": str(error)})
+        return Response("404 Not Found", {"error": f"no endpoint {path}"})
+
+    def __call__(self, environ, start_response):
+        if environ["REQUEST_METHOD"] not in ("GET", "HEAD"):
+            start_response("405 Method Not Allowed", [("Allow", "GET, HEAD"), ("Content-Length", "0")])
+            return [b""]
+
+        path = environ.get("PATH_INFO") or "/"
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        # one entry per path and normalized query, misses (404s included) are cached too
+        key = path + "?" + "&".join(f"{name}={','.join(values)}" for name, values in sorted(query.items()))
+        response = self.cache.get(key)
+        if response is None:
+            response = self.render(path, query)
+            self.cache.put(key, response)
+
+        headers = [("ETag", response.etag), ("Cache-Control", f"public, max-age={int(self.cache.ttl)}"),
+                   ("Vary", "Accept-Encoding"), ("Access-Control-Allow-Origin", "*")]
+        requested = environ.get("HTTP_IF_NONE_MATCH", "")
+        if response.status.startswith("200") and (requested.strip() == "*" or response.etag in
+                                                  [tag.strip() for tag in requested.split(",")]):
+            start_response("304 Not Modified", headers)
+            return [b""]
+
+        body = response.body
+        if response.gzipped is not None and "gzip" in environ.get("HTTP_ACCEPT_ENCODING", ""):
+            body = response.gzipped
+            headers.append(("Content-Encoding", "gzip"))
+        headers += [("Content-Type", "application/json"), ("Content-Length", str(len(body)))]
+        start_response(response.status, headers)
+        return [b"" if environ["REQUEST_METHOD"] == "HEAD" else body]
+
+# one app per function instance, its cache lives as long as the instance
+app = None
+
+def getApp() -> ScoresApi:
+    global app
+    if app is None:
+        from firebase_admin import firestore, initialize_app
+        initialize_app()
+        app = ScoresApi(FirestoreSource(firestore.client()))
+    return app
+
+if https_fn is not None:
+    @https_fn.on_request()
+    def api(req: https_fn.Request) -> https_fn.Response:
+        return https_fn.Response.from_app(getApp(), req.environ)
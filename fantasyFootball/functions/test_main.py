@@ -0,0 +1,138 @@
+import gzip
+import json
+import pytest
+from main import DictSource, ResponseCache, ScoresApi
+
+def weekStats(points):
+    return {"points": points, "passYards": 0, "rushYards": points * 10, "recYards": 0, "passTds": 0, "rushTds": 1,
+            "recTds": 0, "fgm": 0, "epm": 0, "2pConvs": 0}
+
+DOCUMENTS = {
+    "players/00-0033873": {"roster": {"name": "Player One", "position": "RB", "team": "KC"},
+                           "scoring": {"2024": {"10": weekStats(12), "2": weekStats(8), "1": weekStats(20)}}},
+    "defense/KC": {"2024": {"1": {"points": 9, "sacks": 3}, "3": {"points": 4, "sacks": 1}}},
+    "leaderboards/2024/weeks/1": {
+        "leaders": [{"id": f"p{i}", "points": 100 - i} for i in range(80)],
+        "positions": {"RB": [{"id": "p1", "points": 99}]},
+        "defense": [{"team": "KC", "points": 9}]
+    }
+}
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def source():
+    return DictSource(DOCUMENTS)
+
+@pytest.fixture
+def api(source, clock):
+    return ScoresApi(source, ResponseCache(ttl=60, clock=clock))
+
+def request(api, path, method="GET", **headers):
+    """(status, headers, body) of one request through the WSGI app"""
+    path, _, query = path.partition("?")
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query}
+    environ.update({f"HTTP_{name.upper()}": value for name, value in headers.items()})
+    started = {}
+
+    def start_response(status, responseHeaders):
+        started["status"] = status
+        started["headers"] = dict(responseHeaders)
+
+    body = b"".join(api(environ, start_response))
+    return started["status"], started["headers"], body
+
+def test_player_season_lists_weeks_in_order(api):
+    status, headers, body = request(api, "/players/00-0033873/seasons/2024")
+    assert status == "200 OK"
+    assert headers["Content-Type"] == "application/json"
+    season = json.loads(body)
+    assert [week["week"] for week in season["weeks"]] == [1, 2, 10]
+    assert season["weeks"][2] == dict(weekStats(12), week=10)
+    assert season["totals"]["points"] == 40
+    assert "week" not in season["totals"]
+
+def test_defense_season(api):
+    status, _, body = request(api, "/defense/KC/seasons/2024")
+    assert status == "200 OK"
+    assert json.loads(body)["totals"] == {"points": 13, "sacks": 4}
+
+def test_leaderboard_by_position_and_limit(api):
+    board = json.loads(request(api, "/leaderboards/2024/weeks/1")[2])
+    assert len(board["leaders"]) == 50
+    board = json.loads(request(api, "/leaderboards/2024/weeks/1?limit=5")[2])
+    assert [leader["id"] for leader in board["leaders"]] == ["p0", "p1", "p2", "p3", "p4"]
+    assert json.loads(request(api, "/leaderboards/2024/weeks/1?position=RB")[2])["leaders"] == [{"id": "p1", "points": 99}]
+    assert json.loads(request(api, "/leaderboards/2024/weeks/1?position=DST")[2])["leaders"] == [{"team": "KC", "points": 9}]
+
+@pytest.mark.parametrize("path", ["/players/missing/seasons/2024", "/defense/KC/seasons/2019",
+                                  "/leaderboards/2024/weeks/9", "/nowhere"])
+def test_not_found(api, path):
+    status, _, body = request(api, path)
+    assert status == "404 Not Found"
+    assert "error" in json.loads(body)
+
+@pytest.mark.parametrize("query", ["position=OL", "limit=many"])
+def test_bad_request(api, query):
+    status, _, body = request(api, f"/leaderboards/2024/weeks/1?{query}")
+    assert status == "400 Bad Request"
+    assert "error" in json.loads(body)
+
+def test_matching_etag_gets_not_modified(api):
+    _, headers, _ = request(api, "/players/00-0033873/seasons/2024")
+    status, notModified, body = request(api, "/players/00-0033873/seasons/2024", if_none_match=headers["ETag"])
+    assert (status, body) == ("304 Not Modified", b"")
+    assert notModified["ETag"] == headers["ETag"]
+    status, _, _ = request(api, "/players/00-0033873/seasons/2024", if_none_match='W/"stale"')
+    assert status == "200 OK"
+
+def test_gzip_when_accepted_and_worth_it(api):
+    _, plain, body = request(api, "/leaderboards/2024/weeks/1")
+    status, headers, compressed = request(api, "/leaderboards/2024/weeks/1", accept_encoding="gzip, deflate")
+    assert status == "200 OK"
+    assert "Content-Encoding" not in plain
+    assert headers["Content-Encoding"] == "gzip"
+    assert int(headers["Content-Length"]) == len(compressed) < len(body)
+    assert gzip.decompress(compressed) == body
+    # the same tag for both, so either revalidates
+    assert headers["ETag"] == plain["ETag"]
+    # small bodies go out as they are
+    _, headers, _ = request(api, "/defense/KC/seasons/2024", accept_encoding="gzip")
+    assert "Content-Encoding" not in headers
+
+def test_responses_are_cached_until_the_ttl(api, source, clock):
+    for _ in range(3):
+        request(api, "/players/00-0033873/seasons/2024")
+        request(api, "/players/missing/seasons/2024")
+    # misses are cached as well
+    assert source.reads == 2
+    assert (api.cache.hits, api.cache.misses) == (4, 2)
+
+    clock.now = 59
+    request(api, "/players/00-0033873/seasons/2024")
+    assert source.reads == 2
+    clock.now = 60
+    request(api, "/players/00-0033873/seasons/2024")
+    assert source.reads == 3
+
+def test_query_order_shares_a_cache_entry(api, source):
+    request(api, "/leaderboards/2024/weeks/1?position=RB&limit=5")
+    request(api, "/leaderboards/2024/weeks/1?limit=5&position=RB")
+    assert source.reads == 1
+
+def test_head_and_other_methods(api):
+    status, headers, body = request(api, "/defense/KC/seasons/2024", method="HEAD")
+    assert (status, body) == ("200 OK", b"")
+    assert int(headers["Content-Length"]) > 0
+    status, headers, _ = request(api, "/defense/KC/seasons/2024", method="POST")
+    assert status == "405 Method Not Allowed"
+    assert headers["Allow"] == "GET, HEAD"
@@ -1,26 +1,14 @@
-import nfl_data_py as nfl
-from localStorage import storePlayerRoster, saveToFiles
+import inputCache
+import rosterIndex
+from localStorage import storeRosterBulk, saveToFiles
 import sys
 # get roster
 year = int(sys.argv[1])
-allPlayers = nfl.import_seasonal_rosters([year])
+allPlayers = inputCache.loadSource("rosters", year, ['player_id', 'player_name', 'position', 'team'])
 
-# offensive players (kickers too)
-for _, row in allPlayers.iterrows():
-    position = row['position']
-
-    if position == 'QB' or position == 'RB' or position == 'WR' or position =='TE' or position == 'K':
-        playerId = row['player_id']
-        name = row['player_name']
-        team = row['team']
-
-        playerInfo = {
-            "name": name,
-            "position": position,
-            "team": team
-        }
-
-        storePlayerRoster(playerId, playerInfo)
+# offensive players (kickers too), stored in one go
+roster = rosterIndex.rosterTable(allPlayers)
+storeRosterBulk(rosterIndex.rosterRecords(roster))
 
 print("initialized", year, "rosters into local storage")
-saveToFiles()
\ No newline at end of file
+saveToFiles()
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from datetime import date
+from typing import Dict, List, Optional, Union
+
+# Local copies of the nflverse inputs, one Arrow file per source and season:
+# cache/nflverse/{source}/{year}.arrow plus a {year}.json sidecar with when it was fetched
+CACHE_DIR = os.path.join("cache", "nflverse")
+
+# a season that is still being played is refetched once its copy is older than this,
+# finished seasons never change so their copies never expire
+CURRENT_SEASON_MAX_AGE = 6 * 60 * 60
+
+# offline mode only ever reads the cache (also set with FF_OFFLINE=1)
+offline = os.environ.get("FF_OFFLINE") == "1"
+
+# how a declared column is loaded:
+#   int8     small counts and 0/1 flags, missing values count as 0
+#   float32  yards, distances and scores (exact for whole numbers, keeps NaN)
+#   category IDs and short repeated strings
+#   team     team abbreviations, all team columns share one category set so they compare to each other
+#   object   left as loaded
+COLUMN_TYPES = ("int8", "float32", "category", "team", "object")
+
+def unionColumns(*declarations: Dict[str, str]) -> Dict[str, str]:
+    """Merge the column declarations of several modules into one projection"""
+    columns = {}
+    for declaration in declarations:
+        for column, columnType in declaration.items():
+            if columnType not in COLUMN_TYPES:
+                raise ValueError(f"unknown column type {columnType!r} for {column}")
+            if columns.setdefault(column, columnType) != columnType:
+                raise ValueError(f"{column} is declared as both {columns[column]} and {columnType}")
+    return columns
+
+def applyColumnTypes(df, columns: Dict[str, str]):
+    """Downcast a loaded frame to the declared column types"""
+    import numpy as np
+    import pandas as pd
+
+    teamColumns = [column for column, columnType in columns.items() if columnType == "team" and column in df]
+    if teamColumns:
+        teams = pd.unique(pd.concat([df[column] for column in teamColumns]).dropna())
+        teamType = pd.CategoricalDtype(sorted(teams))
+
+    for column, columnType in columns.items():
+        if column not in df:
+            continue
+        if columnType == "int8":
+            df[column] = df[column].fillna(0).astype(np.int8)
+        elif columnType == "float32":
+            df[column] = df[column].astype(np.float32)
+        elif columnType == "category":
+            df[column] = df[column].astype("category")
+        elif columnType == "team":
+            df[column] = df[column].astype(teamType)
+    return df
+
+def fetchPlayByPlay(year: int):
+    import nfl_data_py as nfl
+    return nfl.import_pbp_data([year], downcast=False, cache=False, alt_path=None)
+
+def fetchWeekly(year: int):
+    import nfl_data_py as nfl
+    return nfl.import_weekly_data([year], downcast=False)
+
+def fetchRosters(year: int):
+    import nfl_data_py as nfl
+    return nfl.import_seasonal_rosters([year])
+
+def fetchWeeklyRosters(year: int):
+    import nfl_data_py as nfl
+    return nfl.import_weekly_rosters([year])
+
+SOURCES = {
+    "pbp": fetchPlayByPlay,
+    "weekly": fetchWeekly,
+    "rosters": fetchRosters,
+    "weeklyRosters": fetchWeeklyRosters
+}
+
+def currentSeason(today: Optional[date] = None) -> int:
+    """NFL season in progress on a given day (the season starts in September)"""
+    today = today or date.today()
+    return today.year if today.month >= 9 else today.year - 1
+
+def cachePath(source: str, year: int) -> str:
+    return os.path.join(CACHE_DIR, source, f"{year}.arrow")
+
+def metadataPath(source: str, year: int) -> str:
+    return os.path.join(CACHE_DIR, source, f"{year}.json")
+
+def isFresh(source: str, year: int) -> bool:
+    """Whether the cached copy of a source can be used without refetching"""
+    if not os.path.exists(cachePath(source, year)) or not os.path.exists(metadataPath(source, year)):
+        return False
+    if year < currentSeason():
+        return True
+    with open(metadataPath(source, year), 'r') as f:
+        fetchedAt = json.load(f)["fetchedAt"]
+    return time.time() - fetchedAt < CURRENT_SEASON_MAX_AGE
+
+def refreshSource(source: str, year: int):
+    """Fetch one source/season from nflverse and replace its cached copy"""
+    df = SOURCES[source](year).reset_index(drop=True)
+
+    os.makedirs(os.path.dirname(cachePath(source, year)), exist_ok=True)
+    # uncompressed so reads can memory-map the file instead of decoding it
+    tmpPath = cachePath(source, year) + ".tmp"
+    df.to_feather(tmpPath, compression='uncompressed')
+    os.replace(tmpPath, cachePath(source, year))
+
+    tmpPath = metadataPath(source, year) + ".tmp"
+    with open(tmpPath, 'w') as f:
+        json.dump({"fetchedAt": time.time(), "rows": len(df), "columns": len(df.columns)}, f)
+    os.replace(tmpPath, metadataPath(source, year))
+    print("cached", source, year, "with", len(df), "rows")
+
+def loadSource(source: str, year: int, columns: Optional[Union[List[str], Dict[str, str]]] = None,
+               refresh: bool = False):
+    """Load a source/season from the cache, fetching it first when missing or stale (unless offline).
+    columns is either a list of names or a {name: type} declaration, which also downcasts them"""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    if offline:
+        if not os.path.exists(cachePath(source, year)):
+            raise FileNotFoundError(f"no cached {source} data for {year} and running offline")
+    elif refresh or not isFresh(source, year):
+        refreshSource(source, year)
+
+    # memory-mapped read of just the requested columns
+    path = cachePath(source, year)
+    names = None
+    if columns is not None:
+        with pa.memory_map(path) as f:
+            available = set(pa.ipc.open_file(f).schema.names)
+        names = [column for column in columns if column in available]
+    df = feather.read_table(path, columns=names, memory_map=True).to_pandas()
+    if isinstance(columns, dict):
+        df = applyColumnTypes(df, columns)
+    return df
@@ -0,0 +1,213 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+import firestoreSync
+import inputCache
+import readModels
+import rosterIndex
+from scoring import yardageScoring, tdScoring, fgScoring, dstScoring
+from localStorage import (loadFromFiles, saveToFiles, clearWeek, getPlayerData, storePlayerDataBulk,
+                          storeDefenseDataBulk, getRoster, getPlayerRoster, getWeekResults, allDocuments)
+
+# play-by-play columns live scoring reads on top of what the scoring modules declare,
+# yardage comes from the plays themselves since weekly stats only exist after the games
+LIVE_PLAY_COLUMNS = {
+    'week': 'int8',
+    'touchdown': 'int8',
+    'play_type': 'category',
+    'rusher_player_id': 'category',
+    'receiver_player_id': 'category',
+    'passing_yards': 'float32',
+    'rushing_yards': 'float32',
+    'receiving_yards': 'float32',
+    'two_point_conv_result': 'category'
+}
+PLAY_COLUMNS = inputCache.unionColumns(
+    LIVE_PLAY_COLUMNS, tdScoring.PLAY_COLUMNS, fgScoring.PLAY_COLUMNS, dstScoring.PLAY_COLUMNS
+)
+
+# running per-player totals, named like the weekly columns yardageScoring reads
+YARDAGE_COLUMNS = ['passing_yards', 'rushing_yards', 'receiving_yards',
+                   'passing_2pt_conversions', 'rushing_2pt_conversions', 'receiving_2pt_conversions']
+
+# columns needed to work out points allowed from the latest play of each game
+SCORE_COLUMNS = ['week', 'game_id', 'play_id', 'home_team', 'away_team', 'home_score', 'away_score']
+
+class PlaySource(ABC):
+    """Where live plays come from, newPlays hands back the plays after each game's cursor"""
+
+    finished = False
+
+    @abstractmethod
+    def newPlays(self, cursors: Dict[str, float]) -> pd.DataFrame:
+        """Plays of the week past each game's cursor (game_id -> last play_id processed)"""
+
+def afterCursors(plays: pd.DataFrame, cursors: Dict[str, float]) -> pd.DataFrame:
+    """Plays past the last play_id already processed for their game"""
+    cursor = plays['game_id'].astype(object).map(cursors).fillna(-np.inf).to_numpy()
+    return plays[plays['play_id'].to_numpy() > cursor]
+
+class FileReplaySource(PlaySource):
+    """Replays a saved week of play-by-play (Arrow/Feather, Parquet or CSV), releasing a few more plays
+    of every game on each poll, so live scoring can be run and checked without a feed"""
+
+    def __init__(self, path: str, week: int, playsPerPoll: int = 10):
+        if path.endswith(".parquet"):
+            plays = pd.read_parquet(path)
+        elif path.endswith(".csv"):
+            plays = pd.read_csv(path, low_memory=False)
+        else:
+            plays = pd.read_feather(path)
+        plays = plays[plays['week'] == week]
+        plays = inputCache.applyColumnTypes(plays[[c for c in PLAY_COLUMNS if c in plays]].copy(), PLAY_COLUMNS)
+        self.plays = plays.sort_values(['game_id', 'play_id'], kind='stable').reset_index(drop=True)
+        # position of every play within its game, a play is released once the replay clock passes it
+        self.order = self.plays.groupby('game_id', observed=True).cumcount().to_numpy()
+        self.playsPerPoll = playsPerPoll
+        self.polls = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.polls * self.playsPerPoll > self.order.max(initial=-1)
+
+    def newPlays(self, cursors: Dict[str, float]) -> pd.DataFrame:
+        self.polls += 1
+        released = self.plays[self.order < self.polls * self.playsPerPoll]
+        return afterCursors(released, cursors)
+
+class NflverseSource(PlaySource):
+    """Refetches the season's play-by-play through the input cache on every poll. nflverse only
+    republishes a few times a day and each poll reloads the season, so put a real feed behind
+    PlaySource when one is available"""
+
+    def __init__(self, year: int, week: int):
+        self.year = year
+        self.week = week
+
+    def newPlays(self, cursors: Dict[str, float]) -> pd.DataFrame:
+        plays = inputCache.loadSource("pbp", self.year, PLAY_COLUMNS, refresh=True)
+        return afterCursors(plays[plays['week'] == self.week], cursors)
+
+class LiveWeek:
+    """Scoring state for one week being played, fed plays a poll at a time.
+    TDs and kicks are added as they happen, yardage and defense are rebuilt from running totals"""
+
+    def __init__(self, year: int, week: int, rules=None):
+        self.year = year
+        self.week = week
+        self.rules = rules
+        self.positions = rosterIndex.positionIndex(getRoster())['position']
+        self.cursors = {}  # game_id -> last play_id processed
+        self.yardage = pd.DataFrame(columns=YARDAGE_COLUMNS, dtype=np.float64)
+        self.yardagePoints = {}  # player_id -> yardage points currently included in their total
+        self.defenseEvents = None  # (week, team) -> event counts and return yards so far
+        self.latestPlays = None  # last play seen of every game, for the scores
+
+        # live results replace whatever was stored, and drop the week's fingerprint so the
+        # next batch run rescores it from the final data
+        clearWeek(year, week)
+
+    def apply(self, plays: pd.DataFrame):
+        """Score a batch of new plays and refresh the week's totals"""
+        if plays.empty:
+            return
+        plays = plays.sort_values(['game_id', 'play_id'], kind='stable')
+
+        tdScoring.score(plays[plays['touchdown'] == 1], self.week, self.year, self.rules, self.positions)
+        fgScoring.scoreFg(plays[(plays['field_goal_result'] == 'made') | (plays['extra_point_result'] == 'good')],
+                          self.week, self.year, self.rules)
+        self.updateYardage(plays)
+        self.updateDefense(plays)
+
+        last = plays.groupby('game_id', observed=True)['play_id'].max()
+        self.cursors.update(zip(last.index.astype(object), last.to_numpy().tolist()))
+
+    def updateYardage(self, plays: pd.DataFrame):
+        """Add the plays' yards and conversions onto the running totals and rescore the players they touched"""
+        converted = (plays['two_point_conv_result'] == 'success').astype(np.int64)
+        passPlay = plays['play_type'] == 'pass'
+        credits = pd.concat([
+            pd.DataFrame({"player_id": plays['passer_player_id'].astype(object), "column": 'passing_yards',
+                          "value": plays['passing_yards'].astype(np.float64)}),
+            pd.DataFrame({"player_id": plays['rusher_player_id'].astype(object), "column": 'rushing_yards',
+                          "value": plays['rushing_yards'].astype(np.float64)}),
+            pd.DataFrame({"player_id": plays['receiver_player_id'].astype(object), "column": 'receiving_yards',
+                          "value": plays['receiving_yards'].astype(np.float64)}),
+            pd.DataFrame({"player_id": plays['passer_player_id'].astype(object), "column": 'passing_2pt_conversions',
+                          "value": converted.where(passPlay, 0)}),
+            pd.DataFrame({"player_id": plays['receiver_player_id'].astype(object), "column": 'receiving_2pt_conversions',
+                          "value": converted.where(passPlay, 0)}),
+            pd.DataFrame({"player_id": plays['rusher_player_id'].astype(object), "column": 'rushing_2pt_conversions',
+                          "value": converted.where(~passPlay, 0)})
+        ], ignore_index=True).dropna()
+        if credits.empty:
+            return
+
+        delta = credits.pivot_table(index='player_id', columns='column', values='value', aggfunc='sum', fill_value=0)
+        self.yardage = self.yardage.add(delta.reindex(columns=YARDAGE_COLUMNS, fill_value=0), fill_value=0)
+        touched = self.yardage.loc[delta.index].reset_index(names='player_id')
+
+        playerData = {}
+        for playerId, stats in yardageScoring.yardageStats(touched, self.rules).items():
+            # swap the player's previous yardage points for the new ones, keeping TD and kick points
+            points = getPlayerData(playerId, self.year, self.week)["points"]
+            points += stats["points"] - self.yardagePoints.get(playerId, 0)
+            self.yardagePoints[playerId] = stats["points"]
+            playerData[playerId] = {"points": points, "passYards": stats["passYards"], "rushYards": stats["rushYards"],
+                                    "recYards": stats["recYards"], "2pConvs": stats["2pConvs"]}
+        storePlayerDataBulk(self.year, self.week, playerData)
+
+    def updateDefense(self, plays: pd.DataFrame):
+        """Add the plays' defensive events onto the running totals and rescore every defense from them"""
+        events = dstScoring.creditedEvents(plays).groupby(['week', 'team'], sort=False)[dstScoring.DEFENSE_STATS].sum()
+        self.defenseEvents = events if self.defenseEvents is None else self.defenseEvents.add(events, fill_value=0)
+
+        latest = plays[SCORE_COLUMNS] if self.latestPlays is None else pd.concat([self.latestPlays, plays[SCORE_COLUMNS]])
+        self.latestPlays = latest.sort_values(['game_id', 'play_id']).groupby('game_id', observed=True).tail(1)
+        allowed = dstScoring.pointsAllowed(self.latestPlays).set_index(['week', 'team'])['pointsAllowed']
+
+        totals = dstScoring.combineDefense(self.defenseEvents, allowed).droplevel('week')
+        storeDefenseDataBulk(self.year, self.week, dstScoring.defenseRecords(totals, rules=self.rules))
+
+def syncPoll(db, year: int, week: int, plays: pd.DataFrame) -> Dict[str, int]:
+    """Sync what one poll's plays changed: the documents of the players in them and the defenses of
+    their games, plus the week's leaderboard. The cost follows the poll, not the size of the store,
+    season totals catch up on the next full sync"""
+    playerIds = set()
+    for column in plays.columns:
+        if column.endswith('_player_id'):
+            playerIds.update(plays[column].dropna().astype(object))
+    teams = set(plays['home_team'].dropna().astype(object)) | set(plays['away_team'].dropna().astype(object))
+    documents = list(allDocuments(sorted(playerIds), sorted(teams)))
+
+    playerWeeks, defenseWeeks = getWeekResults(year, week)
+    rosters = {playerId: getPlayerRoster(playerId) for playerId in playerWeeks}
+    documents.append(readModels.weekLeaderboardDocument(year, week, playerWeeks, defenseWeeks, rosters))
+    return firestoreSync.syncDocuments(db, documents)
+
+def runLive(year: int, week: int, source: PlaySource, interval: float = 15, db=None,
+            maxPolls: Optional[int] = None, rules=None):
+    """Poll the source until it runs dry (or forever for a feed), saving the week after every poll
+    that brought new plays and syncing what they changed when a Firestore client is given"""
+    if db is not None:
+        # player documents hold every week, so the store is loaded once here rather than on each poll
+        loadFromFiles()
+    live = LiveWeek(year, week, rules)
+    polls = 0
+    while maxPolls is None or polls < maxPolls:
+        polls += 1
+        started = time.monotonic()
+        plays = source.newPlays(live.cursors)
+        if not plays.empty:
+            live.apply(plays)
+            saveToFiles()
+            if db is not None:
+                syncPoll(db, year, week, plays)
+            print(f"scored {len(plays)} new plays across {plays['game_id'].nunique()} games "
+                  f"in {time.monotonic() - started:.2f}s")
+        if source.finished:
+            break
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+    return live
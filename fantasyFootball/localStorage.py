@@ -1,19 +1,46 @@
+import atexit
 import json
 import os
-from typing import Dict, Any, Union
+from typing import Dict, Any, Iterable, Optional, Union, Mapping
+import firestoreSync
+import profiling
+import readModels
+import snapshotFile
+import storeVersions
+from statRecords import PlayerWeek, DefenseWeek
 
-# Create local_data directory if it doesn't exist
+# Everything lives under local_data, created by the first save rather than on import
 LOCAL_DATA_DIR = "local_data"
-if not os.path.exists(LOCAL_DATA_DIR):
-    os.makedirs(LOCAL_DATA_DIR)
 
-# File paths for local storage
+# Roster for every player, plus one shard per scored week, as binary snapshots (snapshotFile.py):
+# local_data/weeks/{year}/{week}.v{version}.snap holds a "players" and a "defense" section and the
+# fingerprint of the inputs the week was scored from. Shards are written once and published as
+# versions of the store (storeVersions.py), the process reads the version it pinned on first use
+# and only a process holding the writer lock saves. JSON is only written by exportJson
+WEEKS_DIR = os.path.join(LOCAL_DATA_DIR, "weeks")
+SNAPSHOT_EXTENSION = ".snap"
+
+# Unversioned roster.snap and weeks/{year}/{week}.snap written before versions, and JSON shards
+# written before the snapshot format (and by exportJson), read as version 0 until the next save
+ROSTER_FILE = os.path.join(LOCAL_DATA_DIR, "roster.snap")
+ROSTER_JSON_FILE = os.path.join(LOCAL_DATA_DIR, "roster.json")
+
+# Single-file layout used before sharding, migrated on first load
 PLAYERS_FILE = os.path.join(LOCAL_DATA_DIR, "players.json")
 DEFENSE_FILE = os.path.join(LOCAL_DATA_DIR, "defense.json")
 
 # Initialize data structures
-players_data = {}  # Will contain both roster and scoring data
-defense_data = {}  # Will be organized by team -> year -> week -> stats
+players_data = {}  # Will contain both roster and scoring data (player -> scoring -> year -> week -> PlayerWeek)
+defense_data = {}  # Will be organized by team -> year -> week -> DefenseWeek
+
+# What has been read from disk and what needs writing back
+roster_loaded = False
+roster_dirty = False
+loaded_weeks = set()  # (year, week) string keys whose shard is in memory
+dirty_weeks = set()  # (year, week) string keys changed since the last save
+week_fingerprints = {}  # (year, week) string keys -> input fingerprint of the stored results
+open_snapshots = {}  # path -> snapshotFile.Snapshot of weeks read record by record without loading them
+manifest = None  # version of the store this process reads (storeVersions manifest), pinned on first use
 
 def convert_to_int(value: Union[int, float, str, Any]) -> Union[int, str, Any]:
     """Convert numeric values to integers, leave other types unchanged"""
@@ -25,146 +52,590 @@ def convert_dict_values(data: Dict[str, Any]) -> Dict[str, Any]:
     """Convert all numeric values in a dictionary to integers"""
     return {key: convert_to_int(value) for key, value in data.items()}
 
-def loadFromFiles():
-    """Load all data from local JSON files"""
-    global players_data, defense_data
-    
-    # Load players data (combined roster and scoring)
-    if os.path.exists(PLAYERS_FILE):
-        with open(PLAYERS_FILE, 'r') as f:
-            players_data = json.load(f)
-    
-    # Load defense data
+def legacyManifest() -> Dict[str, Any]:
+    """Version 0 of a store saved before versions: whatever unversioned shards are on disk"""
+    weeks = {}
+    if os.path.isdir(WEEKS_DIR):
+        for yearKey in os.listdir(WEEKS_DIR):
+            for fileName in os.listdir(os.path.join(WEEKS_DIR, yearKey)):
+                weekKey, extension = os.path.splitext(fileName)
+                # a snapshot wins over a JSON shard of the same week
+                if weekKey.isdigit() and extension in (SNAPSHOT_EXTENSION, ".json") and \
+                        not weeks.get(f"{yearKey}/{weekKey}", "").endswith(SNAPSHOT_EXTENSION):
+                    weeks[f"{yearKey}/{weekKey}"] = os.path.join("weeks", yearKey, fileName)
+    roster = None
+    for path in (ROSTER_FILE, ROSTER_JSON_FILE):
+        if os.path.exists(path):
+            roster = os.path.relpath(path, LOCAL_DATA_DIR)
+            break
+    return {"version": 0, "roster": roster, "weeks": weeks}
+
+def storeManifest() -> Dict[str, Any]:
+    """The version this process reads, pinning the current one on first use"""
+    global manifest
+    while manifest is None:
+        version = storeVersions.currentVersion(LOCAL_DATA_DIR)
+        if version is None:
+            manifest = legacyManifest()
+            break
+        storeVersions.pin(LOCAL_DATA_DIR, version)
+        try:
+            manifest = storeVersions.readManifest(LOCAL_DATA_DIR, version)
+        except FileNotFoundError:
+            # collected before the pin landed, pin whatever is current now
+            continue
+    return manifest
+
+def storedPath(entry: Optional[str]) -> Optional[str]:
+    return None if entry is None else os.path.join(LOCAL_DATA_DIR, entry)
+
+def weekPath(yearKey: str, weekKey: str) -> Optional[str]:
+    """File of a stored week in the pinned version, None when the week isn't stored"""
+    return storedPath(storeManifest()["weeks"].get(f"{yearKey}/{weekKey}"))
+
+def storedWeeks():
+    """(year, week) string keys of every stored week (snapshot or JSON), in numeric order"""
+    weeks = [tuple(key.split("/")) for key in storeManifest()["weeks"]]
+    return sorted(weeks, key=lambda key: (int(key[0]), int(key[1])))
+
+def closeSnapshot(path: str):
+    """Close a week snapshot held open for record reads, before it's loaded or replaced"""
+    snapshot = open_snapshots.pop(path, None)
+    if snapshot is not None:
+        snapshot.close()
+
+def readWeekShard(yearKey: str, weekKey: str) -> Dict[str, Any]:
+    """One stored week as {"players": {id: stats}, "defense": {team: stats}, "fingerprint": ...} dicts,
+    from its snapshot or an older JSON shard"""
+    path = weekPath(yearKey, weekKey)
+    if path.endswith(SNAPSHOT_EXTENSION):
+        with snapshotFile.Snapshot(path) as snapshot:
+            shard = {
+                "players": {player_id: dict(zip(PlayerWeek.KEYS, values))
+                            for player_id, values in snapshot.section("players").items()},
+                "defense": {team: dict(zip(DefenseWeek.KEYS, values))
+                            for team, values in snapshot.section("defense").items()}
+            }
+            if "fingerprint" in snapshot.meta:
+                shard["fingerprint"] = snapshot.meta["fingerprint"]
+        return shard
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def singleFileLayout() -> bool:
+    """Whether the store is still the single-file players.json layout, split into shards on the next save"""
+    stored = storeManifest()
+    return stored["roster"] is None and not stored["weeks"] and os.path.exists(PLAYERS_FILE)
+
+def singleFileSummaries():
+    """weekSummaries of the single-file layout, which has no fingerprints"""
+    counts = {}
+    with open(PLAYERS_FILE, 'r') as f:
+        players = json.load(f)
+    for player_data in players.values():
+        for yearKey, weeks in player_data.get("scoring", {}).items():
+            for weekKey in weeks:
+                counts.setdefault((int(yearKey), int(weekKey)), [0, 0])[0] += 1
+    if os.path.exists(DEFENSE_FILE):
+        with open(DEFENSE_FILE, 'r') as f:
+            defense = json.load(f)
+        for team_data in defense.values():
+            for yearKey, weeks in team_data.items():
+                for weekKey in weeks:
+                    counts.setdefault((int(yearKey), int(weekKey)), [0, 0])[1] += 1
+    return [(year, week, players, defenses, None) for (year, week), (players, defenses) in sorted(counts.items())]
+
+def weekSummaries():
+    """(year, week, players, defenses, fingerprint) of every stored week, counted from the snapshot
+    headers without reading any records"""
+    if singleFileLayout():
+        return singleFileSummaries()
+    summaries = []
+    for yearKey, weekKey in storedWeeks():
+        path = weekPath(yearKey, weekKey)
+        if path.endswith(SNAPSHOT_EXTENSION):
+            with snapshotFile.Snapshot(path) as snapshot:
+                sections = snapshot.sectionHeaders
+                summaries.append((int(yearKey), int(weekKey), sections["players"]["count"],
+                                  sections["defense"]["count"], snapshot.meta.get("fingerprint")))
+        else:
+            shard = readWeekShard(yearKey, weekKey)
+            summaries.append((int(yearKey), int(weekKey), len(shard.get("players", {})),
+                              len(shard.get("defense", {})), shard.get("fingerprint")))
+    return summaries
+
+def readRosterFile() -> Dict[str, Dict[str, Any]]:
+    """The stored roster from its snapshot or an older roster.json, empty when there is neither"""
+    path = storedPath(storeManifest()["roster"])
+    if path is None:
+        return {}
+    if path.endswith(SNAPSHOT_EXTENSION):
+        with snapshotFile.Snapshot(path) as snapshot:
+            return dict(snapshot.section("roster").items())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def writeJsonFile(path: str, data: Any):
+    """Write a JSON file atomically so readers never see a half-written file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmpPath = path + ".tmp"
+    with open(tmpPath, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmpPath, path)
+
+def migrateSingleFiles():
+    """Load the old players.json/defense.json layout and mark all of it for writing as shards"""
+    global players_data, defense_data, roster_dirty
+
+    with open(PLAYERS_FILE, 'r') as f:
+        players_data = json.load(f)
     if os.path.exists(DEFENSE_FILE):
         with open(DEFENSE_FILE, 'r') as f:
             defense_data = json.load(f)
 
+    roster_dirty = True
+    for player_data in players_data.values():
+        for yearKey, weeks in player_data.get("scoring", {}).items():
+            for weekKey, data in weeks.items():
+                weeks[weekKey] = PlayerWeek.fromMapping(data)
+                loaded_weeks.add((yearKey, weekKey))
+    for team_data in defense_data.values():
+        for yearKey, weeks in team_data.items():
+            for weekKey, data in weeks.items():
+                weeks[weekKey] = DefenseWeek.fromMapping(data)
+                loaded_weeks.add((yearKey, weekKey))
+    dirty_weeks.update(loaded_weeks)
+
+def ensureRoster():
+    """Load the roster on first use"""
+    global roster_loaded, roster_dirty
+    if roster_loaded:
+        return
+    roster_loaded = True
+
+    rosterPath = storedPath(storeManifest()["roster"])
+    if rosterPath is not None:
+        with profiling.stage("load") as span:
+            roster = readRosterFile()
+            span.rows = len(roster)
+        for player_id, player_info in roster.items():
+            players_data.setdefault(player_id, {"roster": {}, "scoring": {}})["roster"] = player_info
+        # a JSON roster is rewritten as a snapshot on the next save
+        roster_dirty = roster_dirty or not rosterPath.endswith(SNAPSHOT_EXTENSION)
+    elif os.path.exists(PLAYERS_FILE):
+        migrateSingleFiles()
+
+def ensureWeek(year: int, week: int):
+    """Load one week's shard on first use"""
+    key = (str(year), str(week))
+    if key in loaded_weeks:
+        return
+    ensureRoster()
+    if key in loaded_weeks:
+        return
+    loaded_weeks.add(key)
+
+    yearKey, weekKey = key
+    path = weekPath(yearKey, weekKey)
+    if path is None:
+        return
+    closeSnapshot(path)
+    if path.endswith(SNAPSHOT_EXTENSION):
+        with profiling.stage("load") as span, snapshotFile.Snapshot(path) as snapshot:
+            players, defense = snapshot.section("players"), snapshot.section("defense")
+            span.rows = len(players) + len(defense)
+            for player_id, values in players.items():
+                player = players_data.setdefault(player_id, {"roster": {}, "scoring": {}})
+                player.setdefault("scoring", {}).setdefault(yearKey, {})[weekKey] = PlayerWeek.fromValues(values)
+            for team, values in defense.items():
+                defense_data.setdefault(team, {}).setdefault(yearKey, {})[weekKey] = DefenseWeek.fromValues(values)
+            if "fingerprint" in snapshot.meta:
+                week_fingerprints[key] = snapshot.meta["fingerprint"]
+    else:
+        with profiling.stage("load") as span:
+            shard = readWeekShard(yearKey, weekKey)
+            span.rows = len(shard.get("players", {})) + len(shard.get("defense", {}))
+        for player_id, data in shard.get("players", {}).items():
+            player = players_data.setdefault(player_id, {"roster": {}, "scoring": {}})
+            player.setdefault("scoring", {}).setdefault(yearKey, {})[weekKey] = PlayerWeek.fromMapping(data)
+        for team, data in shard.get("defense", {}).items():
+            defense_data.setdefault(team, {}).setdefault(yearKey, {})[weekKey] = DefenseWeek.fromMapping(data)
+        if "fingerprint" in shard:
+            week_fingerprints[key] = shard["fingerprint"]
+        # rewritten as a snapshot on the next save
+        dirty_weeks.add(key)
+
+def snapshotRecord(year: int, week: int, section: str, recordKey: str):
+    """(found, values) of one record of a week that isn't loaded, read straight from its snapshot.
+    found is None when the week has no snapshot and has to be loaded instead"""
+    path = weekPath(str(year), str(week))
+    if path is None or not path.endswith(SNAPSHOT_EXTENSION):
+        return None, None
+    snapshot = open_snapshots.get(path)
+    if snapshot is None:
+        snapshot = open_snapshots[path] = snapshotFile.Snapshot(path)
+    values = snapshot.section(section).get(recordKey)
+    return values is not None, values
+
+def resetStore():
+    """Forget everything in memory so the next access reads the current version from disk again"""
+    global players_data, defense_data, roster_loaded, roster_dirty, manifest
+    players_data = {}
+    defense_data = {}
+    roster_loaded = False
+    roster_dirty = False
+    loaded_weeks.clear()
+    dirty_weeks.clear()
+    week_fingerprints.clear()
+    for path in list(open_snapshots):
+        closeSnapshot(path)
+    if manifest is not None and manifest["version"]:
+        storeVersions.unpin(LOCAL_DATA_DIR)
+    manifest = None
+
+def loadFromFiles():
+    """Drop what's in memory and load the roster and every week of the current version from their
+    snapshots (or older JSON files). Only full passes need this, everything else loads on first use"""
+    resetStore()
+    ensureRoster()
+    for yearKey, weekKey in storedWeeks():
+        ensureWeek(yearKey, weekKey)
+
+def useWorkerStore(roster: Dict[str, Dict[str, Any]]):
+    """Start a worker process's store from the roster the parent hands over instead of whatever memory
+    it inherited, so workers score the same under fork or spawn. Their changes are never saved"""
+    global players_data, defense_data, roster_loaded, roster_dirty
+    players_data = {player_id: {"roster": dict(player_info), "scoring": {}} for player_id, player_info in roster.items()}
+    defense_data = {}
+    roster_loaded = True
+    roster_dirty = False
+    loaded_weeks.clear()
+    dirty_weeks.clear()
+    week_fingerprints.clear()
+
+def acquireWriter():
+    """Become the one process that saves to the store, raises storeVersions.WriterLocked if another is"""
+    storeVersions.acquireWriter(LOCAL_DATA_DIR)
+
 def saveToFiles():
-    """Save all data to local JSON files"""
-    # Save players data (combined roster and scoring)
-    with open(PLAYERS_FILE, 'w') as f:
-        json.dump(players_data, f, indent=2)
-    
-    # Save defense data
-    with open(DEFENSE_FILE, 'w') as f:
-        json.dump(defense_data, f, indent=2)
+    """Publish a new version with the roster and every week changed since the last save written to new
+    files, the other weeks carried over from the latest version"""
+    global roster_dirty, manifest
+    if not roster_dirty and not dirty_weeks:
+        return
+
+    acquireWriter()
+    with profiling.stage("save", len(dirty_weeks)):
+        # the latest version rather than the pinned one, in case another writer published since
+        base = storeVersions.latestManifest(LOCAL_DATA_DIR) or storeManifest()
+        version = base["version"] + 1
+        published = {"version": version, "roster": base["roster"], "weeks": dict(base["weeks"])}
+        if roster_dirty:
+            roster = {player_id: player_data.get("roster", {}) for player_id, player_data in players_data.items()}
+            published["roster"] = f"roster.v{version}.snap"
+            snapshotFile.writeSnapshot(storedPath(published["roster"]), {"roster": (roster, None)})
+
+        for yearKey, weekKey in sorted(dirty_weeks):
+            players, defense = {}, {}
+            for player_id, player_data in players_data.items():
+                data = player_data.get("scoring", {}).get(yearKey, {}).get(weekKey)
+                if data is not None:
+                    players[player_id] = data.toValues()
+            for team, team_data in defense_data.items():
+                data = team_data.get(yearKey, {}).get(weekKey)
+                if data is not None:
+                    defense[team] = data.toValues()
+            meta = {}
+            if (yearKey, weekKey) in week_fingerprints:
+                meta["fingerprint"] = week_fingerprints[(yearKey, weekKey)]
+            entry = os.path.join("weeks", yearKey, f"{weekKey}.v{version}{SNAPSHOT_EXTENSION}")
+            snapshotFile.writeSnapshot(storedPath(entry), {"players": (players, PlayerWeek.KEYS),
+                                                           "defense": (defense, DefenseWeek.KEYS)}, meta)
+            published["weeks"][f"{yearKey}/{weekKey}"] = entry
+
+        storeVersions.publish(LOCAL_DATA_DIR, published)
+        storeVersions.pin(LOCAL_DATA_DIR, version)
+        manifest = published
+        roster_dirty = False
+        dirty_weeks.clear()
+        storeVersions.collectGarbage(LOCAL_DATA_DIR)
+
+@atexit.register
+def releasePin():
+    """A reader's pin goes with it, stale pins of killed processes are cleared by the writer"""
+    if manifest is not None and manifest["version"]:
+        storeVersions.unpin(LOCAL_DATA_DIR)
+
+def exportJson(directory: str = os.path.join(LOCAL_DATA_DIR, "export")):
+    """Write the whole store as readable JSON: roster.json plus weeks/{year}/{week}.json shards
+    (the layout used before snapshots, which is read back and migrated if copied into local_data)"""
+    # everything on disk plus whatever hasn't been saved yet
+    ensureRoster()
+    for yearKey, weekKey in storedWeeks():
+        ensureWeek(yearKey, weekKey)
+    roster = {player_id: player_data.get("roster", {}) for player_id, player_data in players_data.items()}
+    writeJsonFile(os.path.join(directory, "roster.json"), roster)
+    for yearKey, weekKey in sorted(loaded_weeks, key=lambda key: (int(key[0]), int(key[1]))):
+        playerData, teamData = getWeekResults(int(yearKey), int(weekKey))
+        if not playerData and not teamData and (yearKey, weekKey) not in week_fingerprints:
+            continue
+        shard = {
+            "players": {player_id: data.toDict() for player_id, data in playerData.items()},
+            "defense": {team: teamData[team].toDict() for team in sorted(teamData)}
+        }
+        if (yearKey, weekKey) in week_fingerprints:
+            shard["fingerprint"] = week_fingerprints[(yearKey, weekKey)]
+        writeJsonFile(os.path.join(directory, "weeks", yearKey, weekKey + ".json"), shard)
+    return directory
 
 def storePlayerData(player_id: str, year: int, week: int, data: Dict[str, Any]):
     """Store player scoring data"""
+    ensureWeek(year, week)
+    dirty_weeks.add((str(year), str(week)))
+
     # Only store data for players who have roster information
     if player_id not in players_data or "roster" not in players_data[player_id] or not players_data[player_id]["roster"]:
         return
-    
-    if "scoring" not in players_data[player_id]:
-        players_data[player_id]["scoring"] = {}
-    
-    if str(year) not in players_data[player_id]["scoring"]:
-        players_data[player_id]["scoring"][str(year)] = {}
-    
-    if str(week) not in players_data[player_id]["scoring"][str(year)]:
-        players_data[player_id]["scoring"][str(year)][str(week)] = {}
-    
+
+    weeks = players_data[player_id].setdefault("scoring", {}).setdefault(str(year), {})
+
     # Convert numeric values to integers
     converted_data = convert_dict_values(data)
-    
-    # If player already has data for this week, update it
-    if str(week) in players_data[player_id]["scoring"][str(year)]:
-        current_data = players_data[player_id]["scoring"][str(year)][str(week)]
-        
-        # For all stats, use the new values directly since they represent the total for the week
-        for key, value in converted_data.items():
-            current_data[key] = value
-                    
-        players_data[player_id]["scoring"][str(year)][str(week)] = current_data
+
+    # For all stats, use the new values directly since they represent the total for the week
+    if str(week) in weeks:
+        weeks[str(week)].update(converted_data)
     else:
-        players_data[player_id]["scoring"][str(year)][str(week)] = converted_data
+        weeks[str(week)] = PlayerWeek.fromMapping(converted_data)
+
+def storePlayerDataBulk(year: int, week: int, playerData: Dict[str, Dict[str, Any]]):
+    """Store scoring data for many players in one week (values must already be ints)"""
+    yearKey = str(year)
+    weekKey = str(week)
+    ensureWeek(year, week)
+    dirty_weeks.add((yearKey, weekKey))
+    for player_id, data in playerData.items():
+        # Only store data for players who have roster information
+        player = players_data.get(player_id)
+        if player is None or not player.get("roster"):
+            continue
 
-def getPlayerData(player_id: str, year: int, week: int) -> Dict[str, Any]:
-    """Get player data for a specific player, year, and week"""
+        weeks = player.setdefault("scoring", {}).setdefault(yearKey, {})
+        if weekKey in weeks:
+            weeks[weekKey].update(data)
+        else:
+            weeks[weekKey] = PlayerWeek.fromMapping(data)
+
+def addPlayerData(player_id: str, year: int, week: int, increments: Mapping[str, int]):
+    """Add onto a player's stats for one week in place"""
+    ensureWeek(year, week)
+    dirty_weeks.add((str(year), str(week)))
+
+    # Only store data for players who have roster information
+    player = players_data.get(player_id)
+    if player is None or not player.get("roster"):
+        return
+
+    weeks = player.setdefault("scoring", {}).setdefault(str(year), {})
+    if str(week) not in weeks:
+        weeks[str(week)] = PlayerWeek()
+    weeks[str(week)].add(increments)
+
+def getPlayerData(player_id: str, year: int, week: int) -> Dict[str, int]:
+    """Get player data for a specific player, year, and week (a copy, use the store functions to change it)"""
+    if (str(year), str(week)) not in loaded_weeks:
+        # read just this player's record instead of loading the whole week
+        found, values = snapshotRecord(year, week, "players", player_id)
+        if found is not None:
+            return dict(zip(PlayerWeek.KEYS, values)) if found else PlayerWeek().toDict()
+    ensureWeek(year, week)
     try:
-        return players_data[player_id]["scoring"][str(year)][str(week)].copy()
+        return players_data[player_id]["scoring"][str(year)][str(week)].toDict()
     except KeyError:
-        return {
-            "points": 0,
-            "passYards": 0,
-            "rushYards": 0,
-            "recYards": 0,
-            "passTds": 0,
-            "rushTds": 0,
-            "recTds": 0,
-            "fgm": 0,
-            "epm": 0,
-            "2pConvs": 0
-        }
+        return PlayerWeek().toDict()
 
 def storeDefenseData(team: str, year: int, week: int, data: Dict[str, Any]):
     """Store defense scoring data"""
-    if team not in defense_data:
-        defense_data[team] = {}
-    
-    if str(year) not in defense_data[team]:
-        defense_data[team][str(year)] = {}
-    
-    if str(week) not in defense_data[team][str(year)]:
-        defense_data[team][str(year)][str(week)] = {}
-    
+    ensureWeek(year, week)
+    dirty_weeks.add((str(year), str(week)))
+
+    weeks = defense_data.setdefault(team, {}).setdefault(str(year), {})
+
     # Convert numeric values to integers
     converted_data = convert_dict_values(data)
-    
-    # If team already has data for this week, update it
-    if str(week) in defense_data[team][str(year)]:
-        current_data = defense_data[team][str(year)][str(week)]
-        
-        # For all stats, use the new values directly since they represent the total for the week
-        for key, value in converted_data.items():
-            current_data[key] = value
-                    
-        defense_data[team][str(year)][str(week)] = current_data
+
+    # For all stats, use the new values directly since they represent the total for the week
+    if str(week) in weeks:
+        weeks[str(week)].update(converted_data)
     else:
-        defense_data[team][str(year)][str(week)] = converted_data
+        weeks[str(week)] = DefenseWeek.fromMapping(converted_data)
+
+def storeDefenseDataBulk(year: int, week: int, teamData: Dict[str, Dict[str, Any]]):
+    """Store defense scoring data for many teams in one week (values must already be ints)"""
+    yearKey = str(year)
+    weekKey = str(week)
+    ensureWeek(year, week)
+    dirty_weeks.add((yearKey, weekKey))
+    for team, data in teamData.items():
+        weeks = defense_data.setdefault(team, {}).setdefault(yearKey, {})
+        if weekKey in weeks:
+            weeks[weekKey].update(data)
+        else:
+            weeks[weekKey] = DefenseWeek.fromMapping(data)
+
+def addDefenseData(team: str, year: int, week: int, increments: Mapping[str, int]):
+    """Add onto a defense's stats for one week in place"""
+    ensureWeek(year, week)
+    dirty_weeks.add((str(year), str(week)))
 
-def getDefenseData(team: str, year: int, week: int) -> Dict[str, Any]:
-    """Get defense data for a specific team, year, and week"""
+    weeks = defense_data.setdefault(team, {}).setdefault(str(year), {})
+    if str(week) not in weeks:
+        weeks[str(week)] = DefenseWeek()
+    weeks[str(week)].add(increments)
+
+def getDefenseData(team: str, year: int, week: int) -> Dict[str, int]:
+    """Get defense data for a specific team, year, and week (a copy, use the store functions to change it)"""
+    if (str(year), str(week)) not in loaded_weeks:
+        found, values = snapshotRecord(year, week, "defense", team)
+        if found is not None:
+            return dict(zip(DefenseWeek.KEYS, values)) if found else DefenseWeek().toDict()
+    ensureWeek(year, week)
     try:
-        return defense_data[team][str(year)][str(week)].copy()
+        return defense_data[team][str(year)][str(week)].toDict()
     except KeyError:
-        return {
-            "points": 0,
-            "touchdowns": 0,
-            "turnovers": 0,
-            "sacks": 0,
-            "safeties": 0,
-            "returned2pts": 0,
-            "returnYards": 0,
-            "pointsAllowed": 0
-        }
+        return DefenseWeek().toDict()
+
+def clearWeek(year: int, week: int):
+    """Drop every player's and team's results for one week so it can be rescored from zero"""
+    key = (str(year), str(week))
+    yearKey, weekKey = key
+    ensureWeek(year, week)
+    dirty_weeks.add(key)
+    week_fingerprints.pop(key, None)
+
+    for player in players_data.values():
+        weeks = player.get("scoring", {}).get(yearKey)
+        if weeks is not None and weeks.pop(weekKey, None) is not None and not weeks:
+            del player["scoring"][yearKey]
+    for team_data in defense_data.values():
+        weeks = team_data.get(yearKey)
+        if weeks is not None and weeks.pop(weekKey, None) is not None and not weeks:
+            del team_data[yearKey]
+
+def getWeekFingerprint(year: int, week: int):
+    """Fingerprint of the inputs a week's stored results were scored from, None if unknown"""
+    ensureWeek(year, week)
+    return week_fingerprints.get((str(year), str(week)))
+
+def setWeekFingerprint(year: int, week: int, fingerprint: str):
+    """Record the inputs a week's results were scored from, saved with the week"""
+    ensureWeek(year, week)
+    week_fingerprints[(str(year), str(week))] = fingerprint
+    dirty_weeks.add((str(year), str(week)))
 
 def storePlayerRoster(player_id: str, player_info: Dict[str, Any]):
     """Store player roster information"""
+    global roster_dirty
+    ensureRoster()
+    roster_dirty = True
+
     if player_id not in players_data:
         players_data[player_id] = {"roster": {}, "scoring": {}}
     # Convert any numeric values in roster info to integers
     players_data[player_id]["roster"] = convert_dict_values(player_info)
 
+def storeRosterBulk(roster: Dict[str, Dict[str, Any]], replace: bool = True):
+    """Store roster information for many players at once. Without replace only players who aren't
+    on the roster yet are added, the others keep what's stored"""
+    global roster_dirty
+    ensureRoster()
+    roster_dirty = True
+    for player_id, player_info in roster.items():
+        player = players_data.setdefault(player_id, {"roster": {}, "scoring": {}})
+        if replace or not player.get("roster"):
+            player["roster"] = convert_dict_values(player_info)
+
+def getRoster() -> Dict[str, Dict[str, Any]]:
+    """Roster information of every rostered player"""
+    ensureRoster()
+    return {player_id: player["roster"] for player_id, player in players_data.items() if player.get("roster")}
+
 def getPlayerRoster(player_id: str) -> Dict[str, Any]:
     """Get player roster information"""
+    ensureRoster()
     try:
         return players_data[player_id]["roster"]
     except KeyError:
         return {}
 
-def syncToFirebase(db):
-    """Sync all local data to Firebase using an optimized structure for web queries"""
-    # Sync players data (both roster and scoring)
-    for player_id, player_data in players_data.items():
-        # Create a single document for each player containing both roster and scoring data
-        player_doc = {
-            "roster": player_data.get("roster", {}),
-            "scoring": player_data.get("scoring", {})
-        }
-        db.collection('players').document(player_id).set(player_doc)
-    
-    # Sync defense data
+def getWeekResults(year: int, week: int):
+    """Get every player's and team's scoring data for one week"""
+    yearKey = str(year)
+    weekKey = str(week)
+    ensureWeek(year, week)
+    playerData = {}
+    for player_id, player in players_data.items():
+        data = player.get("scoring", {}).get(yearKey, {}).get(weekKey)
+        if data is not None:
+            playerData[player_id] = data
+    teamData = {}
     for team, team_data in defense_data.items():
-        # Create a single document for each team containing all years and weeks
-        db.collection('defense').document(team).set(team_data) 
\ No newline at end of file
+        data = team_data.get(yearKey, {}).get(weekKey)
+        if data is not None:
+            teamData[team] = data
+    return playerData, teamData
+
+def storeWeekResults(year: int, week: int, playerData: Dict[str, Dict[str, Any]], teamData: Dict[str, Dict[str, Any]]):
+    """Store one week's scoring data for every player and team, as returned by getWeekResults"""
+    storePlayerDataBulk(year, week, playerData)
+    storeDefenseDataBulk(year, week, teamData)
+
+def scoringDict(scoring: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """Plain year -> week -> stats dicts for the JSON/Firestore boundary, weeks in numeric order"""
+    return {
+        yearKey: {weekKey: weeks[weekKey].toDict() for weekKey in sorted(weeks, key=int)}
+        for yearKey, weeks in sorted(scoring.items())
+    }
+
+def playerDocument(player_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Firestore document for one player containing both roster and scoring data"""
+    return {
+        "roster": player_data.get("roster", {}),
+        "scoring": scoringDict(player_data.get("scoring", {}))
+    }
+
+def allDocuments(playerIds: Optional[Iterable[str]] = None, teams: Optional[Iterable[str]] = None):
+    """Yield (collection, id, document) for every player and defense document, or only for the
+    given players and teams (those that are stored)"""
+    players = players_data.items() if playerIds is None else \
+        [(player_id, players_data[player_id]) for player_id in playerIds if player_id in players_data]
+    for player_id, player_data in players:
+        # a single document for each player containing both roster and scoring data
+        yield 'players', player_id, playerDocument(player_data)
+    defenses = defense_data.items() if teams is None else [(team, defense_data[team]) for team in teams if team in defense_data]
+    for team, team_data in defenses:
+        # a single document for each team containing all years and weeks
+        yield 'defense', team, scoringDict(team_data)
+
+def syncToFirebase(db, full: bool = False, batchSize: int = firestoreSync.MAX_BATCH_SIZE,
+                   workers: int = firestoreSync.DEFAULT_WORKERS, bundles=None) -> Dict[str, int]:
+    """Sync local data and the read models built from it to Firebase in batched writes,
+    only uploading documents that changed since the last sync. Documents are also added to
+    the season bundles (seasonBundles.SeasonBundles) when given"""
+    documents = allDocuments() if bundles is None else bundles.passThrough(allDocuments())
+    with profiling.stage("sync") as span:
+        summary = firestoreSync.syncDocuments(db, readModels.withReadModels(documents), full=full,
+                                              batchSize=batchSize, workers=workers, prune=True)
+        span.rows = summary["written"] + summary["skipped"] + summary["failed"]
+    return summary
+
+# Swap in the SQLite store (sqliteStorage.py) behind the same functions
+if os.environ.get("FF_STORAGE") == "sqlite":
+    from sqliteStorage import (
+        loadFromFiles, saveToFiles, resetStore, useWorkerStore,
+        storePlayerData, storePlayerDataBulk, addPlayerData, getPlayerData,
+        storeDefenseData, storeDefenseDataBulk, addDefenseData, getDefenseData,
+        storePlayerRoster, storeRosterBulk, getRoster, getPlayerRoster,
+        getWeekResults, storeWeekResults, clearWeek, getWeekFingerprint, setWeekFingerprint,
+        weekSummaries, allDocuments, syncToFirebase, exportJson, acquireWriter
+    )
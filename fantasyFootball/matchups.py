@@ -0,0 +1,110 @@
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import firestoreSync
+import profiling
+from localStorage import getPlayerData, getDefenseData
+
+# Fantasy matchup results worked out from the local store, so the clients read the numbers
+# instead of pulling every starter's player document and adding them up:
+#   matchups/{year}/weeks/week{N}/games/{game}  homeScore, awayScore, per-starter points, winner
+#   matchups/{year}/weeks/week{N}               standings of the league after that week
+# The clients own the games (teams and starters), results are merged into them.
+MATCHUP_COLLECTION = "matchups"
+
+Document = Tuple[str, str, Dict[str, Any]]
+
+def weekCollection(year: int) -> str:
+    return f"{MATCHUP_COLLECTION}/{year}/weeks"
+
+def weekId(week: int) -> str:
+    return f"week{week}"
+
+def isDefense(starterId: str) -> bool:
+    """Defenses are started by team abbreviation, players by their gsis id"""
+    return len(starterId) <= 3
+
+def starterPoints(starters: Optional[List[str]], year: int, week: int) -> List[Dict[str, Any]]:
+    """{id, points} of every filled lineup slot in lineup order, empty slots are left out.
+    A list rather than a map, merged writes replace lists whole but merge maps key by key"""
+    points = []
+    for starterId in starters or []:
+        if not starterId:
+            continue
+        data = getDefenseData(starterId, year, week) if isDefense(starterId) else getPlayerData(starterId, year, week)
+        points.append({"id": starterId, "points": data["points"]})
+    return points
+
+def gameResult(game: Dict[str, Any], year: int, week: int) -> Dict[str, Any]:
+    """Team totals and the winner of one game, None for a tie"""
+    homePoints = starterPoints(game.get("homeStarters"), year, week)
+    awayPoints = starterPoints(game.get("awayStarters"), year, week)
+    homeScore = sum(starter["points"] for starter in homePoints)
+    awayScore = sum(starter["points"] for starter in awayPoints)
+    if homeScore == awayScore:
+        winner = None
+    else:
+        winner = game.get("homeTeam") if homeScore > awayScore else game.get("awayTeam")
+    return {"homeScore": homeScore, "awayScore": awayScore, "homePoints": homePoints,
+            "awayPoints": awayPoints, "winner": winner}
+
+def addResult(standings: Dict[str, Dict[str, Any]], team: str, scored: int, allowed: int):
+    record = standings.setdefault(team, {"team": team, "wins": 0, "losses": 0, "ties": 0,
+                                         "pointsFor": 0, "pointsAgainst": 0})
+    if scored > allowed:
+        record["wins"] += 1
+    elif scored < allowed:
+        record["losses"] += 1
+    else:
+        record["ties"] += 1
+    record["pointsFor"] += scored
+    record["pointsAgainst"] += allowed
+
+def rankedStandings(standings: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of the records, best record first (a tie counts half a win), then most points scored"""
+    def rank(record):
+        games = record["wins"] + record["losses"] + record["ties"]
+        percentage = (record["wins"] + record["ties"] / 2) / games if games else 0
+        return -percentage, -record["pointsFor"], record["team"]
+    return [dict(record) for record in sorted(standings.values(), key=rank)]
+
+def readGames(db, year: int, week: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """(id, document) of every game of a week"""
+    games = db.collection(f"{weekCollection(year)}/{weekId(week)}/games").stream()
+    return sorted((game.id, game.to_dict()) for game in games)
+
+def matchupDocuments(year: int, gamesByWeek: Dict[int, List[Tuple[str, Dict[str, Any]]]]) -> Iterator[Document]:
+    """Every game's result and the standings after every week, weeks in order"""
+    standings = {}
+    for week in sorted(gamesByWeek):
+        for gameId, game in gamesByWeek[week]:
+            result = gameResult(game, year, week)
+            yield f"{weekCollection(year)}/{weekId(week)}/games", gameId, result
+            if game.get("homeTeam") and game.get("awayTeam"):
+                addResult(standings, game["homeTeam"], result["homeScore"], result["awayScore"])
+                addResult(standings, game["awayTeam"], result["awayScore"], result["homeScore"])
+        yield weekCollection(year), weekId(week), {"standings": rankedStandings(standings)}
+
+def updateMatchups(db, year: int, throughWeek: int, full: bool = False) -> Dict[str, int]:
+    """Score every game of the season up to a week from the local store and merge the results and
+    standings into Firestore. Standings are rebuilt from week 1 so corrections to earlier weeks carry
+    through, only the documents that changed are written"""
+    with profiling.stage("matchups") as span:
+        gamesByWeek = {week: readGames(db, year, week) for week in range(1, throughWeek + 1)}
+        span.rows = sum(len(games) for games in gamesByWeek.values())
+        summary = firestoreSync.syncDocuments(db, matchupDocuments(year, gamesByWeek), full=full, merge=True)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Work out fantasy matchup scores and standings from local storage "
+                                     "and write them to Firestore")
+    parser.add_argument("year", type=int)
+    parser.add_argument("week", type=int, help="last week to score, standings are built from week 1 up to it")
+    parser.add_argument("--full", action="store_true", help="write every result, not just the ones that changed")
+    profiling.addArguments(parser)
+    args = parser.parse_args()
+
+    from firebaseSetup import getDb
+    db = getDb()
+    with profiling.profiled(args):
+        summary = updateMatchups(db, args.year, args.week, full=args.full)
+    print(f"Updated matchups: {summary['written']} written, {summary['skipped']} unchanged, {summary['failed']} failed")
@@ -0,0 +1,258 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Per-stage instrumentation. Code wraps its stages in `with profiling.stage("yardage", rows):`,
+# which costs next to nothing unless a profile is running (start() or --profile on the scripts).
+# A profile records wall time, CPU time, memory and rows of every span and writes them as a JSON
+# report, optionally a Chrome trace (chrome://tracing, Perfetto and speedscope all open it) and a
+# cProfile or tracemalloc capture of one stage, picked from the report of an earlier profile.
+# Memory comes from the process high-water mark: a span records the process peak so far when it
+# ended and how much it raised that peak, which is all it used when it's the largest yet.
+# Stages run in worker processes (--jobs > 1) aren't recorded, profile with one job to see them.
+
+STAGES = ("fetch", "filter", "yardage", "touchdowns", "kicks", "dst", "load", "save", "sync", "bundles", "matchups", "simulate")
+CAPTURES = ("cprofile", "tracemalloc")
+
+# profile being recorded, None when profiling is off
+activeProfile = None
+
+def maxRss() -> int:
+    """High-water mark of this process's resident memory in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class Span:
+    """One run of a stage. Code that only learns how many rows it handled partway through sets rows"""
+
+    def __init__(self, name: str, rows: int = 0, depth: int = 0):
+        self.name = name
+        self.rows = rows
+        self.depth = depth
+        self.start = 0.0
+        self.cpuStart = 0.0
+        self.maxRssBefore = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.children = 0.0  # wall time spent in nested spans
+        self.processPeak = 0  # process high-water mark when the span ended, not the span's own
+        self.peakGrowth = 0  # how much the span raised the process high-water mark
+        self.tracedPeak = 0
+
+class Profile:
+    """Spans recorded while profiling, with an optional capture of one stage.
+    capture is "cprofile" or "tracemalloc", captureStage the stage it's taken of"""
+
+    def __init__(self, capture: Optional[str] = None, captureStage: Optional[str] = None):
+        if capture is not None and capture not in CAPTURES:
+            raise ValueError(f"unknown capture {capture!r}, expected one of {', '.join(CAPTURES)}")
+        if capture is not None and captureStage is None:
+            # capturing every stage would slow them all down and skew the timings being looked at
+            raise ValueError("a capture needs the stage to capture")
+        self.capture = capture
+        self.captureStage = captureStage
+        self.spans: List[Span] = []
+        self.stack: List[Span] = []
+        self.started = time.perf_counter()
+        self.startedAt = time.time()
+        self.capturing = None  # span being captured
+        self.profiler = None
+        # the captured stage's spans' cProfile stats added up, or the tracemalloc snapshot of its slowest span
+        self.captured: Any = None
+
+    def enter(self, span: Span):
+        span.depth = len(self.stack)
+        self.stack.append(span)
+        if self.capture and self.capturing is None and span.name == self.captureStage:
+            self.capturing = span
+            if self.capture == "cprofile":
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+            else:
+                tracemalloc.start()
+        span.maxRssBefore = maxRss()
+        span.start = time.perf_counter()
+        span.cpuStart = time.process_time()
+
+    def exit(self, span: Span):
+        span.wall = time.perf_counter() - span.start
+        span.cpu = time.process_time() - span.cpuStart
+        span.processPeak = maxRss()
+        span.peakGrowth = span.processPeak - span.maxRssBefore
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1].children += span.wall
+        self.spans.append(span)
+
+        if self.capturing is span:
+            self.capturing = None
+            if self.capture == "cprofile":
+                self.profiler.disable()
+                if self.captured is not None:
+                    self.captured.add(self.profiler)
+                else:
+                    self.captured = pstats.Stats(self.profiler)
+                self.profiler = None
+            else:
+                # exact peak of the Python allocations made during the span
+                span.tracedPeak = tracemalloc.get_traced_memory()[1]
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                if self.captured is None or span.wall > self.captured[0].wall:
+                    self.captured = (span, snapshot)
+
+    def stageTotals(self) -> Dict[str, Dict[str, Any]]:
+        """Every stage's spans added up, selfSeconds leaves out the time spent in nested stages.
+        processPeakBytes is the process peak so far at the stage's last span, peakGrowthBytes what
+        its spans added to it"""
+        totals = {}
+        for span in self.spans:
+            stage = totals.setdefault(span.name, {"calls": 0, "wallSeconds": 0.0, "selfSeconds": 0.0,
+                                                  "cpuSeconds": 0.0, "rows": 0, "processPeakBytes": 0,
+                                                  "peakGrowthBytes": 0})
+            stage["calls"] += 1
+            stage["wallSeconds"] += span.wall
+            stage["selfSeconds"] += span.wall - span.children
+            stage["cpuSeconds"] += span.cpu
+            stage["rows"] += span.rows
+            stage["processPeakBytes"] = max(stage["processPeakBytes"], span.processPeak)
+            stage["peakGrowthBytes"] += span.peakGrowth
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["selfSeconds"]))
+
+    def captureSummary(self, limit: int = 25) -> Optional[Dict[str, Any]]:
+        """Top functions (cProfile) or allocation sites (tracemalloc) of the captured stage"""
+        if self.captured is None:
+            return None
+        summary = {"stage": self.captureStage, "capture": self.capture}
+        if self.capture == "cprofile":
+            text = io.StringIO()
+            result = self.captured
+            result.stream = text
+            result.sort_stats("cumulative").print_stats(limit)
+            summary["top"] = text.getvalue().strip().splitlines()
+        else:
+            span, result = self.captured
+            summary["wallSeconds"] = span.wall
+            summary["tracedPeakBytes"] = span.tracedPeak
+            summary["top"] = [{"location": str(stat.traceback), "sizeBytes": stat.size, "count": stat.count}
+                              for stat in result.statistics("lineno")[:limit]]
+        return summary
+
+    def report(self, command: Optional[List[str]] = None) -> Dict[str, Any]:
+        return {
+            "command": command if command is not None else sys.argv,
+            "startedAt": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.startedAt)),
+            "wallSeconds": time.perf_counter() - self.started,
+            "peakMemoryBytes": maxRss(),
+            "stages": self.stageTotals(),
+            "capture": self.captureSummary()
+        }
+
+    def chromeTrace(self) -> Dict[str, Any]:
+        """Spans as complete events of the Chrome trace event format"""
+        events = [{
+            "name": span.name, "cat": "stage", "ph": "X", "pid": os.getpid(), "tid": 0,
+            "ts": (span.start - self.started) * 1e6, "dur": span.wall * 1e6,
+            "args": {"rows": span.rows, "cpuMs": round(span.cpu * 1e3, 3), "processPeakBytes": span.processPeak,
+                     "peakGrowthBytes": span.peakGrowth}
+        } for span in self.spans]
+        return {"traceEvents": sorted(events, key=lambda event: event["ts"]), "displayTimeUnit": "ms"}
+
+    def write(self, reportPath: Optional[str] = None, tracePath: Optional[str] = None):
+        """Write the JSON report and trace, plus the raw .prof of a cProfile capture next to the report"""
+        if reportPath:
+            with open(reportPath, 'w') as f:
+                json.dump(self.report(), f, indent=2)
+            if self.capture == "cprofile" and self.captured is not None:
+                self.captured.dump_stats(os.path.splitext(reportPath)[0] + ".prof")
+        if tracePath:
+            with open(tracePath, 'w') as f:
+                json.dump(self.chromeTrace(), f)
+
+    def printSummary(self):
+        # the process peak so far after the stage, and how much the stage itself pushed it up
+        print(f"{'stage':<12}{'wall':>9}{'self':>9}{'cpu':>9}{'rows':>10}{'peak MB':>9}{'+MB':>6}")
+        for name, stage in self.stageTotals().items():
+            print(f"{name:<12}{stage['wallSeconds']:>8.3f}s{stage['selfSeconds']:>8.3f}s{stage['cpuSeconds']:>8.3f}s"
+                  f"{stage['rows']:>10}{stage['processPeakBytes'] / 2**20:>9.0f}{stage['peakGrowthBytes'] / 2**20:>6.0f}")
+        if self.captured is not None:
+            print(f"captured {self.capture} of {self.captureStage}")
+
+@contextmanager
+def stage(name: str, rows: int = 0):
+    """Record a span of a stage in the active profile, if there is one"""
+    profile = activeProfile
+    span = Span(name, rows)
+    if profile is None:
+        yield span
+        return
+    profile.enter(span)
+    try:
+        yield span
+    finally:
+        profile.exit(span)
+
+def start(capture: Optional[str] = None, captureStage: Optional[str] = None) -> Profile:
+    """Start recording every stage"""
+    global activeProfile
+    activeProfile = Profile(capture, captureStage)
+    return activeProfile
+
+def stop() -> Optional[Profile]:
+    """Stop recording and hand back the profile"""
+    global activeProfile
+    profile, activeProfile = activeProfile, None
+    return profile
+
+def addArguments(parser):
+    """The profiling options every script takes"""
+    parser.add_argument("--profile", metavar="REPORT", help="record every stage and write a JSON report here")
+    parser.add_argument("--trace", metavar="TRACE", help="with --profile, also write a Chrome trace of the stages")
+    parser.add_argument("--capture", choices=CAPTURES,
+                        help="with --profile, capture one stage with cProfile or tracemalloc, by default the "
+                             "slowest in the report already at the --profile path")
+    parser.add_argument("--capture-stage", choices=STAGES,
+                        help="stage to capture instead of the slowest one of the earlier report")
+
+def slowestStage(reportPath: str) -> Optional[str]:
+    """Stage with the most time of its own in a report, None when there's no report or it has no stages"""
+    try:
+        with open(reportPath, 'r') as f:
+            stages = json.load(f).get("stages", {})
+    except (OSError, ValueError):
+        return None
+    stages = {name: stage for name, stage in stages.items() if name in STAGES}
+    if not stages:
+        return None
+    return max(stages, key=lambda name: stages[name]["selfSeconds"])
+
+@contextmanager
+def profiled(args):
+    """Profile the block when the parsed arguments ask for it, writing the report even if it fails"""
+    if not args.profile:
+        yield None
+        return
+    captureStage = args.capture_stage
+    if args.capture and not captureStage:
+        # the slowest stage of the last run, whose report this one is about to replace
+        captureStage = slowestStage(args.profile)
+        if captureStage is None:
+            raise SystemExit(f"no earlier report at {args.profile} to find the slowest stage in, profile once "
+                             "without --capture or pick one with --capture-stage")
+        print("capturing", args.capture, "of the slowest stage,", captureStage)
+    profile = start(args.capture, captureStage)
+    try:
+        yield profile
+    finally:
+        stop()
+        profile.write(args.profile, args.trace)
+        profile.printSummary()
+        print("wrote profile report to", args.profile)
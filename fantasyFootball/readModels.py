@@ -0,0 +1,90 @@
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+# Small precomputed documents for the clients, built from the player/defense documents
+# as they stream to Firestore:
+#   leaderboards/{year}/weeks/{week}  everyone who scored that week, by points, split by position
+#   seasonTotals/{year}               season totals per player and defense, by points
+LEADERBOARD_COLLECTION = "leaderboards"
+SEASON_COLLECTION = "seasonTotals"
+
+# how many players the overall (all positions) board of a week keeps
+OVERALL_LEADERS = 50
+
+Document = Tuple[str, str, Dict[str, Any]]
+
+def byPoints(entries):
+    """Highest points first, ties by id so rebuilt documents hash the same"""
+    return sorted(entries, key=lambda entry: (-entry["points"], entry["id"]))
+
+def weekLeaderboard(year: str, week: str, players, defense) -> Dict[str, Any]:
+    positions = {}
+    for entry in byPoints(players):
+        if entry["position"]:
+            positions.setdefault(entry["position"], []).append(entry)
+    return {
+        "year": int(year),
+        "week": int(week),
+        "leaders": byPoints(players)[:OVERALL_LEADERS],
+        "positions": dict(sorted(positions.items())),
+        "defense": byPoints(defense)
+    }
+
+def seasonTotals(year: str, players, defense) -> Dict[str, Any]:
+    return {
+        "year": int(year),
+        "players": byPoints(players.values()),
+        "defense": byPoints(defense.values())
+    }
+
+def playerInfo(playerId: str, roster: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": playerId, "name": roster.get("name"), "position": roster.get("position"), "team": roster.get("team")}
+
+def defenseInfo(team: str) -> Dict[str, Any]:
+    return {"id": team, "position": "DST", "team": team}
+
+def weekEntry(info: Dict[str, Any], stats) -> Dict[str, Any]:
+    """A player's or defense's line on a week's board"""
+    # zero stats are left out to keep the boards small, points always stays
+    entry = {**info, "points": stats.get("points", 0)}
+    entry.update((key, value) for key, value in stats.items() if value)
+    return entry
+
+def weekLeaderboardDocument(year: int, week: int, playerWeeks, defenseWeeks, rosters) -> Document:
+    """One week's leaderboard from just that week's results (as getWeekResults returns them) and the
+    rosters of its players, the same document withReadModels builds from the whole store"""
+    players = [weekEntry(playerInfo(playerId, rosters.get(playerId, {})), stats) for playerId, stats in playerWeeks.items()]
+    defense = [weekEntry(defenseInfo(team), stats) for team, stats in defenseWeeks.items()]
+    return f"{LEADERBOARD_COLLECTION}/{year}/weeks", str(week), weekLeaderboard(str(year), str(week), players, defense)
+
+def addTotals(totals: Dict[str, Any], stats: Dict[str, int]):
+    totals["games"] += 1
+    for key, value in stats.items():
+        totals[key] = totals.get(key, 0) + value
+
+def withReadModels(documents: Iterable[Document]) -> Iterator[Document]:
+    """Pass the player and defense documents through, then yield the read models built from them"""
+    weeks = {}    # (year, week) -> ([player entries], [defense entries])
+    seasons = {}  # year -> ({player_id: totals}, {team: totals})
+
+    for collection, docId, doc in documents:
+        yield collection, docId, doc
+        if collection == "players":
+            player = playerInfo(docId, doc["roster"])
+            scoring = doc["scoring"]
+        elif collection == "defense":
+            player = defenseInfo(docId)
+            scoring = doc
+        else:
+            continue
+        side = 0 if collection == "players" else 1
+        for year, yearData in scoring.items():
+            season = seasons.setdefault(year, ({}, {}))[side]
+            totals = season.setdefault(docId, {**player, "games": 0})
+            for week, stats in yearData.items():
+                weeks.setdefault((year, week), ([], []))[side].append(weekEntry(player, stats))
+                addTotals(totals, stats)
+
+    for (year, week), (players, defense) in sorted(weeks.items(), key=lambda item: (item[0][0], int(item[0][1]))):
+        yield f"{LEADERBOARD_COLLECTION}/{year}/weeks", week, weekLeaderboard(year, week, players, defense)
+    for year, (players, defense) in sorted(seasons.items()):
+        yield SEASON_COLLECTION, year, seasonTotals(year, players, defense)
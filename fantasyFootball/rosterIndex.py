@@ -0,0 +1,43 @@
+from typing import Any, Dict, Optional
+import pandas as pd
+
+# positions kept on the fantasy roster (kickers too)
+ROSTER_POSITIONS = ['QB', 'RB', 'WR', 'TE', 'K']
+
+def rosterTable(allPlayers) -> pd.DataFrame:
+    """Fantasy players of a seasonal roster frame as one name/position/team row per player_id.
+    A player listed more than once keeps their last listing, in the order they first appear"""
+    players = allPlayers[allPlayers['position'].isin(ROSTER_POSITIONS)]
+    latest = players.drop_duplicates('player_id', keep='last').set_index('player_id')
+    order = players['player_id'].drop_duplicates()
+    return latest.loc[order, ['player_name', 'position', 'team']].rename(columns={'player_name': 'name'})
+
+def rosterRecords(table: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Roster table as the player_id -> {name, position, team} dicts the store keeps"""
+    return table.to_dict('index')
+
+def positionIndex(roster: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """player_id -> position/team lookup table for the stored roster. Map it onto a categorical
+    id column of a play frame (mapRoster) and each distinct player is only looked up once"""
+    return pd.DataFrame({
+        "position": pd.Categorical([info.get("position") for info in roster.values()]),
+        "team": pd.Categorical([info.get("team") for info in roster.values()])
+    }, index=pd.Index(list(roster), dtype=object, name='player_id'))
+
+def weeklyPositionIndex(weeklyRosters) -> pd.DataFrame:
+    """(player_id, week) -> position/team lookup table from weekly roster frames, for players whose
+    listing changes during the season"""
+    listings = weeklyRosters.drop_duplicates(['player_id', 'week'], keep='last')
+    return listings.set_index(['player_id', 'week'])[['position', 'team']]
+
+def positionsForWeek(index: pd.DataFrame, weeklyIndex: Optional[pd.DataFrame], week: int) -> pd.Series:
+    """Position of every rostered player in one week: their season listing, or that week's when there is one"""
+    positions = index['position'].astype(object)
+    if weeklyIndex is None or week not in weeklyIndex.index.get_level_values('week'):
+        return positions
+    thisWeek = weeklyIndex.xs(week, level='week')['position'].astype(object)
+    return thisWeek.reindex(positions.index).fillna(positions)
+
+def mapRoster(playerIds: pd.Series, lookup: pd.Series) -> pd.Series:
+    """Look every id of a player id column up in a player_id-keyed Series, missing players give NaN"""
+    return playerIds.map(lookup).astype(object)
@@ -1,41 +1,252 @@
-import nfl_data_py as nfl
+import inputCache
+import matchups
+import profiling
+import scoringRules
+import rosterIndex
 from scoring import yardageScoring, tdScoring, fgScoring, dstScoring
-from localStorage import syncToFirebase, saveToFiles, loadFromFiles
-from firebaseSetup import db
-import sys
+from localStorage import (saveToFiles, getWeekResults, storeWeekResults, getRoster,
+                          clearWeek, getWeekFingerprint, setWeekFingerprint, useWorkerStore, acquireWriter)
+from firebaseSetup import getDb
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import hashlib
+import itertools
+import pandas as pd
 
-def scoreWeek(playByPlaydf, weeklydf, year, week):
-    # Load existing data if available
-    loadFromFiles()
+# part of every week fingerprint along with the rules digest, bump it when the scoring code
+# changes how the rules are applied so every week is rescored
+RULES_VERSION = 1
+
+# columns scoreWeek itself reads, on top of what each scoring module declares
+SCORE_WEEK_PLAY_COLUMNS = {
+    'week': 'int8',
+    'touchdown': 'int8',
+    'field_goal_result': 'category',
+    'extra_point_result': 'category'
+}
+SCORE_WEEK_WEEKLY_COLUMNS = {
+    'week': 'int8'
+}
+
+# the projection loaded from the cache is just the union of the declarations
+PLAY_COLUMNS = inputCache.unionColumns(
+    SCORE_WEEK_PLAY_COLUMNS, tdScoring.PLAY_COLUMNS, fgScoring.PLAY_COLUMNS, dstScoring.PLAY_COLUMNS
+)
+WEEKLY_COLUMNS = inputCache.unionColumns(SCORE_WEEK_WEEKLY_COLUMNS, yardageScoring.WEEKLY_COLUMNS)
+
+# input columns holding player ids, their roster positions are part of the fingerprint
+PLAYER_ID_COLUMNS = ('passer_player_id', 'td_player_id', 'kicker_player_id')
+
+def weekFingerprint(weekPlays, weekPlayers, positions, rules=None):
+    """Content hash of everything a week is scored from: the scoring rules, its play-by-play and
+    weekly rows and the roster positions (a player_id -> position Series) of the players in them"""
+    rules = rules or scoringRules.DEFAULT
+    digest = hashlib.sha256(f"rules {RULES_VERSION} {rules.digest}".encode())
+    for name, rows in (("plays", weekPlays), ("players", weekPlayers)):
+        digest.update(f"{name} {len(rows)}".encode())
+        for column in sorted(rows.columns):
+            digest.update(column.encode())
+            digest.update(pd.util.hash_pandas_object(rows[column], index=False).to_numpy().tobytes())
+
+    playerIds = set(weekPlayers['player_id'].dropna()) if 'player_id' in weekPlayers else set()
+    for column in PLAYER_ID_COLUMNS:
+        if column in weekPlays:
+            playerIds.update(weekPlays[column].dropna())
+    playerIds = sorted(playerIds)
+    for playerId, position in zip(playerIds, positions.reindex(playerIds).tolist()):
+        digest.update(f"{playerId} {None if pd.isna(position) else position}".encode())
+    return digest.hexdigest()
+
+def partitionByWeek(df):
+    """Split a season frame into per-week frames in one pass"""
+    return {week: rows for week, rows in df.groupby('week', sort=True)}
+
+def scoreWeek(weekPlays, weekPlayers, year, week, save=True, fingerprint=None, rules=None, positions=None):
+    # start from zero so rescoring replaces the week's previous results instead of adding to them
+    clearWeek(year, week)
 
     # yardage scoring and 2 point conversions
-    playerRows = weeklydf[(weeklydf['week'] == week)]
-    yardageScoring.scoreYardage(playerRows, week, year)
-    print("did yardage scoring for", playerRows.shape[0], "players")
+    with profiling.stage("yardage", len(weekPlayers)):
+        yardageScoring.scoreYardage(weekPlayers, week, year, rules)
+    print("did yardage scoring for", weekPlayers.shape[0], "players")
+
+    with profiling.stage("filter", len(weekPlays)):
+        touchdownRows = weekPlays[weekPlays['touchdown'] == 1]
+        fgRows = weekPlays[(weekPlays['field_goal_result'] == 'made') | (weekPlays['extra_point_result'] == 'good')]
 
     # increment score/data with tds
-    touchdownRows = playByPlaydf[(playByPlaydf['touchdown'] == 1) & (playByPlaydf['week'] == week)]
-    tdScoring.score(touchdownRows, week, year)
+    with profiling.stage("touchdowns", len(touchdownRows)):
+        tdScoring.score(touchdownRows, week, year, rules, positions)
     print("did touchdown scoring for", touchdownRows.shape[0], "rows")
 
     # field goals and extra points
-    fgRows = playByPlaydf[((playByPlaydf['field_goal_result'] == 'made') | (playByPlaydf['extra_point_result'] == 'good')) & (playByPlaydf['week'] == week)]
-    fgScoring.scoreFg(fgRows, week, year)
+    with profiling.stage("kicks", len(fgRows)):
+        fgScoring.scoreFg(fgRows, week, year, rules)
     print("did fg and extra point scoring for", fgRows.shape[0], "kicks")
 
     # defense and special teams scoring
-    dstScoring.scoreDST(playByPlaydf, week, year)
+    with profiling.stage("dst", len(weekPlays)):
+        dstScoring.scoreDST(weekPlays, week, year, rules)
     print("did defense and special teams scoring")
+
+    if fingerprint is not None:
+        setWeekFingerprint(year, week, fingerprint)
     
-    # Save all data to files
+    # Save the week's shard
+    if save:
+        saveToFiles()
+
+def scoreWeekWorker(weekPlays, weekPlayers, year, week, rules=None, positions=None):
+    """Score one week in a worker process and hand back just that week's results"""
+    scoreWeek(weekPlays, weekPlayers, year, week, save=False, rules=rules, positions=positions)
+    return getWeekResults(year, week)
+
+def changedUnits(units, force=False, rules=None, weeklyIndexes=None, seasonRosters=None):
+    """Fingerprint each (year, week, weekPlays, weekPlayers) unit and drop the ones already scored from
+    identical inputs, yielding (year, week, weekPlays, weekPlayers, fingerprint, positions) for the rest.
+    weeklyIndexes optionally maps a year to its (player_id, week) roster index for per-week positions,
+    seasonRosters a year to that season's roster listings, which take precedence over the stored roster"""
+    index = None
+    indexYear = None
+    for year, week, weekPlays, weekPlayers in units:
+        if index is None or (seasonRosters and year != indexYear):
+            # one roster lookup table for every unit (of a season, with season rosters), built once it's needed
+            roster = getRoster()
+            roster.update((seasonRosters or {}).get(year, {}))
+            index = rosterIndex.positionIndex(roster)
+            indexYear = year
+        positions = rosterIndex.positionsForWeek(index, (weeklyIndexes or {}).get(year), week)
+        fingerprint = weekFingerprint(weekPlays, weekPlayers, positions, rules)
+        if not force and getWeekFingerprint(year, week) == fingerprint:
+            print("week", week, "of", year, "is unchanged, skipping")
+            continue
+        yield year, week, weekPlays, weekPlayers, fingerprint, positions
+
+def mergeWeek(year, week, fingerprint, future):
+    """Store a worker's results for its week in place of whatever the week held"""
+    playerData, teamData = future.result()
+    clearWeek(year, week)
+    storeWeekResults(year, week, playerData, teamData)
+    setWeekFingerprint(year, week, fingerprint)
+
+def scoreUnits(units, jobs=1, force=False, rules=None, weeklyIndexes=None, seasonRosters=None, saveEvery=1):
+    """Score (year, week, weekPlays, weekPlayers) units whose inputs changed, in parallel when jobs > 1.
+    The store is saved after every saveEvery weeks scored (0 for only once at the end) and when done,
+    so an interrupted run keeps the weeks saved before it"""
+    changed = changedUnits(units, force, rules, weeklyIndexes, seasonRosters)
+    if jobs <= 1:
+        for scored, (year, week, weekPlays, weekPlayers, fingerprint, positions) in enumerate(changed, 1):
+            scoreWeek(weekPlays, weekPlayers, year, week, save=saveEvery > 0 and scored % saveEvery == 0,
+                      fingerprint=fingerprint, rules=rules, positions=positions)
+        saveToFiles()
+        return
+
+    # workers get the roster as it is in this process, saved or not
+    with ProcessPoolExecutor(max_workers=jobs, initializer=useWorkerStore, initargs=(getRoster(),)) as pool:
+        # no more than jobs weeks are submitted ahead, so units are loaded (and a backfill checks its
+        # memory ceiling) as workers finish rather than all up front
+        pending = deque()
+        merged = 0
+        for year, week, weekPlays, weekPlayers, fingerprint, positions in changed:
+            if len(pending) >= jobs:
+                # every week only touches its own keys, so merging in request order matches a serial run
+                mergeWeek(*pending.popleft())
+                merged += 1
+                if saveEvery > 0 and merged % saveEvery == 0:
+                    saveToFiles()
+            pending.append((year, week, fingerprint,
+                            pool.submit(scoreWeekWorker, weekPlays, weekPlayers, year, week, rules, positions)))
+            # the pool holds the frames until they're sent, don't keep them alive while the next unit loads
+            del weekPlays, weekPlayers
+        while pending:
+            mergeWeek(*pending.popleft())
     saveToFiles()
 
-if __name__ == "__main__":
-    year = int(sys.argv[1])
+def seasonUnits(year, weeks=None, refresh=False):
+    """Load one season and yield a scoring unit per requested week (every week with data when weeks is None)"""
+    with profiling.stage("fetch") as span:
+        playByPlaydf = inputCache.loadSource("pbp", year, PLAY_COLUMNS, refresh)
+        weeklydf = inputCache.loadSource("weekly", year, WEEKLY_COLUMNS, refresh)
+        span.rows = len(playByPlaydf) + len(weeklydf)
 
-    playByPlaydf = nfl.import_pbp_data([year], downcast=False, cache=False, alt_path=None)
-    weeklydf = nfl.import_weekly_data([year], downcast=False)
+    # split the season once so each week only touches its own rows, then let go of the season frames
+    with profiling.stage("filter", len(playByPlaydf) + len(weeklydf)):
+        playsByWeek = partitionByWeek(playByPlaydf)
+        playersByWeek = partitionByWeek(weeklydf)
+    noPlays = playByPlaydf.iloc[0:0]
+    noPlayers = weeklydf.iloc[0:0]
+    del playByPlaydf, weeklydf
 
-    for i in range(2, len(sys.argv)):
-        scoreWeek(playByPlaydf, weeklydf, year, int(sys.argv[i]))
-    
+    if weeks is None:
+        weeks = [int(week) for week in sorted(set(playsByWeek) | set(playersByWeek))]
+    else:
+        weeks = list(dict.fromkeys(weeks))
+    for week in weeks:
+        # handed over and forgotten, so a week's rows are freed once it has been scored
+        yield year, week, playsByWeek.pop(week, noPlays), playersByWeek.pop(week, noPlayers)
+
+def parseYears(text):
+    """Seasons from one season (2023), a range (2021-2023) or a list of both (2019,2021-2023)"""
+    years = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        try:
+            years.extend(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"not a season or range of seasons: {part}") from None
+    return list(dict.fromkeys(years))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score NFL weeks into local storage")
+    parser.add_argument("years", type=parseYears, help="season, range of seasons (2021-2023) or list of them (2019,2022)")
+    parser.add_argument("weeks", type=int, nargs="+", help="weeks to score in every season")
+    parser.add_argument("--jobs", type=int, default=1, help="score weeks in this many worker processes")
+    parser.add_argument("--refresh", action="store_true", help="refetch the nflverse inputs even if the cache is fresh")
+    parser.add_argument("--offline", action="store_true", help="only read nflverse inputs from the local cache")
+    parser.add_argument("--force", action="store_true", help="rescore weeks even if their inputs haven't changed")
+    parser.add_argument("--weekly-rosters", action="store_true",
+                        help="use each week's roster listing for positions instead of the season roster")
+    parser.add_argument("--rules", help="score with a TOML rules file instead of the league defaults")
+    parser.add_argument("--live", action="store_true", help="keep polling for new plays of the (first) week and score them as they happen")
+    parser.add_argument("--replay", help="live mode: replay a saved play-by-play file instead of polling nflverse")
+    parser.add_argument("--plays-per-poll", type=int, default=10, help="live replay: plays released per game on each poll")
+    parser.add_argument("--interval", type=float, default=15, help="live mode: seconds between polls")
+    parser.add_argument("--sync", action="store_true", help="live mode: sync to Firebase after every poll with new plays")
+    parser.add_argument("--matchups", action="store_true",
+                        help="afterwards, write fantasy matchup scores and standings through the last week to Firestore")
+    profiling.addArguments(parser)
+    args = parser.parse_args()
+
+    inputCache.offline = inputCache.offline or args.offline
+    rules = scoringRules.loadRules(args.rules) if args.rules else None
+    # fail now rather than after the first week if another scorer is writing the store
+    acquireWriter()
+    with profiling.profiled(args):
+        if args.live:
+            # pulls in the live play columns and sources, only live runs need them
+            import liveScoring
+            year, week = args.years[0], args.weeks[0]
+            if args.replay:
+                source = liveScoring.FileReplaySource(args.replay, week, args.plays_per_poll)
+            else:
+                source = liveScoring.NflverseSource(year, week)
+            liveScoring.runLive(year, week, source, args.interval, getDb() if args.sync else None, rules=rules)
+        else:
+            weeklyIndexes = None
+            if args.weekly_rosters:
+                weeklyIndexes = {}
+                for year in args.years:
+                    with profiling.stage("fetch") as span:
+                        weeklyRosters = inputCache.loadSource("weeklyRosters", year,
+                                                              ['player_id', 'week', 'position', 'team'], args.refresh)
+                        span.rows = len(weeklyRosters)
+                    weeklyIndexes[year] = rosterIndex.weeklyPositionIndex(weeklyRosters)
+            # one queue of units across the seasons, each season is loaded once its first week is reached
+            units = itertools.chain.from_iterable(seasonUnits(year, args.weeks, args.refresh) for year in args.years)
+            scoreUnits(units, args.jobs, args.force, rules, weeklyIndexes)
+        if args.matchups:
+            for year in args.years:
+                summary = matchups.updateMatchups(getDb(), year, max(args.weeks))
+                print(f"Updated {year} matchups: {summary['written']} written, {summary['skipped']} unchanged")
+        
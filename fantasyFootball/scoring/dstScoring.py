@@ -1,191 +1,160 @@
-from localStorage import storeDefenseData, getDefenseData
-import re
-
-def getLateralReturnYards(description):
-    # Normalize case
-    desc = description.lower()
-    if 'lateral' not in desc:
-        return None  # No lateral, skip
-
-    # Find all "to [Team Abbrev] [Yard Line] for X yards" patterns
-    yard_chunks = re.findall(r'for (\d+) yards?', desc)
-    
-    # Convert to integers and sum
-    if yard_chunks:
-        return sum(int(y) for y in yard_chunks)
-    
-    return None
-
-def scoreDST(playByPlaydf, week, year):
-    # defensive touchdown
-    touchdownRows = playByPlaydf[(playByPlaydf['return_touchdown'] == 1) & (playByPlaydf['week'] == week)]
-    for _, row in touchdownRows.iterrows():
-        defTeam = row['td_team']
-        score = 10
-
-        defData = getDefenseData(defTeam, year, week)
-        defData.update({
-            "points": defData.get("points", 0) + score,
-            "touchdowns": defData.get("touchdowns", 0) + 1
+import numpy as np
+import pandas as pd
+from localStorage import storeDefenseDataBulk, getDefenseData
+import scoringRules
+
+# play-by-play columns this module reads and how to load them (see inputCache.COLUMN_TYPES)
+PLAY_COLUMNS = {
+    'week': 'int8',
+    'game_id': 'category',
+    'play_id': 'float32',
+    'home_team': 'team',
+    'away_team': 'team',
+    'home_score': 'float32',
+    'away_score': 'float32',
+    'posteam': 'team',
+    'defteam': 'team',
+    'td_team': 'team',
+    'return_team': 'team',
+    'fumble_recovery_1_team': 'team',
+    'return_touchdown': 'int8',
+    'interception': 'int8',
+    'fumble_lost': 'int8',
+    'kickoff_attempt': 'int8',
+    'punt_attempt': 'int8',
+    'sack': 'int8',
+    'safety': 'int8',
+    'defensive_extra_point_conv': 'int8',
+    'return_yards': 'float32',
+    'lateral_return': 'int8',
+    'desc': 'object'
+}
+
+# counted defensive events (scored per scoringRules) plus combined punt + kickoff return yards
+DEFENSE_STATS = list(scoringRules.DEFENSE_EVENTS) + ["returnYards"]
+
+# every "for X yards" chunk of a lateral return description
+LATERAL_YARDS_PATTERN = r'for (\d+) yards?'
+
+def returnYards(returnRows):
+    """Return yards per play, using the summed lateral chunks from the description when there was a lateral"""
+    yards = returnRows['return_yards'].to_numpy(dtype=np.float64, na_value=np.nan).copy()
+    desc = returnRows['desc'].str.lower()
+    lateral = ((returnRows['lateral_return'] == 1) & desc.str.contains('lateral', regex=False, na=False)).to_numpy()
+    if lateral.any():
+        chunks = desc[lateral].reset_index(drop=True).str.extractall(LATERAL_YARDS_PATTERN)[0]
+        lateralYards = chunks.astype(np.int64).groupby(level=0).sum()
+        # laterals without any "for X yards" chunk keep their return_yards
+        if not lateralYards.empty:
+            yards[np.flatnonzero(lateral)[lateralYards.index.to_numpy(dtype=np.int64)]] = lateralYards.to_numpy()
+    return yards
+
+def creditedEvents(plays):
+    """Resolve the credited team for every scoring defensive or return play, one row per event"""
+    def event(mask, team, stat, value=1):
+        # value is either a constant or already aligned with the masked rows
+        mask = mask.to_numpy()
+        return pd.DataFrame({
+            "week": plays['week'].to_numpy()[mask],
+            "team": team.to_numpy()[mask],
+            stat: value
         })
-        storeDefenseData(defTeam, year, week, defData)
-
-
-    # turnovers
-    turnoverRows = playByPlaydf[
-        (playByPlaydf['week'] == week) & (
-            (playByPlaydf['interception'] == 1) |
-            (
-                (playByPlaydf['fumble_lost'] == 1) & (
-                    (playByPlaydf['fumble_recovery_1_team'] == playByPlaydf['defteam']) |
-                    (
-                        # Special teams muff recovery:
-                        (playByPlaydf['kickoff_attempt'] == 1) |
-                        (playByPlaydf['punt_attempt'] == 1)
-                    ) &
-                    (playByPlaydf['fumble_recovery_1_team'] == playByPlaydf['posteam'])  # posteam = kicking team on kicks
-                )
-            )
-        )
-    ]
-    for _, row in turnoverRows.iterrows():
-        # Use fumble recovery team as the defense if it's on special teams
-        if row['fumble_lost'] == 1 and row['fumble_recovery_1_team'] != row['defteam']:
-            defTeam = row['fumble_recovery_1_team']
-        else:
-            defTeam = row['defteam']
-        score = 2
-
-        defData = getDefenseData(defTeam, year, week)
-        defData.update({
-            "points": defData.get("points", 0) + score,
-            "turnovers": defData.get("turnovers", 0) + 1
-        })
-        storeDefenseData(defTeam, year, week, defData)
-
-    # sacks
-    sackRows = playByPlaydf[(playByPlaydf['sack'] == 1) & (playByPlaydf['week'] == week)]
-    for _, row in sackRows.iterrows():
-        defTeam = row['defteam']
-        score = 1
-
-        defData = getDefenseData(defTeam, year, week)
-        defData.update({
-            "points": defData.get("points", 0) + score,
-            "sacks": defData.get("sacks", 0) + 1
-        })
-        storeDefenseData(defTeam, year, week, defData)
-
-    # safety
-    safetyRows = playByPlaydf[(playByPlaydf['safety'] == 1) & (playByPlaydf['week'] == week)]
-    for _, row in safetyRows.iterrows():
-        defTeam = row['defteam']
-        score = 12
-
-        defData = getDefenseData(defTeam, year, week)
-        defData.update({
-            "points": defData.get("points", 0) + score,
-            "safeties": defData.get("safeties", 0) + 1
-        })
-        storeDefenseData(defTeam, year, week, defData)
-
-    # defense blocks PAT and returns it for PAT, defense intercepts or recovers fumble of 2 pt conversion and returns it
-    specialRows = playByPlaydf[(playByPlaydf['defensive_extra_point_conv'] == 1) & (playByPlaydf['week'] == week)]
-    for _, row in specialRows.iterrows():
-        defTeam = row['defteam']
-        score = 12
-
-        defData = getDefenseData(defTeam, year, week)
-        defData.update({
-            "points": defData.get("points", 0) + score,
-            "returned2pts": defData.get("returned2pts", 0) + 1
-        })
-        storeDefenseData(defTeam, year, week, defData)
 
-    # combined punt + kickoff return yards (no point updates)
-    returnRows = playByPlaydf[((playByPlaydf['punt_attempt'] == 1) | (playByPlaydf['kickoff_attempt'] == 1)) & (playByPlaydf['week'] == week)]
-    for _, row in returnRows.iterrows():
-        if row['return_team'] is not None:
-            returnTeam = row['return_team']
-            yards = row['return_yards']
-            
-            if row['lateral_return'] == 1:   
-                description = row['desc']
-                lateralYards = getLateralReturnYards(description)
-                if lateralYards is not None:
-                    yards = lateralYards
-
-            defData = getDefenseData(returnTeam, year, week)
-            defData.update({
-                "returnYards": defData.get("returnYards", 0) + yards
-            })
-            storeDefenseData(returnTeam, year, week, defData)
-
-    # end of game check for points allowed and add points for return yards
-    weekGames = playByPlaydf[(playByPlaydf['week'] == week)]
-    finalPlays = weekGames.sort_values(['game_id', 'play_id']).groupby('game_id').tail(1)
-    for _, row in finalPlays.iterrows():
-        homeTeam = row['home_team']
-        awayTeam = row['away_team']
-        homeTeamPoints = row['home_score']
-        awayTeamPoints = row['away_score']
-        homeScore = 0
-        awayScore = 0
-        
-        if homeTeamPoints == 0:
-            awayScore = 12
-        elif 1 <= homeTeamPoints <= 3:
-            awayScore = 9
-        elif 4 <= homeTeamPoints <= 6:
-            awayScore = 6
-        elif 7 <= homeTeamPoints <= 10:
-            awayScore = 3
-
-        if awayTeamPoints == 0:
-            homeScore = 12
-        elif 1 <= awayTeamPoints <= 3:
-            homeScore = 9
-        elif 4 <= awayTeamPoints <= 6:
-            homeScore = 6
-        elif 7 <= awayTeamPoints <= 10:
-            homeScore = 3
-
-        # Update home team data
-        homeData = getDefenseData(homeTeam, year, week)
-        homeData.update({
-            "points": homeData.get("points", 0) + homeScore,
-            "pointsAllowed": awayTeamPoints
-        })
-        storeDefenseData(homeTeam, year, week, homeData)
-
-        # Update away team data
-        awayData = getDefenseData(awayTeam, year, week)
-        awayData.update({
-            "points": awayData.get("points", 0) + awayScore,
-            "pointsAllowed": homeTeamPoints
-        })
-        storeDefenseData(awayTeam, year, week, awayData)
-
-        # Add points for return yards
-        totalReturnYards = homeData.get("returnYards", 0)
-        if 75 <= totalReturnYards <= 99:
-            homeData["points"] = homeData.get("points", 0) + 3
-        elif 100 <= totalReturnYards <= 149:
-            homeData["points"] = homeData.get("points", 0) + 6
-        elif 150 <= totalReturnYards:
-            homeData["points"] = homeData.get("points", 0) + 9
-        storeDefenseData(homeTeam, year, week, homeData)
-
-        totalReturnYards = awayData.get("returnYards", 0)
-        if 75 <= totalReturnYards <= 99:
-            awayData["points"] = awayData.get("points", 0) + 3
-        elif 100 <= totalReturnYards <= 149:
-            awayData["points"] = awayData.get("points", 0) + 6
-        elif 150 <= totalReturnYards:
-            awayData["points"] = awayData.get("points", 0) + 9
-        storeDefenseData(awayTeam, year, week, awayData)
-    
-
-    
+    defteam = plays['defteam']
+    recoveryTeam = plays['fumble_recovery_1_team']
+    fumbleLost = plays['fumble_lost'] == 1
+    kickPlay = (plays['kickoff_attempt'] == 1) | (plays['punt_attempt'] == 1)
 
+    # turnovers, including special teams muffs recovered by the kicking team (posteam on kicks)
+    turnover = (plays['interception'] == 1) | (
+        fumbleLost & ((recoveryTeam == defteam) | (kickPlay & (recoveryTeam == plays['posteam'])))
+    )
+    # use fumble recovery team as the defense if it's on special teams
+    turnoverTeam = defteam.where(~(fumbleLost & (recoveryTeam != defteam)), recoveryTeam)
 
+    # combined punt + kickoff return yards (no point updates)
+    returned = kickPlay & plays['return_team'].notna()
+
+    return pd.concat([
+        event(plays['return_touchdown'] == 1, plays['td_team'], "touchdowns"),
+        event(turnover, turnoverTeam, "turnovers"),
+        event(plays['sack'] == 1, defteam, "sacks"),
+        event(plays['safety'] == 1, defteam, "safeties"),
+        # defense blocks PAT and returns it for PAT, defense intercepts or recovers fumble of 2 pt conversion and returns it
+        event(plays['defensive_extra_point_conv'] == 1, defteam, "returned2pts"),
+        event(returned, plays['return_team'], "returnYards", returnYards(plays[returned.to_numpy()]) if returned.any() else 0)
+    ], ignore_index=True)
+
+def pointsAllowed(plays):
+    """Final score against each team, taken from the last play of every game"""
+    finalPlays = plays.sort_values(['game_id', 'play_id']).groupby('game_id', observed=True).tail(1)
+    home = pd.DataFrame({
+        "week": finalPlays['week'].to_numpy(),
+        "team": finalPlays['home_team'].to_numpy(),
+        "pointsAllowed": finalPlays['away_score'].to_numpy()
+    })
+    away = pd.DataFrame({
+        "week": finalPlays['week'].to_numpy(),
+        "team": finalPlays['away_team'].to_numpy(),
+        "pointsAllowed": finalPlays['home_score'].to_numpy()
+    })
+    # interleave so teams keep the home, away order of each game
+    return pd.concat([home, away]).sort_index(kind='stable').reset_index(drop=True)
+
+def combineDefense(totals, allowed):
+    """Join event totals with points allowed, teams that only show up in the final scores come after those with events"""
+    index = totals.index.append(allowed.index.difference(totals.index, sort=False))
+    totals = totals.reindex(index)
+    totals['pointsAllowed'] = allowed.reindex(index)
+    return totals
+
+def aggregateDefense(plays):
+    """Event counts, return yards and points allowed per (week, team) in one pass"""
+    totals = creditedEvents(plays).groupby(['week', 'team'], sort=False)[DEFENSE_STATS].sum()
+    allowed = pointsAllowed(plays).set_index(['week', 'team'])['pointsAllowed']
+    return combineDefense(totals, allowed)
+
+def defenseRecords(totals, current=None, rules=None):
+    """Stats to store for every team in a per-team totals frame, added onto the current records when given"""
+    rules = rules or scoringRules.DEFAULT
+    teams = totals.index.tolist()
+    if current is None:
+        stats = {stat: np.zeros(len(teams), dtype=np.int64) for stat in DEFENSE_STATS + ["points"]}
+    else:
+        stats = {stat: np.array([data.get(stat, 0) for data in current]) for stat in DEFENSE_STATS + ["points"]}
+    for stat in DEFENSE_STATS:
+        stats[stat] = stats[stat] + totals[stat].fillna(0).to_numpy()
+    stats["points"] = stats["points"] + sum(
+        points * totals[stat].fillna(0).to_numpy() for stat, points in rules.eventPoints.items()
+    )
+
+    # end of game points allowed and return yard bonus, for teams that played
+    allowed = totals['pointsAllowed'].to_numpy()
+    played = ~np.isnan(allowed)
+    allowedInt = np.where(played, allowed, 0).astype(np.int64)
+    returnYardsInt = stats["returnYards"].astype(np.int64)
+    stats["points"] = stats["points"] + np.where(
+        played,
+        rules.pointsAllowed(allowedInt) + rules.returnYards(returnYardsInt),
+        0
+    )
+
+    columns = {stat: values.astype(np.int64).tolist() for stat, values in stats.items()}
+    allowedList = allowedInt.tolist()
+    playedList = played.tolist()
+    teamData = {}
+    for i, team in enumerate(teams):
+        data = {stat: columns[stat][i] for stat in DEFENSE_STATS + ["points"]}
+        if playedList[i]:
+            data["pointsAllowed"] = allowedList[i]
+        teamData[team] = data
+    return teamData
+
+def scoreDST(weekPlays, week, year, rules=None):
+    totals = aggregateDefense(weekPlays).droplevel('week')
+    if totals.empty:
+        return
+
+    # add this week's events onto whatever is already stored for each team
+    current = [getDefenseData(team, year, week) for team in totals.index]
+    storeDefenseDataBulk(year, week, defenseRecords(totals, current, rules))
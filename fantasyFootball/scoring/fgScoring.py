@@ -1,40 +1,33 @@
-from localStorage import storePlayerData, getPlayerData
+import numpy as np
+import pandas as pd
+import scoringRules
+from localStorage import addPlayerData
 
-def scoreFg(fgRows, week, year):
-    for _, row in fgRows.iterrows():
-        score = 0
+# play-by-play columns this module reads and how to load them (see inputCache.COLUMN_TYPES)
+PLAY_COLUMNS = {
+    'field_goal_result': 'category',
+    'extra_point_result': 'category',
+    'kicker_player_id': 'category',
+    'kick_distance': 'float32'
+}
 
-        if row['field_goal_result'] == 'made':
-            playerId = row['kicker_player_id']
-            yards = row['kick_distance']
+def kickCredits(fgRows, rules=None):
+    """Points and made field goal/extra point counts per kicker for a frame of made kicks"""
+    rules = rules or scoringRules.DEFAULT
+    fieldGoal = (fgRows['field_goal_result'] == 'made').to_numpy()
+    extraPoint = ~fieldGoal & (fgRows['extra_point_result'] == 'good').to_numpy()
+    points = np.where(fieldGoal, rules.fieldGoalDistance(fgRows['kick_distance']),
+                      np.where(extraPoint, rules.extraPoint, 0))
+    credits = pd.DataFrame({
+        "player_id": fgRows['kicker_player_id'].astype(object).to_numpy(),
+        "points": points,
+        "fgm": fieldGoal.astype(np.int64),
+        "epm": extraPoint.astype(np.int64)
+    })[fieldGoal | extraPoint]
+    return credits.groupby('player_id', sort=False)[["points", "fgm", "epm"]].sum()
 
-            if yards <= 39:
-                score = 3
-            elif 40 <= yards <= 49:
-                score = 5
-            elif 50 <= yards <= 59:
-                score = 10
-            elif 60 <= yards <= 65:
-                score = 15
-            elif 66 <= yards:
-                score = 20
-
-            # Update kicker data
-            kickerData = getPlayerData(playerId, year, week)
-            kickerData.update({
-                "points": kickerData.get("points", 0) + score,
-                "fgm": kickerData.get("fgm", 0) + 1
-            })
-            storePlayerData(playerId, year, week, kickerData)
-            
-        elif row['extra_point_result'] == 'good':
-            playerId = row['kicker_player_id']
-            score = 1
-
-            # Update kicker data
-            kickerData = getPlayerData(playerId, year, week)
-            kickerData.update({
-                "points": kickerData.get("points", 0) + score,
-                "epm": kickerData.get("epm", 0) + 1
-            })
-            storePlayerData(playerId, year, week, kickerData)
+def scoreFg(fgRows, week, year, rules=None):
+    credits = kickCredits(fgRows, rules)
+    columns = {column: credits[column].tolist() for column in credits.columns}
+    for i, playerId in enumerate(credits.index):
+        addPlayerData(playerId, year, week, {column: values[i] for column, values in columns.items()})
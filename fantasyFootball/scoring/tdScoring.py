@@ -1,73 +1,44 @@
-from localStorage import storePlayerData, getPlayerData, getPlayerRoster
-
-def score(touchdownRows, week, year):
-    for _, row in touchdownRows.iterrows():
-        passerScore = 0
-        carrierScore = 0
-
-        if row['pass_touchdown']:
-            passerId = row['passer_player_id']
-            receiverId = row['td_player_id']
-            yards = row['yards_gained']
-
-            if yards <= 9:
-                carrierScore = 6
-                passerScore = 6
-            elif 10 <= yards <= 39:
-                carrierScore = 9
-                passerScore = 9
-            elif 40 <= yards <= 69:
-                carrierScore = 12
-                passerScore = 12
-            elif 70 <= yards:
-                carrierScore = 15
-                passerScore = 15
-            
-            passerPosition = getPlayerRoster(passerId).get("position")
-            receiverPosition = getPlayerRoster(receiverId).get("position")
-
-            if passerPosition != 'QB':
-                passerScore *= 2
-            if receiverPosition != 'WR' and receiverPosition != 'TE':
-                carrierScore *= 2
-
-            # Update passer data
-            passer_data = getPlayerData(passerId, year, week)
-            passer_data.update({
-                "points": passer_data.get("points", 0) + passerScore,
-                "passTds": passer_data.get("passTds", 0) + 1
-            })
-            storePlayerData(passerId, year, week, passer_data)
-
-            # Update receiver data
-            receiver_data = getPlayerData(receiverId, year, week)
-            receiver_data.update({
-                "points": receiver_data.get("points", 0) + carrierScore,
-                "recTds": receiver_data.get("recTds", 0) + 1
-            })
-            storePlayerData(receiverId, year, week, receiver_data)
-
-        elif row['rush_touchdown']:
-            rusherId = row['td_player_id']
-            yards = row['yards_gained']
-
-            if yards <= 9:
-                carrierScore = 6
-            elif 10 <= yards <= 39:
-                carrierScore = 9
-            elif 40 <= yards <= 69:
-                carrierScore = 12
-            elif 70 <= yards:
-                carrierScore = 15
-
-            position = getPlayerRoster(rusherId).get("position")
-            if position != 'RB':
-                carrierScore *= 2
-
-            # Update rusher data
-            rusher_data = getPlayerData(rusherId, year, week)
-            rusher_data.update({
-                "points": rusher_data.get("points", 0) + carrierScore,
-                "rushTds": rusher_data.get("rushTds", 0) + 1
-            })
-            storePlayerData(rusherId, year, week, rusher_data)
+import pandas as pd
+import rosterIndex
+import scoringRules
+from localStorage import addPlayerData, getRoster
+
+# play-by-play columns this module reads and how to load them (see inputCache.COLUMN_TYPES)
+PLAY_COLUMNS = {
+    'pass_touchdown': 'int8',
+    'rush_touchdown': 'int8',
+    'passer_player_id': 'category',
+    'td_player_id': 'category',
+    'yards_gained': 'float32'
+}
+
+# stats a touchdown is counted in besides points
+TD_STATS = ["passTds", "rushTds", "recTds"]
+
+def touchdownCredits(touchdownRows, positions, rules=None):
+    """Points and touchdown counts per player for a frame of touchdown plays, positions is a player_id -> position Series"""
+    rules = rules or scoringRules.DEFAULT
+    passRows = touchdownRows[touchdownRows['pass_touchdown'] == 1]
+    rushRows = touchdownRows[(touchdownRows['pass_touchdown'] != 1) & (touchdownRows['rush_touchdown'] == 1)]
+
+    def credit(rows, idColumn, multiplier, stat):
+        playerIds = rows[idColumn].astype(object)
+        # distance points, multiplied for players scoring outside their usual role
+        points = rules.touchdownDistance(rows['yards_gained']) * multiplier(rosterIndex.mapRoster(rows[idColumn], positions))
+        return pd.DataFrame({"player_id": playerIds.to_numpy(), "points": points,
+                             **{name: int(name == stat) for name in TD_STATS}})
+
+    credits = pd.concat([
+        credit(passRows, 'passer_player_id', rules.passerMultiplier, "passTds"),
+        credit(passRows, 'td_player_id', rules.receiverMultiplier, "recTds"),
+        credit(rushRows, 'td_player_id', rules.rusherMultiplier, "rushTds")
+    ], ignore_index=True)
+    return credits.groupby('player_id', sort=False)[["points"] + TD_STATS].sum()
+
+def score(touchdownRows, week, year, rules=None, positions=None):
+    if positions is None:
+        positions = rosterIndex.positionIndex(getRoster())['position']
+    credits = touchdownCredits(touchdownRows, positions, rules)
+    columns = {column: credits[column].tolist() for column in credits.columns}
+    for i, playerId in enumerate(credits.index):
+        addPlayerData(playerId, year, week, {column: values[i] for column, values in columns.items()})
@@ -1,69 +1,60 @@
-from localStorage import storePlayerData
+import numpy as np
+import scoringRules
+from localStorage import storePlayerDataBulk
 
-def scoreYardage(playerRows, week, year):
-    for _, row in playerRows.iterrows():
-        score = 0
-        playerId = row['player_id']
-        passYds = row['passing_yards']
-        rushYds = row['rushing_yards']
-        recYds = row['receiving_yards']
-        numTwoPoints = row['passing_2pt_conversions'] + row['rushing_2pt_conversions'] + row['receiving_2pt_conversions']
+# weekly columns this module reads and how to load them (see inputCache.COLUMN_TYPES)
+WEEKLY_COLUMNS = {
+    'player_id': 'category',
+    'passing_yards': 'float32',
+    'rushing_yards': 'float32',
+    'receiving_yards': 'float32',
+    'passing_2pt_conversions': 'int8',
+    'rushing_2pt_conversions': 'int8',
+    'receiving_2pt_conversions': 'int8'
+}
 
-        # passing yards
-        if 200 <= passYds <= 299:
-            score += 6
-        elif 300 <= passYds <= 399:
-            score += 9
-        elif 400 <= passYds <= 499:
-            score += 12
-        elif 500 <= passYds:
-            score += 15
+def yardageColumns(playerRows, rules=None):
+    """Yardage and 2 point conversion points, with the yards they came from, as columns for every row of weekly player stats"""
+    rules = rules or scoringRules.DEFAULT
+    passYds = playerRows['passing_yards'].to_numpy().astype(np.int64)
+    rushYds = playerRows['rushing_yards'].to_numpy().astype(np.int64)
+    recYds = playerRows['receiving_yards'].to_numpy().astype(np.int64)
+    numTwoPoints = (playerRows['passing_2pt_conversions'].to_numpy()
+                    + playerRows['rushing_2pt_conversions'].to_numpy()
+                    + playerRows['receiving_2pt_conversions'].to_numpy()).astype(np.int64)
 
-        # rushing yards
-        if 50 <= rushYds <= 74:
-            score += 3
-        elif 75 <= rushYds <= 99:
-            score += 6
-        elif 100 <= rushYds <= 124:
-            score += 9
-        elif 125 <= rushYds <= 150:
-            score += 12
-        elif 150 <= rushYds <= 199:
-            score += 15
-        elif 200 <= rushYds:
-            score += 18
+    score = rules.passingYards(passYds) + rules.rushingYards(rushYds) + rules.receivingYards(recYds)
 
-        # receiving yards
-        if 50 <= recYds <= 74:
-            score += 3
-        elif 75 <= recYds <= 99:
-            score += 6
-        elif 100 <= recYds <= 124:
-            score += 9
-        elif 125 <= recYds <= 150:
-            score += 12
-        elif 150 <= recYds <= 199:
-            score += 15
-        elif 200 <= recYds:
-            score += 18
+    # combined yardage
+    combined = rules.combinedYards
+    score += np.where((rushYds >= combined["minRushing"]) & (recYds >= combined["minReceiving"])
+                      & ((rushYds + recYds) >= combined["minTotal"]), combined["points"], 0)
 
-        # combined yardage
-        if rushYds >= 20 and recYds >= 20 and (rushYds + recYds) >= 150:
-            score += 6
+    # 2 point conversions
+    score += numTwoPoints * rules.twoPointConversion
+    return score, passYds, rushYds, recYds, numTwoPoints
 
-        # 2 point conversions
-        score += (numTwoPoints * 2)
+def yardageStats(playerRows, rules=None):
+    """Yardage and 2 point conversion scoring for every row of weekly player stats"""
+    playerIds = playerRows['player_id'].to_numpy()
+    score, passYds, rushYds, recYds, numTwoPoints = yardageColumns(playerRows, rules)
 
-        playerData = {
-            "points": score,
-            "passYards": passYds,
-            "rushYards": rushYds,
-            "recYards": recYds,
+    playerData = {}
+    for playerId, points, passYards, rushYards, recYards, twoPoints in zip(
+            playerIds, score.tolist(), passYds.tolist(), rushYds.tolist(), recYds.tolist(), numTwoPoints.tolist()):
+        playerData[playerId] = {
+            "points": points,
+            "passYards": passYards,
+            "rushYards": rushYards,
+            "recYards": recYards,
             "passTds": 0,
             "rushTds": 0,
             "recTds": 0,
             "fgm": 0,
             "epm": 0,
-            "2pConvs": numTwoPoints
+            "2pConvs": twoPoints
         }
-        storePlayerData(playerId, year, week, playerData)
\ No newline at end of file
+    return playerData
+
+def scoreYardage(playerRows, week, year, rules=None):
+    storePlayerDataBulk(year, week, yardageStats(playerRows, rules))
@@ -0,0 +1,138 @@
+import copy
+import hashlib
+import json
+import tomllib
+from typing import Any, Dict, Optional
+import numpy as np
+import pandas as pd
+
+# The league's scoring rules as data. Brackets are [lower bound, points] bands in increasing order,
+# a value scores the points of the last band it reaches and 0 below the first one (-inf covers everything).
+# A rules file (TOML) only needs the parts that differ from these, see loadRules.
+INF = float("inf")
+DEFAULT_RULES = {
+    "yardage": {
+        "passing": [[200, 6], [300, 9], [400, 12], [500, 15]],
+        # 150 yards still falls in the 125-150 band
+        "rushing": [[50, 3], [75, 6], [100, 9], [125, 12], [151, 15], [200, 18]],
+        "receiving": [[50, 3], [75, 6], [100, 9], [125, 12], [151, 15], [200, 18]],
+        # bonus for players with enough rushing and receiving yards and enough of both together
+        "combined": {"minRushing": 20, "minReceiving": 20, "minTotal": 150, "points": 6},
+        "twoPointConversion": 2
+    },
+    "touchdown": {
+        "distance": [[-INF, 6], [10, 9], [40, 12], [70, 15]],
+        # distance points are multiplied for players scoring outside their usual role
+        "multiplier": {
+            "passer": {"default": 2, "QB": 1},
+            "receiver": {"default": 2, "WR": 1, "TE": 1},
+            "rusher": {"default": 2, "RB": 1}
+        }
+    },
+    "kicking": {
+        "fieldGoal": [[-INF, 3], [40, 5], [50, 10], [60, 15], [66, 20]],
+        "extraPoint": 1
+    },
+    "defense": {
+        "events": {"touchdowns": 10, "turnovers": 2, "sacks": 1, "safeties": 12, "returned2pts": 12},
+        "pointsAllowed": [[-INF, 12], [1, 9], [4, 6], [7, 3], [11, 0]],
+        # combined punt + kickoff return yards
+        "returnYards": [[75, 3], [100, 6], [150, 9]]
+    }
+}
+
+# defensive events the play-by-play is scored for, every rule set gives each of them points
+DEFENSE_EVENTS = ("touchdowns", "turnovers", "sacks", "safeties", "returned2pts")
+
+class Bracket:
+    """Banded points compiled to breakpoint/value arrays, looked up for a whole column at once"""
+
+    def __init__(self, bands):
+        lowerBounds = [lower for lower, _ in bands]
+        if lowerBounds != sorted(lowerBounds):
+            raise ValueError(f"bracket bands must be in increasing order: {bands}")
+        points = [points for _, points in bands]
+        if lowerBounds and lowerBounds[0] == -INF:
+            self.breaks = np.array(lowerBounds[1:], dtype=np.float64)
+            self.points = np.array(points, dtype=np.int64)
+        else:
+            self.breaks = np.array(lowerBounds, dtype=np.float64)
+            self.points = np.array([0] + points, dtype=np.int64)
+
+    def __call__(self, values) -> np.ndarray:
+        """Points for every value, missing values score 0"""
+        values = np.asarray(values, dtype=np.float64)
+        return np.where(np.isnan(values), 0, self.points[np.searchsorted(self.breaks, values, side='right')])
+
+class Multiplier:
+    """Per-position multiplier with a default for every other position"""
+
+    def __init__(self, table: Dict[str, int]):
+        self.default = table.get("default", 1)
+        self.byPosition = {position: factor for position, factor in table.items() if position != "default"}
+
+    def __call__(self, positions) -> np.ndarray:
+        return pd.Series(positions, dtype=object).map(self.byPosition).fillna(self.default).to_numpy(dtype=np.int64)
+
+class ScoringRules:
+    """A rule set compiled for vectorized scoring"""
+
+    def __init__(self, config: Dict[str, Any], name: str = "default"):
+        self.name = name
+        self.config = config
+        # part of every week's input fingerprint, so changing the rules rescores the weeks
+        self.digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+        yardage = config["yardage"]
+        self.passingYards = Bracket(yardage["passing"])
+        self.rushingYards = Bracket(yardage["rushing"])
+        self.receivingYards = Bracket(yardage["receiving"])
+        self.combinedYards = dict(yardage["combined"])
+        self.twoPointConversion = yardage["twoPointConversion"]
+
+        touchdown = config["touchdown"]
+        self.touchdownDistance = Bracket(touchdown["distance"])
+        self.passerMultiplier = Multiplier(touchdown["multiplier"]["passer"])
+        self.receiverMultiplier = Multiplier(touchdown["multiplier"]["receiver"])
+        self.rusherMultiplier = Multiplier(touchdown["multiplier"]["rusher"])
+
+        kicking = config["kicking"]
+        self.fieldGoalDistance = Bracket(kicking["fieldGoal"])
+        self.extraPoint = kicking["extraPoint"]
+
+        defense = config["defense"]
+        if set(defense["events"]) != set(DEFENSE_EVENTS):
+            raise ValueError(f"defense events must be exactly {', '.join(DEFENSE_EVENTS)}")
+        self.eventPoints = {event: defense["events"][event] for event in DEFENSE_EVENTS}
+        self.pointsAllowed = Bracket(defense["pointsAllowed"])
+        self.returnYards = Bracket(defense["returnYards"])
+
+    def __repr__(self) -> str:
+        return f"ScoringRules({self.name!r})"
+
+def mergeRules(base: Dict[str, Any], overrides: Dict[str, Any], replaceTables: bool = False) -> Dict[str, Any]:
+    """Rules with the overridden parts replaced, tables merge key by key (except the per-position
+    multiplier tables, which are replaced whole) and everything else is replaced whole"""
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if key not in merged:
+            raise ValueError(f"unknown scoring rule {key!r}")
+        if isinstance(value, dict) and isinstance(merged[key], dict) and not replaceTables:
+            merged[key] = mergeRules(merged[key], value, key == "multiplier")
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+def compileRules(overrides: Optional[Dict[str, Any]] = None, name: str = "default") -> ScoringRules:
+    """Compile the default rules with any overrides applied"""
+    return ScoringRules(mergeRules(DEFAULT_RULES, overrides or {}), name)
+
+def loadRules(path: str) -> ScoringRules:
+    """Compile a TOML rules file, named after the file"""
+    with open(path, 'rb') as f:
+        overrides = tomllib.load(f)
+    name = overrides.pop("name", path.rsplit("/", 1)[-1].rsplit(".", 1)[0])
+    return compileRules(overrides, name)
+
+# rules used when a scoring function isn't handed any
+DEFAULT = compileRules()
@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import storeVersions
+
+# Per-season bundles the clients bootstrap their caches from: one gzip'd compact JSON file per season
+# with every player's roster and that season's weekly scoring, every defense's weekly scoring and, in
+# the latest season, the fantasy teams. They're written while the sync streams the documents to
+# Firestore, one document at a time, so no second copy of the store is built in memory.
+#
+#   {BUNDLE_DIR}/{year}.v{n}.json.gz   {"format", "year", "players": {id: {"roster", "weeks"}},
+#                                       "defense": {team: weeks}, "fantasyTeams": {name: doc}}
+#   {BUNDLE_DIR}/manifest.json         {"format", "version", "updatedAt", "seasons": {year: {"version",
+#                                       "file", "sha256", "bytes", "jsonBytes", "players", "defense"}}}
+#
+# A season's version only moves when its content hash does, so a client keeps its cached bundle until
+# the manifest lists a new one and reads the documents that changed since from Firestore.
+BUNDLE_DIR = os.path.join("local_data", "bundles")
+MANIFEST_NAME = "manifest.json"
+# folder of the Cloud Storage bucket the bundles and manifest are uploaded to
+BUCKET_PREFIX = "bundles"
+
+FORMAT = 1
+SECTIONS = ("players", "defense", "fantasyTeams")
+COMPACT = (',', ':')
+# level 6 is within a few percent of 9 on this JSON at a fraction of the time
+COMPRESS_LEVEL = 6
+
+Document = Tuple[str, str, Dict[str, Any]]
+
+class SeasonBundle:
+    """One season's bundle being written: compact JSON gzip'd into a temporary file section by
+    section, hashed as it goes"""
+
+    def __init__(self, year: str, directory: str):
+        self.year = year
+        # a sync that failed part way leaves this behind for the next one to overwrite
+        self.tmpPath = os.path.join(directory, f"{year}.json.gz.tmp")
+        # mtime 0 so the same content always compresses to the same bytes
+        self.file = gzip.GzipFile(self.tmpPath, 'wb', compresslevel=COMPRESS_LEVEL, mtime=0)
+        self.hash = hashlib.sha256()
+        self.jsonBytes = 0
+        self.counts = {section: 0 for section in SECTIONS}
+        self.section = -1
+        self.write(f'{{"format":{FORMAT},"year":{int(year)}')
+
+    def write(self, text: str):
+        data = text.encode()
+        self.hash.update(data)
+        self.jsonBytes += len(data)
+        self.file.write(data)
+
+    def openSection(self, section: str):
+        """Move on to a section, sections left out in between are written empty"""
+        index = SECTIONS.index(section)
+        if index < self.section:
+            raise ValueError(f"{section} documents of {self.year} came after {SECTIONS[self.section]} ones")
+        while self.section < index:
+            if self.section >= 0:
+                self.write("}")
+            self.section += 1
+            self.write(f',"{SECTIONS[self.section]}":{{')
+
+    def add(self, section: str, key: str, value: Any):
+        self.openSection(section)
+        separator = "," if self.counts[section] else ""
+        self.write(f"{separator}{json.dumps(key)}:{json.dumps(value, separators=COMPACT, sort_keys=True)}")
+        self.counts[section] += 1
+
+    def close(self) -> str:
+        """Finish the JSON and the file, returns the content hash"""
+        self.openSection(SECTIONS[-1])
+        self.write("}}")
+        self.file.close()
+        return self.hash.hexdigest()
+
+def manifestPath(directory: str) -> str:
+    return os.path.join(directory, MANIFEST_NAME)
+
+def loadManifest(directory: str = BUNDLE_DIR) -> Dict[str, Any]:
+    try:
+        with open(manifestPath(directory), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"format": FORMAT, "version": 0, "seasons": {}}
+
+def fantasyTeams(db) -> Dict[str, Dict[str, Any]]:
+    """The league's fantasy teams, a handful of documents read once per sync"""
+    return {team.id: team.to_dict() for team in db.collection("fantasyTeams").stream()}
+
+class SeasonBundles:
+    """Bundles of every season the documents passed through it cover. finish() publishes the ones
+    whose content changed"""
+
+    def __init__(self, directory: str = BUNDLE_DIR, teams: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.directory = directory
+        self.teams = teams or {}
+        self.bundles: Dict[str, SeasonBundle] = {}
+
+    def bundle(self, year: str) -> SeasonBundle:
+        if year not in self.bundles:
+            os.makedirs(self.directory, exist_ok=True)
+            self.bundles[year] = SeasonBundle(year, self.directory)
+        return self.bundles[year]
+
+    def add(self, collection: str, docId: str, doc: Dict[str, Any]):
+        if collection == "players":
+            for year, weeks in doc["scoring"].items():
+                if weeks:
+                    self.bundle(year).add("players", docId, {"roster": doc["roster"], "weeks": weeks})
+        elif collection == "defense":
+            for year, weeks in doc.items():
+                if weeks:
+                    self.bundle(year).add("defense", docId, weeks)
+
+    def passThrough(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Yield the documents unchanged, adding the player and defense ones to their seasons' bundles"""
+        for document in documents:
+            self.add(*document)
+            yield document
+
+    def finish(self) -> List[str]:
+        """Close every bundle and publish the changed ones under their next version along with the
+        manifest. Returns the years published"""
+        if self.teams and self.bundles:
+            latest = max(self.bundles, key=int)
+            for name, team in sorted(self.teams.items()):
+                self.bundles[latest].add("fantasyTeams", name, team)
+
+        manifest = loadManifest(self.directory)
+        published = []
+        for year, bundle in sorted(self.bundles.items()):
+            digest = bundle.close()
+            entry = manifest["seasons"].get(year)
+            if entry is not None and entry["sha256"] == digest and \
+                    os.path.exists(os.path.join(self.directory, entry["file"])):
+                os.remove(bundle.tmpPath)
+                continue
+            version = entry["version"] + 1 if entry is not None else 1
+            fileName = f"{year}.v{version}.json.gz"
+            os.replace(bundle.tmpPath, os.path.join(self.directory, fileName))
+            # the version before stays for clients holding the previous manifest
+            if version > 2:
+                try:
+                    os.remove(os.path.join(self.directory, f"{year}.v{version - 2}.json.gz"))
+                except FileNotFoundError:
+                    pass
+            manifest["seasons"][year] = {
+                "version": version,
+                "file": fileName,
+                "sha256": digest,
+                "bytes": os.path.getsize(os.path.join(self.directory, fileName)),
+                "jsonBytes": bundle.jsonBytes,
+                "players": bundle.counts["players"],
+                "defense": bundle.counts["defense"]
+            }
+            published.append(year)
+        self.bundles = {}
+
+        if published:
+            manifest["version"] += 1
+            manifest["updatedAt"] = int(time.time())
+            manifest["seasons"] = dict(sorted(manifest["seasons"].items()))
+            storeVersions.writeAtomically(manifestPath(self.directory), json.dumps(manifest, indent=1))
+        return published
+
+def buildBundles(documents: Iterable[Document], directory: str = BUNDLE_DIR,
+                 teams: Optional[Dict[str, Dict[str, Any]]] = None) -> List[str]:
+    """Write the bundles of the documents without syncing them, returns the years published"""
+    bundles = SeasonBundles(directory, teams)
+    for document in documents:
+        bundles.add(*document)
+    return bundles.finish()
+
+def uploadBundles(bucketName: str, directory: str = BUNDLE_DIR) -> int:
+    """Upload the bundles the bucket doesn't have yet, then the manifest. Bundle files never change
+    once written, so they're cached for good, the manifest only briefly. Returns the bundles uploaded"""
+    from firebase_admin import storage
+
+    bucket = storage.bucket(bucketName)
+    manifest = loadManifest(directory)
+    uploaded = 0
+    for entry in manifest["seasons"].values():
+        blob = bucket.blob(f"{BUCKET_PREFIX}/{entry['file']}")
+        if blob.exists():
+            continue
+        # served decompressed to clients that don't ask for gzip
+        blob.content_encoding = "gzip"
+        blob.cache_control = "public, max-age=31536000, immutable"
+        blob.upload_from_filename(os.path.join(directory, entry["file"]), content_type="application/json")
+        uploaded += 1
+    blob = bucket.blob(f"{BUCKET_PREFIX}/{MANIFEST_NAME}")
+    blob.cache_control = "public, max-age=60"
+    blob.upload_from_filename(manifestPath(directory), content_type="application/json")
+    return uploaded
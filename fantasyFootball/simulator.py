@@ -0,0 +1,226 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import firestoreSync
+import matchups
+import profiling
+from localStorage import getWeekResults, getPlayerRoster
+
+# Monte Carlo playoff odds from the stored scoring history. Every player (and defense) gets a
+# weekly points distribution from their past weeks, shrunk towards their position's so a few
+# games don't make a projection. Every team starts its best projected lineup for the rest of the
+# season, and a starter's weekly points are treated as independent normals, so a team's weekly
+# score is a normal with the summed means and variances. Whole seasons are drawn at once as a
+# sims x teams x weeks array, the remaining games resolved and the standings ranked per simulation.
+
+# lineup slots of the league, (slot, count, positions that can fill it), filled in this order
+LINEUP_SLOTS = [
+    ("QB", 1, {"QB"}),
+    ("RB", 2, {"RB"}),
+    ("WR", 3, {"WR"}),
+    ("TE", 1, {"TE"}),
+    ("K", 1, {"K"}),
+    ("DST", 1, {"DST"}),
+    ("FLEX", 1, {"RB", "WR", "TE"})
+]
+REGULAR_SEASON_WEEKS = 18
+
+# weeks of their position's average a player's own history is blended with
+PRIOR_WEEKS = 3
+# no projection is more certain than this many points either way
+MIN_STD = 1.0
+# simulations drawn per chunk, chunks are what the process pool spreads out
+CHUNK_SIZE = 25000
+
+def pointsHistory(seasons: Iterable[Tuple[int, Iterable[int]]]) -> pd.DataFrame:
+    """Points of every player and defense in every stored (year, weeks), with their positions"""
+    ids, points = [], []
+    for year, weeks in seasons:
+        for week in weeks:
+            playerData, teamData = getWeekResults(year, week)
+            for data in (playerData, teamData):
+                ids.extend(data)
+                points.extend(stats["points"] for stats in data.values())
+    history = pd.DataFrame({"id": pd.Series(ids, dtype=object), "points": np.asarray(points, dtype=np.float64)})
+    history["position"] = positions(history["id"].unique()).reindex(history["id"]).to_numpy()
+    return history
+
+def positions(ids: Iterable[str]) -> pd.Series:
+    """Fantasy position of every id, DST for defenses"""
+    return pd.Series({playerId: "DST" if matchups.isDefense(playerId) else getPlayerRoster(playerId).get("position")
+                      for playerId in ids}, dtype=object)
+
+def playerProjections(history: pd.DataFrame) -> pd.DataFrame:
+    """mean and std of every id's weekly points, blended with their position's by PRIOR_WEEKS"""
+    own = history.groupby("id")["points"].agg(["mean", "var", "count"])
+    own["var"] = own["var"].fillna(0)
+    prior = history.groupby("position")["points"].agg(["mean", "var"])
+    own["position"] = history.groupby("id")["position"].first()
+    priorMean = own["position"].map(prior["mean"]).astype(np.float64).fillna(0)
+    priorVar = own["position"].map(prior["var"]).astype(np.float64).fillna(0)
+    weight = own["count"] / (own["count"] + PRIOR_WEEKS)
+    return pd.DataFrame({
+        "position": own["position"],
+        "games": own["count"],
+        "mean": weight * own["mean"] + (1 - weight) * priorMean,
+        "std": np.sqrt(np.maximum(weight * own["var"] + (1 - weight) * priorVar, MIN_STD ** 2))
+    })
+
+def bestLineup(roster: List[str], projections: pd.DataFrame) -> List[str]:
+    """Highest projected players of a roster for every lineup slot"""
+    available = projections.reindex([playerId for playerId in roster if playerId in projections.index])
+    available = available.sort_values("mean", ascending=False)
+    lineup, used = [], set()
+    for _, count, allowed in LINEUP_SLOTS:
+        picks = [playerId for playerId, position in available["position"].items()
+                 if position in allowed and playerId not in used][:count]
+        lineup.extend(picks)
+        used.update(picks)
+    return lineup
+
+class League:
+    """What the simulation needs of a league: teams, their weekly score distributions for the remaining
+    weeks (teams x weeks), the remaining games as team indexes (weeks x games) and the standings so far"""
+
+    def __init__(self, teams: List[str], means: np.ndarray, stds: np.ndarray, home: np.ndarray, away: np.ndarray,
+                 wins: Optional[np.ndarray] = None, pointsFor: Optional[np.ndarray] = None):
+        self.teams = teams
+        self.means = np.asarray(means, dtype=np.float64)
+        self.stds = np.asarray(stds, dtype=np.float64)
+        weeks = self.means.shape[1]
+        self.home = np.asarray(home, dtype=np.intp).reshape(weeks, -1) if weeks else np.zeros((0, 0), dtype=np.intp)
+        self.away = np.asarray(away, dtype=np.intp).reshape(self.home.shape)
+        # wins count ties as half a win
+        self.wins = np.zeros(len(teams)) if wins is None else np.asarray(wins, dtype=np.float64)
+        self.pointsFor = np.zeros(len(teams)) if pointsFor is None else np.asarray(pointsFor, dtype=np.float64)
+
+    def incidence(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(games, teams) one-hot matrices of the home and away team of every remaining game"""
+        games = self.home.size
+        homeMatrix = np.zeros((games, len(self.teams)), dtype=np.float32)
+        awayMatrix = np.zeros((games, len(self.teams)), dtype=np.float32)
+        homeMatrix[np.arange(games), self.home.ravel()] = 1
+        awayMatrix[np.arange(games), self.away.ravel()] = 1
+        return homeMatrix, awayMatrix
+
+def simulateChunk(league: League, sims: int, seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    """Seed counts (teams x seeds) and summed final wins and points of a batch of simulated seasons"""
+    rng = np.random.default_rng(seed)
+    teams, weeks = league.means.shape
+    # sims x teams x weeks of weekly scores
+    scores = rng.standard_normal((sims, teams, weeks), dtype=np.float32)
+    scores *= league.stds.astype(np.float32)
+    scores += league.means.astype(np.float32)
+
+    weekIndex = np.arange(weeks)[:, None]
+    homeScores = scores[:, league.home, weekIndex].reshape(sims, -1)
+    awayScores = scores[:, league.away, weekIndex].reshape(sims, -1)
+    homeResult = (np.sign(homeScores - awayScores) + 1) / 2  # 1 win, 0.5 tie, 0 loss
+    homeMatrix, awayMatrix = league.incidence()
+    wins = league.wins + homeResult @ homeMatrix + (1 - homeResult) @ awayMatrix
+    pointsFor = league.pointsFor + homeScores @ homeMatrix + awayScores @ awayMatrix
+
+    # best record first, then most points, as one key: points never reach the weight of half a win
+    key = wins * 1e7 + pointsFor
+    order = np.argsort(-key, axis=1, kind="stable")  # sims x seeds -> team
+    seedCounts = np.bincount((order * teams + np.arange(teams)).ravel(), minlength=teams * teams)
+    return {"seeds": seedCounts.reshape(teams, teams), "wins": wins.sum(axis=0), "pointsFor": pointsFor.sum(axis=0)}
+
+def simulate(league: League, sims: int = 100000, playoffTeams: int = 4, seed: Optional[int] = None,
+             jobs: int = 1, chunkSize: int = CHUNK_SIZE) -> List[Dict[str, Any]]:
+    """Playoff and seeding odds of every team over a number of simulated seasons. Chunks get their own
+    streams spawned from the seed, so the odds are the same for a seed whatever the number of jobs"""
+    chunks = [min(chunkSize, sims - start) for start in range(0, sims, chunkSize)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    with profiling.stage("simulate", sims):
+        if jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(simulateChunk, [league] * len(chunks), chunks, seeds))
+        else:
+            results = [simulateChunk(league, size, chunkSeed) for size, chunkSeed in zip(chunks, seeds)]
+
+    seedOdds = sum(result["seeds"] for result in results) / sims
+    wins = sum(result["wins"] for result in results) / sims
+    pointsFor = sum(result["pointsFor"] for result in results) / sims
+    odds = [{
+        "team": team,
+        "playoffOdds": float(seedOdds[index, :playoffTeams].sum()),
+        "seedOdds": [float(value) for value in seedOdds[index]],
+        "projectedWins": float(wins[index]),
+        "projectedPointsFor": float(pointsFor[index])
+    } for index, team in enumerate(league.teams)]
+    return sorted(odds, key=lambda entry: (-entry["playoffOdds"], -entry["projectedWins"], entry["team"]))
+
+def loadLeague(db, year: int, throughWeek: int, historySeasons: int = 1) -> League:
+    """League after a week: rosters from fantasyTeams, games and standings from the matchups, projections
+    from this season's stored weeks so far plus the full seasons before it"""
+    rosters = {team.id: team.to_dict().get("roster", []) for team in db.collection("fantasyTeams").stream()}
+    teams = sorted(rosters)
+    index = {team: position for position, team in enumerate(teams)}
+
+    standings = {}
+    for week in range(1, throughWeek + 1):
+        for _, game in matchups.readGames(db, year, week):
+            if game.get("homeTeam") in index and game.get("awayTeam") in index:
+                result = matchups.gameResult(game, year, week)
+                matchups.addResult(standings, game["homeTeam"], result["homeScore"], result["awayScore"])
+                matchups.addResult(standings, game["awayTeam"], result["awayScore"], result["homeScore"])
+    wins = [standings[team]["wins"] + standings[team]["ties"] / 2 if team in standings else 0 for team in teams]
+    pointsFor = [standings[team]["pointsFor"] if team in standings else 0 for team in teams]
+
+    # the regular season runs until the first week without games
+    home, away = [], []
+    for week in range(throughWeek + 1, REGULAR_SEASON_WEEKS + 1):
+        games = [game for _, game in matchups.readGames(db, year, week)
+                 if game.get("homeTeam") in index and game.get("awayTeam") in index]
+        if not games:
+            break
+        home.append([index[game["homeTeam"]] for game in games])
+        away.append([index[game["awayTeam"]] for game in games])
+    if len({len(games) for games in home}) > 1:
+        raise ValueError("every remaining week needs the same number of games")
+
+    seasons = [(year - back, range(1, REGULAR_SEASON_WEEKS + 1)) for back in range(historySeasons, 0, -1)]
+    seasons.append((year, range(1, throughWeek + 1)))
+    projections = playerProjections(pointsHistory(seasons))
+    means, stds = [], []
+    for team in teams:
+        lineup = projections.loc[bestLineup(rosters[team], projections)]
+        means.append(lineup["mean"].sum())
+        stds.append(np.sqrt((lineup["std"] ** 2).sum()))
+    weeks = len(home)
+    return League(teams, np.repeat(np.array(means)[:, None], weeks, axis=1),
+                  np.repeat(np.array(stds)[:, None], weeks, axis=1), home, away, wins, pointsFor)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the rest of the fantasy season for playoff and seeding odds")
+    parser.add_argument("year", type=int)
+    parser.add_argument("week", type=int, help="last week played, the simulation starts after it")
+    parser.add_argument("--sims", type=int, default=100000)
+    parser.add_argument("--playoff-teams", type=int, default=4)
+    parser.add_argument("--seed", type=int, help="seed the simulations for repeatable odds")
+    parser.add_argument("--jobs", type=int, default=1, help="simulate chunks in this many worker processes")
+    parser.add_argument("--history-seasons", type=int, default=1, help="earlier seasons the projections also learn from")
+    parser.add_argument("--output", help="write the odds here as JSON")
+    parser.add_argument("--sync", action="store_true", help="merge the odds into the week's matchups document")
+    profiling.addArguments(parser)
+    args = parser.parse_args()
+
+    from firebaseSetup import getDb
+    db = getDb()
+    with profiling.profiled(args):
+        league = loadLeague(db, args.year, args.week, args.history_seasons)
+        odds = simulate(league, args.sims, args.playoff_teams, args.seed, args.jobs)
+    print(f"{'team':<24}{'playoffs':>9}{'wins':>7}{'points':>9}")
+    for entry in odds:
+        print(f"{entry['team']:<24}{entry['playoffOdds']:>9.1%}{entry['projectedWins']:>7.1f}{entry['projectedPointsFor']:>9.0f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(odds, f, indent=2)
+    if args.sync:
+        # a list, so a merged write replaces it whole
+        document = (matchups.weekCollection(args.year), matchups.weekId(args.week), {"playoffOdds": odds})
+        firestoreSync.syncDocuments(db, [document], merge=True)
@@ -0,0 +1,200 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Binary snapshot files for the local store. A file is a small header followed by named sections:
+#
+#   b"FFSNAP01" | uint32 header length | header JSON | section blocks
+#
+# The header holds the file's metadata and where every section starts. A section is an index of
+# its records, sorted by key, then the records themselves:
+#
+#   uint32 key end offsets (count) | uint32 record end offsets (count, variable sections only)
+#   | key bytes | records
+#
+# Stat sections hold fixed-width records (one little-endian int64 per field), anything else is
+# one UTF-8 JSON value per record. Files are opened with mmap, a lookup binary-searches the keys
+# and decodes just that record, and items() decodes a whole section in one pass for full scans.
+
+MAGIC = b"FFSNAP01"
+UINT32 = struct.Struct("<I")
+
+class SnapshotError(ValueError):
+    """Raised for a file that isn't a snapshot or is cut short"""
+
+def packSection(records: Dict[str, Any], fields: Optional[Sequence[str]] = None) -> Tuple[Dict[str, Any], bytes]:
+    """(header entry, block) of one section. With fields the records are sequences of ints in that order"""
+    keys = sorted(records)
+    encodedKeys = [key.encode() for key in keys]
+    keyEnds, end = [], 0
+    for key in encodedKeys:
+        end += len(key)
+        keyEnds.append(end)
+    parts = [struct.pack(f"<{len(keys)}I", *keyEnds)]
+
+    if fields is not None:
+        recordFormat = struct.Struct(f"<{len(fields)}q")
+        body = b"".join(recordFormat.pack(*records[key]) for key in keys)
+    else:
+        encodedRecords = [json.dumps(records[key], separators=(',', ':')).encode() for key in keys]
+        recordEnds, end = [], 0
+        for record in encodedRecords:
+            end += len(record)
+            recordEnds.append(end)
+        parts.append(struct.pack(f"<{len(keys)}I", *recordEnds))
+        body = b"".join(encodedRecords)
+    parts.append(b"".join(encodedKeys))
+    parts.append(body)
+    return {"count": len(keys), "fields": list(fields) if fields is not None else None}, b"".join(parts)
+
+def writeSnapshot(path: str, sections: Dict[str, Tuple[Dict[str, Any], Optional[Sequence[str]]]],
+                  meta: Optional[Dict[str, Any]] = None):
+    """Write {name: (records, fields)} sections and metadata as a snapshot file, atomically and on disk
+    before it replaces the path, since a store version is published pointing at it right after"""
+    header = {"meta": meta or {}, "sections": {}}
+    blocks = []
+    for name, (records, fields) in sections.items():
+        entry, block = packSection(records, fields)
+        header["sections"][name] = entry
+        blocks.append(block)
+
+    # offsets are relative to the end of the header, so they can be filled in before its length is known
+    offset = 0
+    for entry, block in zip(header["sections"].values(), blocks):
+        entry["offset"] = offset
+        offset += len(block)
+    encodedHeader = json.dumps(header, separators=(',', ':')).encode()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmpPath = f"{path}.{os.getpid()}.tmp"
+    with open(tmpPath, 'wb') as f:
+        f.write(MAGIC)
+        f.write(UINT32.pack(len(encodedHeader)))
+        f.write(encodedHeader)
+        for block in blocks:
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpPath, path)
+
+class Section:
+    """Read-only view of one section of an open snapshot"""
+
+    def __init__(self, buffer, start: int, count: int, fields: Optional[List[str]]):
+        self.buffer = buffer
+        self.count = count
+        self.fields = fields
+        if start + 4 * count * (1 if fields is not None else 2) > len(buffer):
+            raise SnapshotError("snapshot is truncated")
+        self.keyEnds = struct.unpack_from(f"<{count}I", buffer, start)
+        position = start + 4 * count
+        if fields is None:
+            self.recordEnds = struct.unpack_from(f"<{count}I", buffer, position)
+            position += 4 * count
+        else:
+            self.recordFormat = struct.Struct(f"<{len(fields)}q")
+        self.keysStart = position
+        self.recordsStart = position + (self.keyEnds[-1] if count else 0)
+        end = self.recordsStart + (self.recordFormat.size * count if fields is not None
+                                   else (self.recordEnds[-1] if count else 0))
+        if end > len(buffer):
+            raise SnapshotError("snapshot is truncated")
+        self._keys = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def key(self, index: int) -> str:
+        start = self.keyEnds[index - 1] if index else 0
+        return bytes(self.buffer[self.keysStart + start:self.keysStart + self.keyEnds[index]]).decode()
+
+    def keys(self) -> List[str]:
+        """Every key in sorted order, decoded once"""
+        if self._keys is None:
+            blob = bytes(self.buffer[self.keysStart:self.recordsStart])
+            starts = (0,) + self.keyEnds[:-1]
+            self._keys = [blob[start:end].decode() for start, end in zip(starts, self.keyEnds)]
+        return self._keys
+
+    def find(self, key: str) -> int:
+        """Index of a key, -1 when it isn't in the section"""
+        if self._keys is not None:
+            index = bisect.bisect_left(self._keys, key)
+            return index if index < self.count and self._keys[index] == key else -1
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.count and self.key(low) == key else -1
+
+    def record(self, index: int):
+        if self.fields is not None:
+            return self.recordFormat.unpack_from(self.buffer, self.recordsStart + index * self.recordFormat.size)
+        start = self.recordEnds[index - 1] if index else 0
+        return json.loads(bytes(self.buffer[self.recordsStart + start:self.recordsStart + self.recordEnds[index]]))
+
+    def get(self, key: str, default=None):
+        """One record (a tuple of ints for stat sections) without decoding the rest"""
+        index = self.find(key)
+        return default if index < 0 else self.record(index)
+
+    def __contains__(self, key: str) -> bool:
+        return self.find(key) >= 0
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Every (key, record) in key order, the fast path for reading a whole section"""
+        if self.fields is not None:
+            end = self.recordsStart + self.recordFormat.size * self.count
+            return zip(self.keys(), self.recordFormat.iter_unpack(self.buffer[self.recordsStart:end]))
+        blob = bytes(self.buffer[self.recordsStart:self.recordsStart + (self.recordEnds[-1] if self.count else 0)])
+        starts = (0,) + self.recordEnds[:-1]
+        return zip(self.keys(), (json.loads(blob[start:end]) for start, end in zip(starts, self.recordEnds)))
+
+class Snapshot:
+    """A snapshot file opened with mmap. Use as a context manager, or close() it when done"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < len(MAGIC) + UINT32.size:
+                raise SnapshotError(f"{path} is not a snapshot file or is truncated")
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            self.buffer.close()
+            raise SnapshotError(f"{path} is not a snapshot file")
+        (headerLength,) = UINT32.unpack_from(self.buffer, len(MAGIC))
+        headerEnd = len(MAGIC) + UINT32.size + headerLength
+        if headerEnd > len(self.buffer):
+            self.buffer.close()
+            raise SnapshotError(f"{path} is truncated")
+        header = json.loads(self.buffer[len(MAGIC) + UINT32.size:headerEnd])
+        self.meta = header["meta"]
+        self.sectionHeaders = header["sections"]
+        self.bodyStart = headerEnd
+        self.sections = {}
+
+    def section(self, name: str) -> Optional[Section]:
+        """A section by name, None when the file has no such section"""
+        if name not in self.sections:
+            entry = self.sectionHeaders.get(name)
+            if entry is None:
+                return None
+            self.sections[name] = Section(self.buffer, self.bodyStart + entry["offset"], entry["count"],
+                                          entry["fields"])
+        return self.sections[name]
+
+    def close(self):
+        self.sections = {}
+        self.buffer.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
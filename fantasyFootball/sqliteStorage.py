@@ -0,0 +1,487 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, List, Optional
+import firestoreSync
+import profiling
+import readModels
+import storeVersions
+
+# Embedded SQLite alternative to the JSON store, selected with FF_STORAGE=sqlite.
+# It keeps the localStorage function names so the scoring modules don't change.
+LOCAL_DATA_DIR = "local_data"
+DATABASE_FILE = os.path.join(LOCAL_DATA_DIR, "store.sqlite")
+
+# stat key used by the scoring modules -> column name
+PLAYER_STATS = {
+    "points": "points",
+    "passYards": "pass_yards",
+    "rushYards": "rush_yards",
+    "recYards": "rec_yards",
+    "passTds": "pass_tds",
+    "rushTds": "rush_tds",
+    "recTds": "rec_tds",
+    "fgm": "fgm",
+    "epm": "epm",
+    "2pConvs": "two_pt_convs"
+}
+DEFENSE_STATS = {
+    "points": "points",
+    "touchdowns": "touchdowns",
+    "turnovers": "turnovers",
+    "sacks": "sacks",
+    "safeties": "safeties",
+    "returned2pts": "returned_2pts",
+    "returnYards": "return_yards",
+    "pointsAllowed": "points_allowed"
+}
+
+STAT_COLUMNS = set(PLAYER_STATS.values()) | set(DEFENSE_STATS.values())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player_id TEXT PRIMARY KEY,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS rosters (
+    player_id TEXT PRIMARY KEY REFERENCES players(player_id),
+    position TEXT,
+    team TEXT
+);
+CREATE TABLE IF NOT EXISTS player_weeks (
+    player_id TEXT NOT NULL REFERENCES players(player_id),
+    year INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    position TEXT,
+    {player_columns},
+    PRIMARY KEY (player_id, year, week)
+);
+CREATE INDEX IF NOT EXISTS player_weeks_by_position ON player_weeks (year, week, position);
+CREATE TABLE IF NOT EXISTS defense_weeks (
+    team TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    {defense_columns},
+    PRIMARY KEY (team, year, week)
+);
+CREATE TABLE IF NOT EXISTS week_fingerprints (
+    year INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (year, week)
+);
+""".format(
+    player_columns=",\n    ".join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in PLAYER_STATS.values()),
+    defense_columns=",\n    ".join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in DEFENSE_STATS.values())
+)
+
+connection = None
+rosterPositions = None  # player_id -> position, cached between bulk writes
+
+def getConnection() -> sqlite3.Connection:
+    """Open the database on first use and make sure the schema exists"""
+    global connection
+    if connection is None:
+        os.makedirs(os.path.dirname(DATABASE_FILE), exist_ok=True)
+        connection = sqlite3.connect(DATABASE_FILE)
+        connection.row_factory = sqlite3.Row
+        # readers keep a consistent snapshot while a writer commits, and don't block it
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+    return connection
+
+@contextmanager
+def readSnapshot():
+    """Run the block's queries in one read transaction so they all see the same commit"""
+    conn = getConnection()
+    if conn.in_transaction:
+        # this process's own uncommitted writes are what it should see
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+def acquireWriter():
+    """Become the one process that writes the database, raises storeVersions.WriterLocked if another is.
+    The same lease the file store takes, SQLite's own locking only keeps single transactions apart and
+    two scorers committing in turn would still interleave their weeks"""
+    storeVersions.acquireWriter(LOCAL_DATA_DIR)
+
+def upsertStatement(table: str, keyColumns: List[str], valueColumns: List[str]) -> str:
+    """INSERT that overwrites only the given value columns when the row already exists"""
+    columns = keyColumns + valueColumns
+    updates = ", ".join(f"{column} = excluded.{column}" for column in valueColumns)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT ({', '.join(keyColumns)}) DO UPDATE SET {updates}")
+
+def getRosterPositions() -> Dict[str, str]:
+    """Position of every rostered player"""
+    global rosterPositions
+    if rosterPositions is None:
+        rosterPositions = dict(getConnection().execute("SELECT player_id, position FROM rosters"))
+    return rosterPositions
+
+def incrementStatement(table: str, keyColumns: List[str], valueColumns: List[str]) -> str:
+    """INSERT that adds onto the given stat columns when the row already exists (other value columns are set)"""
+    columns = keyColumns + valueColumns
+    updates = ", ".join(
+        f"{column} = {column} + excluded.{column}" if column in STAT_COLUMNS else f"{column} = excluded.{column}"
+        for column in valueColumns
+    )
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT ({', '.join(keyColumns)}) DO UPDATE SET {updates}")
+
+def rowToStats(row: Optional[sqlite3.Row], stats: Dict[str, str]) -> Dict[str, Any]:
+    """Turn a week row back into the dict the scoring modules expect"""
+    if row is None:
+        return {key: 0 for key in stats}
+    return {key: row[column] for key, column in stats.items()}
+
+def useWorkerStore(roster: Dict[str, Dict[str, Any]]):
+    """Score into a private in-memory database seeded with the roster the parent hands over, for worker
+    processes whose results the parent merges. The roster isn't read from the shared file, which lacks
+    whatever the parent hasn't committed yet (a backfill's season roster), and workers never touch it"""
+    global connection, rosterPositions
+    rosterPositions = None
+    connection = sqlite3.connect(":memory:")
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    storeRosterBulk(roster)
+    connection.commit()
+
+def loadFromFiles():
+    """Nothing to preload, rows are read on demand"""
+    getConnection()
+
+def saveToFiles():
+    """Commit pending writes"""
+    acquireWriter()
+    with profiling.stage("save"):
+        getConnection().commit()
+
+def resetStore():
+    """Drop uncommitted writes so the next access reads the database again"""
+    global rosterPositions
+    rosterPositions = None
+    getConnection().rollback()
+
+def storePlayerData(player_id: str, year: int, week: int, data: Dict[str, Any]):
+    """Store player scoring data"""
+    storePlayerDataBulk(year, week, {player_id: {key: int(value) for key, value in data.items()}})
+
+def storePlayerDataBulk(year: int, week: int, playerData: Dict[str, Dict[str, Any]]):
+    """Store scoring data for many players in one week (values must already be ints)"""
+    conn = getConnection()
+    positions = getRosterPositions()
+    rowsByColumns = {}
+    for player_id, data in playerData.items():
+        # Only store data for players who have roster information
+        if player_id not in positions:
+            continue
+        keys = tuple(key for key in PLAYER_STATS if key in data)
+        rowsByColumns.setdefault(keys, []).append(
+            (player_id, year, week, positions[player_id]) + tuple(data[key] for key in keys)
+        )
+    for keys, rows in rowsByColumns.items():
+        valueColumns = ["position"] + [PLAYER_STATS[key] for key in keys]
+        conn.executemany(upsertStatement("player_weeks", ["player_id", "year", "week"], valueColumns), rows)
+
+def addPlayerData(player_id: str, year: int, week: int, increments: Dict[str, int]):
+    """Add onto a player's stats for one week"""
+    positions = getRosterPositions()
+    # Only store data for players who have roster information
+    if player_id not in positions:
+        return
+    keys = [key for key in PLAYER_STATS if key in increments]
+    getConnection().execute(
+        incrementStatement("player_weeks", ["player_id", "year", "week"], ["position"] + [PLAYER_STATS[key] for key in keys]),
+        (player_id, year, week, positions[player_id]) + tuple(increments[key] for key in keys)
+    )
+
+def getPlayerData(player_id: str, year: int, week: int) -> Dict[str, Any]:
+    """Get player data for a specific player, year, and week"""
+    row = getConnection().execute(
+        "SELECT * FROM player_weeks WHERE player_id = ? AND year = ? AND week = ?", (player_id, year, week)
+    ).fetchone()
+    return rowToStats(row, PLAYER_STATS)
+
+def storeDefenseData(team: str, year: int, week: int, data: Dict[str, Any]):
+    """Store defense scoring data"""
+    storeDefenseDataBulk(year, week, {team: {key: int(value) for key, value in data.items()}})
+
+def storeDefenseDataBulk(year: int, week: int, teamData: Dict[str, Dict[str, Any]]):
+    """Store defense scoring data for many teams in one week (values must already be ints)"""
+    conn = getConnection()
+    rowsByColumns = {}
+    for team, data in teamData.items():
+        keys = tuple(key for key in DEFENSE_STATS if key in data)
+        rowsByColumns.setdefault(keys, []).append((team, year, week) + tuple(data[key] for key in keys))
+    for keys, rows in rowsByColumns.items():
+        valueColumns = [DEFENSE_STATS[key] for key in keys]
+        conn.executemany(upsertStatement("defense_weeks", ["team", "year", "week"], valueColumns), rows)
+
+def addDefenseData(team: str, year: int, week: int, increments: Dict[str, int]):
+    """Add onto a defense's stats for one week"""
+    keys = [key for key in DEFENSE_STATS if key in increments]
+    getConnection().execute(
+        incrementStatement("defense_weeks", ["team", "year", "week"], [DEFENSE_STATS[key] for key in keys]),
+        (team, year, week) + tuple(increments[key] for key in keys)
+    )
+
+def getDefenseData(team: str, year: int, week: int) -> Dict[str, Any]:
+    """Get defense data for a specific team, year, and week"""
+    row = getConnection().execute(
+        "SELECT * FROM defense_weeks WHERE team = ? AND year = ? AND week = ?", (team, year, week)
+    ).fetchone()
+    return rowToStats(row, DEFENSE_STATS)
+
+def storePlayerRoster(player_id: str, player_info: Dict[str, Any]):
+    """Store player roster information"""
+    storeRosterBulk({player_id: player_info})
+
+def storeRosterBulk(roster: Dict[str, Dict[str, Any]], replace: bool = True):
+    """Store roster information for many players at once. Without replace only players who aren't
+    on the roster yet are added, the others keep what's stored"""
+    global rosterPositions
+    rosterPositions = None
+    conn = getConnection()
+    if not replace:
+        roster = {player_id: info for player_id, info in roster.items()
+                  if conn.execute("SELECT 1 FROM rosters WHERE player_id = ?", (player_id,)).fetchone() is None}
+    conn.executemany(
+        "INSERT INTO players (player_id, name) VALUES (?, ?) ON CONFLICT (player_id) DO UPDATE SET name = excluded.name",
+        [(player_id, info.get("name")) for player_id, info in roster.items()]
+    )
+    conn.executemany(
+        "INSERT INTO rosters (player_id, position, team) VALUES (?, ?, ?) "
+        "ON CONFLICT (player_id) DO UPDATE SET position = excluded.position, team = excluded.team",
+        [(player_id, info.get("position"), info.get("team")) for player_id, info in roster.items()]
+    )
+
+def getPlayerRoster(player_id: str) -> Dict[str, Any]:
+    """Get player roster information"""
+    row = getConnection().execute(
+        "SELECT name, position, team FROM players JOIN rosters USING (player_id) WHERE player_id = ?", (player_id,)
+    ).fetchone()
+    if row is None:
+        return {}
+    return {"name": row["name"], "position": row["position"], "team": row["team"]}
+
+def getRoster() -> Dict[str, Dict[str, Any]]:
+    """Roster information of every rostered player"""
+    rows = getConnection().execute("SELECT player_id, name, position, team FROM players JOIN rosters USING (player_id)")
+    return {row["player_id"]: {"name": row["name"], "position": row["position"], "team": row["team"]} for row in rows}
+
+def getWeekResults(year: int, week: int):
+    """Get every player's and team's scoring data for one week"""
+    conn = getConnection()
+    playerData = {
+        row["player_id"]: rowToStats(row, PLAYER_STATS)
+        for row in conn.execute("SELECT * FROM player_weeks WHERE year = ? AND week = ? ORDER BY player_id", (year, week))
+    }
+    teamData = {
+        row["team"]: rowToStats(row, DEFENSE_STATS)
+        for row in conn.execute("SELECT * FROM defense_weeks WHERE year = ? AND week = ? ORDER BY team", (year, week))
+    }
+    return playerData, teamData
+
+def storeWeekResults(year: int, week: int, playerData: Dict[str, Dict[str, Any]], teamData: Dict[str, Dict[str, Any]]):
+    """Store one week's scoring data for every player and team, as returned by getWeekResults"""
+    storePlayerDataBulk(year, week, playerData)
+    storeDefenseDataBulk(year, week, teamData)
+
+def clearWeek(year: int, week: int):
+    """Drop every player's and team's results for one week so it can be rescored from zero
+    (in the same transaction as the rescore, so readers never see a half-scored week)"""
+    conn = getConnection()
+    for table in ("player_weeks", "defense_weeks", "week_fingerprints"):
+        conn.execute(f"DELETE FROM {table} WHERE year = ? AND week = ?", (year, week))
+
+def getWeekFingerprint(year: int, week: int) -> Optional[str]:
+    """Fingerprint of the inputs a week's stored results were scored from, None if unknown"""
+    row = getConnection().execute(
+        "SELECT fingerprint FROM week_fingerprints WHERE year = ? AND week = ?", (year, week)
+    ).fetchone()
+    return None if row is None else row["fingerprint"]
+
+def setWeekFingerprint(year: int, week: int, fingerprint: str):
+    """Record the inputs a week's results were scored from"""
+    getConnection().execute(upsertStatement("week_fingerprints", ["year", "week"], ["fingerprint"]),
+                            (year, week, fingerprint))
+
+def weekSummaries():
+    """(year, week, players, defenses, fingerprint) of every stored week"""
+    rows = getConnection().execute("""
+        SELECT year, week, SUM(players) AS players, SUM(defenses) AS defenses, MAX(fingerprint) AS fingerprint FROM (
+            SELECT year, week, COUNT(*) AS players, 0 AS defenses, NULL AS fingerprint FROM player_weeks GROUP BY year, week
+            UNION ALL SELECT year, week, 0, COUNT(*), NULL FROM defense_weeks GROUP BY year, week
+            UNION ALL SELECT year, week, 0, 0, fingerprint FROM week_fingerprints
+        ) GROUP BY year, week ORDER BY year, week
+    """)
+    return [(row["year"], row["week"], row["players"], row["defenses"], row["fingerprint"]) for row in rows]
+
+def queryPlayerWeeks(year: int, firstWeek: int, lastWeek: int, position: Optional[str] = None,
+                     team: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Player-week rows for a week range, optionally for one position and/or NFL team"""
+    query = ("SELECT player_weeks.*, name, team FROM player_weeks "
+             "JOIN players USING (player_id) JOIN rosters USING (player_id) "
+             "WHERE year = ? AND week BETWEEN ? AND ?")
+    params = [year, firstWeek, lastWeek]
+    if position is not None:
+        query += " AND player_weeks.position = ?"
+        params.append(position)
+    if team is not None:
+        query += " AND team = ?"
+        params.append(team)
+    query += " ORDER BY week, player_id"
+    return [
+        dict(rowToStats(row, PLAYER_STATS), playerId=row["player_id"], name=row["name"],
+             position=row["position"], team=row["team"], year=row["year"], week=row["week"])
+        for row in getConnection().execute(query, params)
+    ]
+
+def topPlayers(year: int, firstWeek: int, lastWeek: int, position: Optional[str] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+    """Players with the most points over a week range, e.g. the top 20 RBs in weeks 5-9"""
+    query = ("SELECT player_id, name, player_weeks.position AS position, team, SUM(points) AS points, "
+             "COUNT(*) AS weeks FROM player_weeks JOIN players USING (player_id) JOIN rosters USING (player_id) "
+             "WHERE year = ? AND week BETWEEN ? AND ?")
+    params = [year, firstWeek, lastWeek]
+    if position is not None:
+        query += " AND player_weeks.position = ?"
+        params.append(position)
+    query += " GROUP BY player_id ORDER BY points DESC, player_id LIMIT ?"
+    params.append(limit)
+    return [
+        {"playerId": row["player_id"], "name": row["name"], "position": row["position"],
+         "team": row["team"], "points": row["points"], "weeks": row["weeks"]}
+        for row in getConnection().execute(query, params)
+    ]
+
+def getDefenseWeeks(team: str, year: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Every stored week for one defense, optionally limited to a year"""
+    query = "SELECT * FROM defense_weeks WHERE team = ?"
+    params = [team]
+    if year is not None:
+        query += " AND year = ?"
+        params.append(year)
+    query += " ORDER BY year, week"
+    return [
+        dict(rowToStats(row, DEFENSE_STATS), year=row["year"], week=row["week"])
+        for row in getConnection().execute(query, params)
+    ]
+
+def keyFilter(column: str, keys: Optional[List[str]]):
+    """WHERE clause and parameters limiting a query to some keys, or to none when keys is None"""
+    if keys is None:
+        return "", []
+    return f" WHERE {column} IN ({', '.join('?' for _ in keys)})", keys
+
+def playerDocuments(playerIds: Optional[List[str]] = None):
+    """Yield (player_id, {"roster": ..., "scoring": {year: {week: stats}}}) for every rostered player,
+    or just the given ones"""
+    conn = getConnection()
+    where, params = keyFilter("player_id", playerIds)
+    rows = conn.execute(f"SELECT * FROM player_weeks{where} ORDER BY player_id, year, week", params)
+    weeksByPlayer = {}
+    for row in rows:
+        weeksByPlayer.setdefault(row["player_id"], {}).setdefault(str(row["year"]), {})[str(row["week"])] = \
+            rowToStats(row, PLAYER_STATS)
+    for row in conn.execute(f"SELECT player_id, name, position, team FROM players JOIN rosters USING (player_id){where}",
+                            params):
+        roster = {"name": row["name"], "position": row["position"], "team": row["team"]}
+        yield row["player_id"], {"roster": roster, "scoring": weeksByPlayer.get(row["player_id"], {})}
+
+def defenseDocuments(teams: Optional[List[str]] = None):
+    """Yield (team, {year: {week: stats}}) for every defense, or just the given ones"""
+    documents = {}
+    where, params = keyFilter("team", teams)
+    for row in getConnection().execute(f"SELECT * FROM defense_weeks{where} ORDER BY team, year, week", params):
+        documents.setdefault(row["team"], {}).setdefault(str(row["year"]), {})[str(row["week"])] = \
+            rowToStats(row, DEFENSE_STATS)
+    return documents.items()
+
+def allDocuments(playerIds: Optional[Iterable[str]] = None, teams: Optional[Iterable[str]] = None):
+    """Yield (collection, id, document) for every player and defense document, or only for the
+    given players and teams (those that are stored), all from one commit"""
+    with readSnapshot():
+        for player_id, player_doc in playerDocuments(None if playerIds is None else list(playerIds)):
+            yield 'players', player_id, player_doc
+        for team, team_data in defenseDocuments(None if teams is None else list(teams)):
+            yield 'defense', team, team_data
+
+def syncToFirebase(db, full: bool = False, batchSize: int = firestoreSync.MAX_BATCH_SIZE,
+                   workers: int = firestoreSync.DEFAULT_WORKERS, bundles=None) -> Dict[str, int]:
+    """Sync local data and the read models built from it to Firebase in batched writes,
+    only uploading documents that changed since the last sync. Documents are also added to
+    the season bundles (seasonBundles.SeasonBundles) when given"""
+    documents = allDocuments() if bundles is None else bundles.passThrough(allDocuments())
+    with profiling.stage("sync") as span:
+        summary = firestoreSync.syncDocuments(db, readModels.withReadModels(documents), full=full,
+                                              batchSize=batchSize, workers=workers, prune=True)
+        span.rows = summary["written"] + summary["skipped"] + summary["failed"]
+    return summary
+
+def exportJson(directory: str = os.path.join("local_data", "export")):
+    """Write the whole database as readable JSON, in the same layout as the file store's export"""
+    import localStorage
+
+    with readSnapshot() as conn:
+        localStorage.writeJsonFile(os.path.join(directory, "roster.json"), getRoster())
+        weeks = conn.execute("SELECT year, week FROM player_weeks UNION SELECT year, week FROM defense_weeks "
+                             "UNION SELECT year, week FROM week_fingerprints ORDER BY year, week").fetchall()
+        for year, week in weeks:
+            playerData, teamData = getWeekResults(year, week)
+            shard = {"players": playerData, "defense": teamData}
+            fingerprint = getWeekFingerprint(year, week)
+            if fingerprint is not None:
+                shard["fingerprint"] = fingerprint
+            localStorage.writeJsonFile(os.path.join(directory, "weeks", str(year), f"{week}.json"), shard)
+    return directory
+
+def migrateFromJson():
+    """Copy the roster and every week shard of the file store (snapshots or JSON) into the database"""
+    import localStorage
+
+    stored = localStorage.storeManifest()
+    if stored["roster"] or stored["weeks"]:
+        roster = localStorage.readRosterFile()
+        shards = [(int(yearKey), int(weekKey), localStorage.readWeekShard(yearKey, weekKey))
+                  for yearKey, weekKey in localStorage.storedWeeks()]
+    elif os.path.exists(localStorage.PLAYERS_FILE):
+        # single-file layout from before sharding
+        with open(localStorage.PLAYERS_FILE, 'r') as f:
+            players = json.load(f)
+        defense = {}
+        if os.path.exists(localStorage.DEFENSE_FILE):
+            with open(localStorage.DEFENSE_FILE, 'r') as f:
+                defense = json.load(f)
+        roster = {player_id: player_data.get("roster", {}) for player_id, player_data in players.items()}
+        weeks = {}
+        for player_id, player_data in players.items():
+            for yearKey, yearData in player_data.get("scoring", {}).items():
+                for weekKey, data in yearData.items():
+                    weeks.setdefault((int(yearKey), int(weekKey)), {"players": {}, "defense": {}})["players"][player_id] = data
+        for team, team_data in defense.items():
+            for yearKey, yearData in team_data.items():
+                for weekKey, data in yearData.items():
+                    weeks.setdefault((int(yearKey), int(weekKey)), {"players": {}, "defense": {}})["defense"][team] = data
+        shards = [(year, week, shard) for (year, week), shard in sorted(weeks.items())]
+    else:
+        return
+
+    storeRosterBulk({player_id: info for player_id, info in roster.items() if info})
+    for year, week, shard in shards:
+        storePlayerDataBulk(year, week, shard.get("players", {}))
+        storeDefenseDataBulk(year, week, shard.get("defense", {}))
+        if "fingerprint" in shard:
+            setWeekFingerprint(year, week, shard["fingerprint"])
+    saveToFiles()
+    print("migrated", len(roster), "players and", len(shards), "weeks into", DATABASE_FILE)
+
+if __name__ == "__main__":
+    migrateFromJson()
@@ -0,0 +1,86 @@
+from collections.abc import Mapping
+from typing import Dict, Any
+
+class StatRecord(Mapping):
+    """One week of fixed-schema stats kept in slots, readable like the dict it replaces"""
+    __slots__ = ()
+
+    # stat keys as they appear in the JSON files and Firestore, in that order,
+    # and the slot each one is stored in
+    KEYS = ()
+    SLOTS = {}
+
+    def __init__(self):
+        for slot in self.__slots__:
+            setattr(self, slot, 0)
+
+    @classmethod
+    def fromMapping(cls, data: Mapping):
+        """Build a record from a stats dict, missing stats default to 0"""
+        record = cls()
+        record.update(data)
+        return record
+
+    @classmethod
+    def fromValues(cls, values):
+        """Build a record from every stat's value, in KEYS order"""
+        record = cls.__new__(cls)
+        record.__setstate__(values)
+        return record
+
+    def toValues(self) -> tuple:
+        """Every stat's value in KEYS order"""
+        return self.__getstate__()
+
+    def __getitem__(self, key: str) -> int:
+        return getattr(self, self.SLOTS[key])
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.toDict()})"
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    def update(self, data: Mapping):
+        """Overwrite the given stats"""
+        for key, value in data.items():
+            setattr(self, self.SLOTS[key], value)
+
+    def add(self, data: Mapping):
+        """Add the given amounts onto the current stats"""
+        for key, value in data.items():
+            slot = self.SLOTS[key]
+            setattr(self, slot, getattr(self, slot) + value)
+
+    def copy(self):
+        """Independent copy of the record"""
+        return self.fromMapping(self)
+
+    def toDict(self) -> Dict[str, Any]:
+        """Plain dict for the JSON/Firestore boundary"""
+        return {key: getattr(self, slot) for key, slot in self.SLOTS.items()}
+
+class PlayerWeek(StatRecord):
+    """A player's scoring for one week"""
+    __slots__ = ("points", "passYards", "rushYards", "recYards", "passTds", "rushTds", "recTds",
+                 "fgm", "epm", "twoPtConvs")
+    KEYS = ("points", "passYards", "rushYards", "recYards", "passTds", "rushTds", "recTds",
+            "fgm", "epm", "2pConvs")
+    SLOTS = dict(zip(KEYS, __slots__))
+
+class DefenseWeek(StatRecord):
+    """A defense's scoring for one week"""
+    __slots__ = ("points", "touchdowns", "turnovers", "sacks", "safeties", "returned2pts",
+                 "returnYards", "pointsAllowed")
+    KEYS = __slots__
+    SLOTS = dict(zip(KEYS, __slots__))
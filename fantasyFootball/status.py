@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import time
+import firestoreSync
+import inputCache
+import seasonBundles
+from localStorage import weekSummaries, singleFileLayout, PLAYERS_FILE
+
+# What's stored locally: scored weeks per season, cached nflverse inputs, the sync manifest and season bundles.
+# Reads file headers and sidecars only, so it starts and finishes without pandas or Firebase.
+
+def age(seconds: float) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.0f}{unit}"
+    return f"{seconds:.0f}s"
+
+def seasonSummary():
+    """year -> [weeks, player weeks, defense weeks, weeks with a fingerprint]"""
+    seasons = {}
+    for year, week, players, defenses, fingerprint in weekSummaries():
+        season = seasons.setdefault(year, [0, 0, 0, 0])
+        season[0] += 1
+        season[1] += players
+        season[2] += defenses
+        season[3] += fingerprint is not None
+    return seasons
+
+def cachedInputs():
+    """(source, year, rows, seconds since fetched, fresh) of every cached nflverse input"""
+    inputs = []
+    for source in inputCache.SOURCES:
+        directory = os.path.join(inputCache.CACHE_DIR, source)
+        if not os.path.isdir(directory):
+            continue
+        for fileName in sorted(os.listdir(directory)):
+            year, extension = os.path.splitext(fileName)
+            if extension != ".json" or not year.isdigit():
+                continue
+            with open(os.path.join(directory, fileName), 'r') as f:
+                metadata = json.load(f)
+            inputs.append((source, int(year), metadata.get("rows"), time.time() - metadata["fetchedAt"],
+                           inputCache.isFresh(source, int(year))))
+    return inputs
+
+def printStatus():
+    storage = os.environ.get("FF_STORAGE", "json")
+    print("storage:", storage)
+    seasons = seasonSummary()
+    if storage != "sqlite" and singleFileLayout():
+        print(f"single-file layout in {PLAYERS_FILE}, split into week shards on the next save")
+    elif not seasons and os.path.exists(PLAYERS_FILE):
+        print(f"no scored weeks, {PLAYERS_FILE} hasn't been migrated, run sqliteStorage.py to copy it in")
+    elif not seasons:
+        print("no scored weeks")
+    for year, (weeks, players, defenses, fingerprinted) in sorted(seasons.items()):
+        print(f"{year}: {weeks} weeks, {players} player weeks, {defenses} defense weeks, "
+              f"{fingerprinted} with input fingerprints")
+    for source, year, rows, seconds, fresh in cachedInputs():
+        print(f"cached {source} {year}: {rows} rows, fetched {age(seconds)} ago{'' if fresh else ', stale'}")
+    manifest = firestoreSync.loadManifest()
+    print(f"sync manifest: {len(manifest)} documents" if manifest else "never synced")
+    for year, entry in seasonBundles.loadManifest()["seasons"].items():
+        print(f"bundle {year}: version {entry['version']}, {entry['bytes'] / 2**20:.1f} MB "
+              f"({entry['jsonBytes'] / 2**20:.1f} MB of JSON)")
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Show the scored weeks, cached inputs and sync state stored locally").parse_args()
+    printStatus()
@@ -0,0 +1,165 @@
+import fcntl
+import json
+import os
+from typing import Any, Dict, Optional
+
+# Versions of the file store. Shards are never rewritten in place: a save writes the changed weeks
+# (and roster) as new files, then publishes a manifest listing the file of every week as of that
+# version and moves the CURRENT pointer to it, both atomically. A reader pins the version that was
+# current when it first looked and reads only its files, so a sync or export keeps seeing one
+# consistent store while the scorer publishes newer versions underneath it.
+#
+#   {dataDir}/CURRENT                 number of the latest version
+#   {dataDir}/versions/{n}.json       {"version", "roster", "weeks": {"year/week": path}}, paths relative to dataDir
+#   {dataDir}/readers/{pid}.json      version pinned by a running reader, kept until it exits
+#   {dataDir}/writer.lock             flock held by the one process allowed to publish
+#
+# Files no recent or pinned version refers to are removed after every publish.
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+READERS_DIR = "readers"
+LOCK_FILE = "writer.lock"
+
+# versions kept besides the pinned ones, enough for a reader that read CURRENT but hasn't pinned yet
+KEEP_VERSIONS = 3
+
+# open lock file of this process while it is the writer
+writerLock = None
+
+class WriterLocked(RuntimeError):
+    """Raised when another process already holds the writer lock"""
+
+def writeAtomically(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmpPath = f"{path}.{os.getpid()}.tmp"
+    with open(tmpPath, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpPath, path)
+
+def manifestPath(dataDir: str, version: int) -> str:
+    return os.path.join(dataDir, VERSIONS_DIR, f"{version}.json")
+
+def currentVersion(dataDir: str) -> Optional[int]:
+    """Latest published version, None before the first publish"""
+    try:
+        with open(os.path.join(dataDir, CURRENT_FILE), 'r') as f:
+            return int(f.read())
+    except FileNotFoundError:
+        return None
+
+def readManifest(dataDir: str, version: int) -> Dict[str, Any]:
+    with open(manifestPath(dataDir, version), 'r') as f:
+        return json.load(f)
+
+def latestManifest(dataDir: str) -> Optional[Dict[str, Any]]:
+    version = currentVersion(dataDir)
+    return None if version is None else readManifest(dataDir, version)
+
+def publish(dataDir: str, manifest: Dict[str, Any]):
+    """Make a manifest whose files are all written the current version"""
+    writeAtomically(manifestPath(dataDir, manifest["version"]), json.dumps(manifest, indent=1, sort_keys=True))
+    writeAtomically(os.path.join(dataDir, CURRENT_FILE), f"{manifest['version']}\n")
+
+def pin(dataDir: str, version: int):
+    """Record that this process reads a version, so its files outlive newer publishes"""
+    writeAtomically(os.path.join(dataDir, READERS_DIR, f"{os.getpid()}.json"), json.dumps({"version": version}))
+
+def unpin(dataDir: str):
+    try:
+        os.remove(os.path.join(dataDir, READERS_DIR, f"{os.getpid()}.json"))
+    except FileNotFoundError:
+        pass
+
+def processAlive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def pinnedVersions(dataDir: str):
+    """Versions pinned by running readers, pins left behind by dead ones are cleared"""
+    directory = os.path.join(dataDir, READERS_DIR)
+    versions = set()
+    if not os.path.isdir(directory):
+        return versions
+    for fileName in os.listdir(directory):
+        pid, extension = os.path.splitext(fileName)
+        if extension != ".json" or not pid.isdigit():
+            continue
+        path = os.path.join(directory, fileName)
+        if not processAlive(int(pid)):
+            os.remove(path)
+            continue
+        try:
+            with open(path, 'r') as f:
+                versions.add(json.load(f)["version"])
+        except (FileNotFoundError, ValueError):
+            # unpinned or being rewritten right now
+            continue
+    return versions
+
+def acquireWriter(dataDir: str):
+    """Take the writer lock for the rest of this process (a lease: it goes away when the process does).
+    Raises WriterLocked when another process holds it"""
+    global writerLock
+    if writerLock is not None:
+        return
+    os.makedirs(dataDir, exist_ok=True)
+    lockFile = open(os.path.join(dataDir, LOCK_FILE), 'a+')
+    try:
+        fcntl.flock(lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lockFile.seek(0)
+        holder = lockFile.read().strip() or "another process"
+        lockFile.close()
+        raise WriterLocked(f"the store in {dataDir} is being written by {holder}") from None
+    lockFile.seek(0)
+    lockFile.truncate()
+    lockFile.write(f"pid {os.getpid()}")
+    lockFile.flush()
+    writerLock = lockFile
+
+def releaseWriter():
+    global writerLock
+    if writerLock is not None:
+        fcntl.flock(writerLock, fcntl.LOCK_UN)
+        writerLock.close()
+        writerLock = None
+
+def collectGarbage(dataDir: str, shardDirs=("weeks",), rootFiles=("roster",)):
+    """Remove manifests and shard files only versions older than the kept and pinned ones refer to"""
+    latest = currentVersion(dataDir)
+    if latest is None:
+        return
+    keep = set(range(max(latest - KEEP_VERSIONS + 1, 0), latest + 1)) | pinnedVersions(dataDir)
+    referenced = set()
+    for version in keep:
+        try:
+            manifest = readManifest(dataDir, version)
+        except FileNotFoundError:
+            continue
+        if manifest.get("roster"):
+            referenced.add(os.path.normpath(manifest["roster"]))
+        referenced.update(os.path.normpath(path) for path in manifest["weeks"].values())
+
+    versionsDir = os.path.join(dataDir, VERSIONS_DIR)
+    for fileName in os.listdir(versionsDir):
+        version, extension = os.path.splitext(fileName)
+        if extension == ".json" and version.isdigit() and int(version) not in keep:
+            os.remove(os.path.join(versionsDir, fileName))
+
+    candidates = [fileName for fileName in os.listdir(dataDir)
+                  if fileName.split(".")[0] in rootFiles and fileName.endswith((".snap", ".json"))]
+    for shardDir in shardDirs:
+        for root, _, fileNames in os.walk(os.path.join(dataDir, shardDir)):
+            candidates.extend(os.path.relpath(os.path.join(root, fileName), dataDir) for fileName in fileNames
+                              if fileName.endswith((".snap", ".json")))
+    for path in candidates:
+        if os.path.normpath(path) not in referenced:
+            os.remove(os.path.join(dataDir, path))
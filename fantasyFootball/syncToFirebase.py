@@ -1,13 +1,38 @@
+import argparse
+import firestoreSync
+import profiling
+import seasonBundles
 from localStorage import syncToFirebase, loadFromFiles
-from firebaseSetup import db
+from firebaseSetup import getDb
 
 def main():
-    # Load the local data first
-    loadFromFiles()
-    
-    # Sync to Firebase
-    syncToFirebase(db)
-    print("Successfully synced all data to Firebase")
+    parser = argparse.ArgumentParser(description="Upload local scoring data to Firestore "
+                                     "(set FIRESTORE_EMULATOR_HOST to sync against the emulator)")
+    parser.add_argument("--full", action="store_true", help="upload every document, not just the ones that changed")
+    parser.add_argument("--workers", type=int, default=firestoreSync.DEFAULT_WORKERS, help="concurrent batch commits")
+    parser.add_argument("--batch-size", type=int, default=firestoreSync.MAX_BATCH_SIZE, help="writes per batch (max 500)")
+    parser.add_argument("--no-bundles", action="store_true", help="skip writing the per-season client bundles")
+    parser.add_argument("--bundle-bucket", help="Cloud Storage bucket to upload new bundles and their manifest to")
+    profiling.addArguments(parser)
+    args = parser.parse_args()
+
+    with profiling.profiled(args):
+        # Load the local data first
+        loadFromFiles()
+
+        # Sync to Firebase, writing the season bundles from the same pass over the documents
+        db = getDb()
+        bundles = None if args.no_bundles else seasonBundles.SeasonBundles(teams=seasonBundles.fantasyTeams(db))
+        summary = syncToFirebase(db, full=args.full, batchSize=args.batch_size, workers=args.workers, bundles=bundles)
+        if bundles is not None:
+            with profiling.stage("bundles"):
+                published = bundles.finish()
+                uploaded = seasonBundles.uploadBundles(args.bundle_bucket) if args.bundle_bucket else 0
+    print(f"Synced to Firebase: {summary['written']} written, {summary['skipped']} unchanged, "
+          f"{summary['failed']} failed in {summary['batches']} batches")
+    if bundles is not None:
+        print(f"Season bundles: {', '.join(published) or 'none'} changed, {uploaded} uploaded, "
+              f"in {seasonBundles.BUNDLE_DIR}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Caches a synthetic season (with its roster listing) in the current directory and commits a store
+# holding only the first half of that roster, then backfills the season with the given jobs offline
+# and exports the store. Workers are spawned so they only see what they're handed or what's on disk.
+BACKFILL = """
+import json
+import multiprocessing
+import os
+import sys
+import time
+import backfill
+import inputCache
+import localStorage
+import rosterIndex
+from benchmarks import syntheticData
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn")
+    plays, weekly, roster = syntheticData.generateSeason(2024, weeks=3, playsPerGame=40)
+    for source, frame in (("pbp", plays), ("weekly", weekly), ("rosters", roster)):
+        os.makedirs(os.path.dirname(inputCache.cachePath(source, 2024)), exist_ok=True)
+        frame.reset_index(drop=True).to_feather(inputCache.cachePath(source, 2024), compression='uncompressed')
+        with open(inputCache.metadataPath(source, 2024), 'w') as f:
+            json.dump({"fetchedAt": time.time(), "rows": len(frame), "columns": len(frame.columns)}, f)
+    localStorage.storeRosterBulk(rosterIndex.rosterRecords(rosterIndex.rosterTable(roster[:len(roster) // 2])))
+    localStorage.saveToFiles()
+
+    backfill.backfill(2024, 2024, jobs=int(sys.argv[1]))
+    localStorage.exportJson("export")
+"""
+
+def backfillSeason(directory, jobs):
+    """Every file of the store exported after the backfill, path -> parsed JSON"""
+    os.makedirs(directory)
+    env = dict(os.environ, FF_STORAGE="sqlite", FF_OFFLINE="1", PYTHONPATH=REPO_DIR)
+    subprocess.run([sys.executable, "-c", BACKFILL, str(jobs)], cwd=directory, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    exported = os.path.join(directory, "export")
+    files = {}
+    for root, _, names in os.walk(exported):
+        for name in names:
+            with open(os.path.join(root, name), 'r') as f:
+                files[os.path.relpath(os.path.join(root, name), exported)] = json.load(f)
+    return files
+
+def test_parallel_backfill_matches_serial(tmp_path):
+    serial = backfillSeason(str(tmp_path / "serial"), 1)
+    parallel = backfillSeason(str(tmp_path / "parallel"), 2)
+    assert sorted(serial) == ["roster.json"] + [os.path.join("weeks", "2024", f"{week}.json") for week in range(1, 4)]
+    assert serial == parallel
+
+    # players only on the season roster were added and kept their weeks
+    roster = serial["roster.json"]
+    scored = set()
+    for week in range(1, 4):
+        scored.update(serial[os.path.join("weeks", "2024", f"{week}.json")]["players"])
+    added = sorted(roster)[len(roster) // 2:]
+    assert scored & set(added)
@@ -0,0 +1,107 @@
+import os
+import pytest
+import firestoreSync
+from fakeFirestore import FakeClient
+
+@pytest.fixture(autouse=True)
+def scratch(tmp_path, monkeypatch):
+    # the manifest is written under ./local_data, and retries shouldn't wait
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(firestoreSync, "BASE_BACKOFF", 0)
+
+def players(count, points=0):
+    return [("players", f"p{i}", {"roster": {"name": f"player {i}"}, "scoring": {"2024": {"1": {"points": i + points}}}})
+            for i in range(count)]
+
+def stored(db, collection, docId):
+    return db.collection(collection).document(docId).get().to_dict()
+
+def test_uploads_new_documents_then_skips_unchanged():
+    db = FakeClient()
+    summary = firestoreSync.syncDocuments(db, players(10))
+    assert (summary["written"], summary["skipped"], summary["failed"]) == (10, 0, 0)
+    assert stored(db, "players", "p3")["scoring"]["2024"]["1"]["points"] == 3
+
+    changed = players(10)
+    changed[4] = ("players", "p4", {"roster": {}, "scoring": {}})
+    summary = firestoreSync.syncDocuments(db, changed)
+    assert (summary["written"], summary["skipped"]) == (1, 9)
+    assert stored(db, "players", "p4") == {"roster": {}, "scoring": {}}
+    assert db.writes == 11
+
+def test_full_uploads_unchanged_documents_and_keeps_other_entries():
+    db = FakeClient()
+    firestoreSync.syncDocuments(db, players(3) + [("matchups/2024/weeks", "week1", {"standings": []})])
+    summary = firestoreSync.syncDocuments(db, players(3), full=True)
+    assert (summary["written"], summary["skipped"]) == (3, 0)
+    assert "matchups/2024/weeks/week1" in firestoreSync.loadManifest()
+
+def test_splits_writes_into_batches():
+    db = FakeClient()
+    summary = firestoreSync.syncDocuments(db, players(1201), batchSize=500, workers=2)
+    assert (summary["written"], summary["batches"]) == (1201, 3)
+    assert db.commits == 3
+
+def test_batches_never_exceed_the_firestore_limit():
+    db = FakeClient()
+    summary = firestoreSync.syncDocuments(db, players(600), batchSize=1000)
+    assert summary["batches"] == 2
+
+def test_retries_failed_commits():
+    db = FakeClient()
+    db.failCommits = firestoreSync.MAX_ATTEMPTS - 1
+    summary = firestoreSync.syncDocuments(db, players(5), workers=1)
+    assert (summary["written"], summary["failed"], summary["batches"]) == (5, 0, 1)
+    assert db.commits == 1
+
+def test_failed_batches_are_counted_and_uploaded_next_sync():
+    db = FakeClient()
+    # the first of the two batches fails every attempt
+    db.failCommits = firestoreSync.MAX_ATTEMPTS
+    summary = firestoreSync.syncDocuments(db, players(3), batchSize=2, workers=1)
+    assert (summary["written"], summary["failed"], summary["batches"]) == (1, 2, 2)
+    assert stored(db, "players", "p0") is None
+    assert set(firestoreSync.loadManifest()) == {"players/p2"}
+
+    summary = firestoreSync.syncDocuments(db, players(3))
+    assert (summary["written"], summary["skipped"], summary["failed"]) == (2, 1, 0)
+    assert stored(db, "players", "p0") is not None
+
+def test_prune_drops_entries_of_documents_no_longer_passed():
+    db = FakeClient()
+    firestoreSync.syncDocuments(db, players(4) + [("matchups/2024/weeks", "week1", {"standings": []})])
+    summary = firestoreSync.syncDocuments(db, players(2), prune=True)
+    assert summary["pruned"] == 2
+    # other collections weren't part of the pass and keep their entries
+    assert set(firestoreSync.loadManifest()) == {"players/p0", "players/p1", "matchups/2024/weeks/week1"}
+
+def test_without_prune_entries_are_kept():
+    db = FakeClient()
+    firestoreSync.syncDocuments(db, players(4))
+    summary = firestoreSync.syncDocuments(db, players(2))
+    assert summary["pruned"] == 0
+    assert len(firestoreSync.loadManifest()) == 4
+
+def test_merge_writes_deep_merge_nested_maps():
+    db = FakeClient()
+    db.collection("matchups/2024/weeks").document("week1").set(
+        {"standings": [{"team": "a"}], "odds": {"a": {"playoffs": 0.5, "bye": 0.1}}})
+    firestoreSync.syncDocuments(db, [("matchups/2024/weeks", "week1", {"odds": {"a": {"playoffs": 0.7}, "b": {}}})],
+                                merge=True)
+    assert stored(db, "matchups/2024/weeks", "week1") == {
+        "standings": [{"team": "a"}],
+        "odds": {"a": {"playoffs": 0.7, "bye": 0.1}, "b": {}}
+    }
+
+def test_syncs_overlapping_keep_each_others_entries():
+    db = FakeClient()
+    firestoreSync.syncDocuments(db, players(2))
+
+    def documents():
+        yield from players(3)
+        # another sync finishes while this one is still going
+        firestoreSync.syncDocuments(db, [("matchups/2024/weeks", "week1", {"standings": []})])
+
+    firestoreSync.syncDocuments(db, documents(), prune=True)
+    assert set(firestoreSync.loadManifest()) == {"players/p0", "players/p1", "players/p2", "matchups/2024/weeks/week1"}
+    assert not [name for name in os.listdir("local_data") if name.endswith(".tmp")]
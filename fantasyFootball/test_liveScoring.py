@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+import firestoreSync
+import inputCache
+import liveScoring
+import localStorage
+import rosterIndex
+import scoreWeeks
+from benchmarks import syntheticData
+from fakeFirestore import FakeClient
+from scoring import yardageScoring
+
+YEAR = 2024
+WEEK = 2
+
+@pytest.fixture(autouse=True)
+def scratch(tmp_path, monkeypatch):
+    # the store lives under ./local_data, start every test from an empty one
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(firestoreSync, "BASE_BACKOFF", 0)
+    localStorage.resetStore()
+    yield
+    localStorage.resetStore()
+
+@pytest.fixture
+def season(tmp_path):
+    plays, weekly, roster = syntheticData.generateSeason(YEAR, weeks=WEEK, playsPerGame=40)
+    path = str(tmp_path / "pbp.arrow")
+    plays.reset_index(drop=True).to_feather(path)
+    localStorage.storeRosterBulk(rosterIndex.rosterRecords(rosterIndex.rosterTable(roster)))
+    return path, plays, weekly
+
+def batchResults(plays, weekly):
+    weekPlays = inputCache.applyColumnTypes(plays[plays['week'] == WEEK].copy(), liveScoring.PLAY_COLUMNS)
+    weeklyColumns = inputCache.unionColumns({'week': 'int8'}, yardageScoring.WEEKLY_COLUMNS)
+    weekPlayers = inputCache.applyColumnTypes(weekly[weekly['week'] == WEEK].copy(), weeklyColumns)
+    scoreWeeks.scoreWeek(weekPlays, weekPlayers, YEAR, WEEK, save=False)
+    return localStorage.getWeekResults(YEAR, WEEK)
+
+def test_replay_releases_plays_in_order_until_finished(season):
+    path, plays, _ = season
+    source = liveScoring.FileReplaySource(path, WEEK, playsPerPoll=15)
+    first = source.newPlays({})
+    assert first.groupby('game_id', observed=True).size().max() == 15
+    cursors = first.groupby('game_id', observed=True)['play_id'].max().to_dict()
+    second = source.newPlays(cursors)
+    # only plays past each game's cursor come back
+    assert (second.groupby('game_id', observed=True)['play_id'].min() > pd.Series(cursors)).all()
+    while not source.finished:
+        source.newPlays({})
+    assert source.polls == 3
+
+def test_cursors_advance_to_each_games_last_play(season, capsys):
+    path, plays, _ = season
+    live = liveScoring.runLive(YEAR, WEEK, liveScoring.FileReplaySource(path, WEEK, playsPerPoll=7), interval=0)
+    week = plays[plays['week'] == WEEK]
+    assert live.cursors == week.groupby('game_id')['play_id'].max().to_dict()
+
+def test_live_results_match_batch_scoring(season, capsys):
+    path, plays, weekly = season
+    liveScoring.runLive(YEAR, WEEK, liveScoring.FileReplaySource(path, WEEK, playsPerPoll=7), interval=0)
+    live = localStorage.getWeekResults(YEAR, WEEK)
+    assert live == batchResults(plays, weekly)
+
+def test_polls_without_new_plays_change_nothing(season, capsys):
+    path, _, _ = season
+    source = liveScoring.FileReplaySource(path, WEEK, playsPerPoll=1000)
+    live = liveScoring.LiveWeek(YEAR, WEEK)
+    live.apply(source.newPlays(live.cursors))
+    before = localStorage.getWeekResults(YEAR, WEEK)
+    # the same plays handed over again are behind the cursors
+    again = liveScoring.FileReplaySource(path, WEEK, playsPerPoll=1000).newPlays(live.cursors)
+    assert again.empty
+    live.apply(again)
+    assert localStorage.getWeekResults(YEAR, WEEK) == before
+
+def test_sync_poll_writes_only_what_the_plays_touched(season, capsys):
+    path, plays, _ = season
+    source = liveScoring.FileReplaySource(path, WEEK, playsPerPoll=1000)
+    live = liveScoring.LiveWeek(YEAR, WEEK)
+    weekPlays = source.newPlays(live.cursors)
+    game = weekPlays[weekPlays['game_id'] == weekPlays['game_id'].iloc[0]]
+    live.apply(game)
+
+    db = FakeClient()
+    summary = liveScoring.syncPoll(db, YEAR, WEEK, game)
+    touched = set()
+    for column in ('passer_player_id', 'rusher_player_id', 'receiver_player_id', 'kicker_player_id', 'td_player_id'):
+        touched.update(game[column].dropna().astype(object))
+    teams = {game['home_team'].iloc[0], game['away_team'].iloc[0]}
+    written = {path for path in db.documents}
+    assert {path[1] for path in written if path[0] == "players"} <= touched
+    assert {path[1] for path in written if path[0] == "defense"} == teams
+    assert ("leaderboards", str(YEAR), "weeks", str(WEEK)) in written
+    assert summary["written"] == len(written)
@@ -0,0 +1,38 @@
+import argparse
+import json
+import pytest
+import profiling
+
+def parse(*arguments):
+    parser = argparse.ArgumentParser()
+    profiling.addArguments(parser)
+    return parser.parse_args(list(arguments))
+
+def runProfiled(args):
+    with profiling.profiled(args):
+        with profiling.stage("fetch"):
+            pass
+        with profiling.stage("yardage", 10):
+            sum(range(200000))
+
+def test_capture_defaults_to_the_slowest_stage(tmp_path):
+    report = str(tmp_path / "profile.json")
+    runProfiled(parse("--profile", report))
+    assert profiling.slowestStage(report) == "yardage"
+
+    runProfiled(parse("--profile", report, "--capture", "cprofile"))
+    with open(report) as f:
+        capture = json.load(f)["capture"]
+    assert (capture["stage"], capture["capture"]) == ("yardage", "cprofile")
+    assert (tmp_path / "profile.prof").exists()
+
+def test_capture_stage_overrides_the_report(tmp_path):
+    report = str(tmp_path / "profile.json")
+    runProfiled(parse("--profile", report, "--capture", "tracemalloc", "--capture-stage", "fetch"))
+    with open(report) as f:
+        assert json.load(f)["capture"]["stage"] == "fetch"
+
+def test_capture_without_a_report_exits(tmp_path):
+    with pytest.raises(SystemExit):
+        runProfiled(parse("--profile", str(tmp_path / "profile.json"), "--capture", "cprofile"))
+    assert profiling.activeProfile is None
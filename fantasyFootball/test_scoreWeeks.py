@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Scores a synthetic season into the store in the current directory with the given jobs, exports it and
+# writes the weeks it rescored to scored.json. With a second argument of 1 week 2's rushing yards are changed.
+# It runs in its own interpreter so FF_STORAGE picks the backend, and workers are spawned so they
+# only have what they're handed. The roster isn't saved before scoring, like a backfill's season roster.
+SCORE_SEASON = """
+import json
+import multiprocessing
+import sys
+import inputCache
+import liveScoring
+import localStorage
+import rosterIndex
+import scoreWeeks
+from benchmarks import syntheticData
+from scoring import yardageScoring
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn")
+    plays, weekly, roster = syntheticData.generateSeason(2024, weeks=4, playsPerGame=40)
+    plays = inputCache.applyColumnTypes(plays, liveScoring.PLAY_COLUMNS)
+    weekly = inputCache.applyColumnTypes(weekly, inputCache.unionColumns({'week': 'int8'}, yardageScoring.WEEKLY_COLUMNS))
+    if len(sys.argv) > 2 and sys.argv[2] == "1":
+        weekly.loc[weekly['week'] == 2, 'rushing_yards'] += 30
+    localStorage.storeRosterBulk(rosterIndex.rosterRecords(rosterIndex.rosterTable(roster)))
+    units = [(2024, week, plays[plays['week'] == week], weekly[weekly['week'] == week]) for week in range(1, 5)]
+
+    scored = []
+    changedUnits = scoreWeeks.changedUnits
+    def recordChanged(*args):
+        for unit in changedUnits(*args):
+            scored.append(unit[1])
+            yield unit
+    scoreWeeks.changedUnits = recordChanged
+    scoreWeeks.scoreUnits(units, int(sys.argv[1]))
+    localStorage.exportJson("export")
+    with open("scored.json", 'w') as f:
+        json.dump(scored, f)
+"""
+
+def scoreSeason(directory, backend, jobs, changed=False):
+    """(weeks rescored, every file of the exported store as path -> bytes)"""
+    os.makedirs(directory, exist_ok=True)
+    env = dict(os.environ, FF_STORAGE=backend, PYTHONPATH=REPO_DIR)
+    subprocess.run([sys.executable, "-c", SCORE_SEASON, str(jobs), "1" if changed else "0"], cwd=directory,
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+    with open(os.path.join(directory, "scored.json")) as f:
+        scored = json.load(f)
+    exported = os.path.join(directory, "export")
+    files = {}
+    for root, _, names in os.walk(exported):
+        for name in names:
+            with open(os.path.join(root, name), 'rb') as f:
+                files[os.path.relpath(os.path.join(root, name), exported)] = f.read()
+    return scored, files
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_parallel_scoring_matches_serial(tmp_path, backend):
+    _, serial = scoreSeason(str(tmp_path / "serial"), backend, 1)
+    _, parallel = scoreSeason(str(tmp_path / "parallel"), backend, 3)
+    assert sorted(serial) == sorted(parallel) == ["roster.json"] + [os.path.join("weeks", "2024", f"{week}.json")
+                                                                     for week in range(1, 5)]
+    # players made it into the weeks, scored against the roster the workers were handed
+    assert b'"passYards"' in serial[os.path.join("weeks", "2024", "1.json")]
+    assert serial == parallel
+
+@pytest.mark.parametrize("backend, jobs", [("json", 1), ("sqlite", 1), ("json", 2)])
+def test_only_changed_weeks_are_rescored(tmp_path, backend, jobs):
+    directory = str(tmp_path / "store")
+    scored, first = scoreSeason(directory, backend, jobs)
+    assert scored == [1, 2, 3, 4]
+    assert scoreSeason(directory, backend, jobs) == ([], first)
+
+    scored, rescored = scoreSeason(directory, backend, jobs, changed=True)
+    assert scored == [2]
+    week2 = os.path.join("weeks", "2024", "2.json")
+    assert rescored[week2] != first[week2]
+    # the week was replaced, not added to: it matches scoring the changed input into an empty store
+    _, fresh = scoreSeason(str(tmp_path / "fresh"), backend, jobs, changed=True)
+    assert rescored == fresh
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import simulator
+
+def roundRobin(teams=4, rounds=2):
+    """Every team plays every other once a round, two games a week for four teams"""
+    weeks = [[(0, 1), (2, 3)], [(0, 2), (1, 3)], [(0, 3), (1, 2)]] * rounds
+    home = [[game[0] for game in week] for week in weeks]
+    away = [[game[1] for game in week] for week in weeks]
+    means = np.array([[110.0], [100.0], [95.0], [90.0]]).repeat(len(weeks), axis=1)
+    return simulator.League([f"team{i}" for i in range(teams)], means, np.full_like(means, 20.0), home, away,
+                            wins=[3, 2, 1, 0], pointsFor=[400, 380, 360, 300])
+
+def test_same_seed_gives_the_same_odds_whatever_the_jobs():
+    league = roundRobin()
+    serial = simulator.simulate(league, sims=3000, playoffTeams=2, seed=7, jobs=1, chunkSize=1000)
+    parallel = simulator.simulate(league, sims=3000, playoffTeams=2, seed=7, jobs=2, chunkSize=1000)
+    assert serial == parallel
+
+def test_odds_add_up():
+    league = roundRobin()
+    odds = simulator.simulate(league, sims=2000, playoffTeams=2, seed=1, chunkSize=700)
+    assert sum(entry["playoffOdds"] for entry in odds) == pytest.approx(2)
+    for entry in odds:
+        assert sum(entry["seedOdds"]) == pytest.approx(1)
+    # twelve more games are played on top of the six wins so far
+    assert sum(entry["projectedWins"] for entry in odds) == pytest.approx(6 + 12)
+    assert odds[0]["team"] == "team0"
+
+def test_no_remaining_weeks_seeds_by_the_standings():
+    league = simulator.League(["a", "b", "c"], np.zeros((3, 0)), np.zeros((3, 0)), [], [],
+                              wins=[1, 2, 2], pointsFor=[300, 250, 280])
+    odds = {entry["team"]: entry for entry in simulator.simulate(league, sims=100, playoffTeams=2, seed=0)}
+    # c is seeded ahead of b on points with the same record
+    assert [odds[team]["seedOdds"] for team in "cba"] == [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+    assert [odds[team]["playoffOdds"] for team in "cba"] == [1, 1, 0]
+    assert [odds[team]["projectedWins"] for team in "cba"] == [2, 2, 1]
+    assert [odds[team]["projectedPointsFor"] for team in "cba"] == [280, 250, 300]
@@ -0,0 +1,68 @@
+import os
+import pytest
+from snapshotFile import Snapshot, SnapshotError, writeSnapshot
+
+FIELDS = ["points", "passYards", "rushTds"]
+PLAYERS = {"00-0000003": (12, 250, 0), "00-0000001": (-2, 0, 0), "00-0000002": (30, 0, 3)}
+ROSTER = {"00-0000001": {"name": "A", "position": "QB"}, "00-0000002": {"name": "Bé", "position": "RB"}}
+
+def readAll(path):
+    """Every section's records and the metadata of a snapshot file"""
+    with Snapshot(path) as snapshot:
+        return snapshot.meta, {name: dict(snapshot.section(name).items()) for name in snapshot.sectionHeaders}
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "week.snap")
+    writeSnapshot(path, {"players": (PLAYERS, FIELDS), "roster": (ROSTER, None), "defense": ({}, FIELDS)},
+                  meta={"fingerprint": "abc"})
+    return path
+
+def test_round_trip(path):
+    meta, sections = readAll(path)
+    assert meta == {"fingerprint": "abc"}
+    assert sections == {"players": PLAYERS, "roster": ROSTER, "defense": {}}
+    assert os.listdir(os.path.dirname(path)) == ["week.snap"]
+
+def test_lookups_decode_single_records(path):
+    with Snapshot(path) as snapshot:
+        players = snapshot.section("players")
+        assert len(players) == 3
+        assert players.get("00-0000002") == (30, 0, 3)
+        assert players.get("00-0000009") is None
+        assert "00-0000001" in players and "00-0000000" not in players
+        assert players.keys() == sorted(PLAYERS)
+        # once the keys are decoded lookups bisect them instead
+        assert players.get("00-0000003") == (12, 250, 0)
+        assert snapshot.section("roster").get("00-0000002") == {"name": "Bé", "position": "RB"}
+        assert snapshot.section("missing") is None
+
+def test_empty_sections_and_files(tmp_path):
+    path = str(tmp_path / "empty.snap")
+    writeSnapshot(path, {"players": ({}, FIELDS), "roster": ({}, None)})
+    assert readAll(path) == ({}, {"players": {}, "roster": {}})
+    with Snapshot(path) as snapshot:
+        assert snapshot.section("players").get("00-0000001") is None
+        assert "x" not in snapshot.section("roster")
+
+def test_truncated_files_raise(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    cut = path + ".cut"
+    for length in range(len(data)):
+        with open(cut, 'wb') as f:
+            f.write(data[:length])
+        with pytest.raises(SnapshotError):
+            readAll(cut)
+
+def test_other_files_raise(tmp_path):
+    path = str(tmp_path / "roster.json")
+    with open(path, 'w') as f:
+        f.write('{"00-0000001": {"name": "A"}}')
+    with pytest.raises(SnapshotError):
+        Snapshot(path)
+
+def test_rewrites_replace_the_file(path):
+    writeSnapshot(path, {"players": ({"00-0000001": (1, 2, 3)}, FIELDS)})
+    assert readAll(path) == ({}, {"players": {"00-0000001": (1, 2, 3)}})
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".tmp")]
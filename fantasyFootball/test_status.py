@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PLAYERS = {
+    "00-0000001": {"roster": {"name": "A", "position": "QB"},
+                   "scoring": {"2023": {"1": {"points": 10}, "2": {"points": 4}}, "2024": {"1": {"points": 7}}}},
+    "00-0000002": {"roster": {"name": "B", "position": "RB"}, "scoring": {"2023": {"1": {"points": 3}}}}
+}
+DEFENSE = {"KC": {"2023": {"1": {"points": 9}}}}
+
+def status(directory, backend):
+    env = dict(os.environ, FF_STORAGE=backend, PYTHONPATH=REPO_DIR)
+    return subprocess.run([sys.executable, os.path.join(REPO_DIR, "status.py")], cwd=directory, env=env, check=True,
+                          capture_output=True, text=True).stdout.splitlines()
+
+@pytest.fixture
+def singleFiles(tmp_path):
+    os.makedirs(tmp_path / "local_data")
+    for name, data in (("players.json", PLAYERS), ("defense.json", DEFENSE)):
+        with open(tmp_path / "local_data" / name, 'w') as f:
+            json.dump(data, f)
+    return str(tmp_path)
+
+def test_single_file_layout_is_counted(singleFiles):
+    lines = status(singleFiles, "json")
+    assert "no scored weeks" not in lines
+    assert any(line.startswith("single-file layout") for line in lines)
+    assert "2023: 2 weeks, 3 player weeks, 1 defense weeks, 0 with input fingerprints" in lines
+    assert "2024: 1 weeks, 1 player weeks, 0 defense weeks, 0 with input fingerprints" in lines
+    # status only reads, the layout is left as it was
+    assert sorted(os.listdir(os.path.join(singleFiles, "local_data"))) == ["defense.json", "players.json"]
+
+def test_unmigrated_sqlite_store_points_at_the_file(singleFiles):
+    lines = status(singleFiles, "sqlite")
+    assert any("hasn't been migrated" in line for line in lines)
+
+def test_empty_store(tmp_path):
+    assert "no scored weeks" in status(str(tmp_path), "json")
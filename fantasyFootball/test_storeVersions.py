@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+import storeVersions
+from storeVersions import WriterLocked
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# takes the writer lock of the store in argv[1], says so and holds it until its stdin closes
+HOLD_WRITER = """
+import sys
+import storeVersions
+storeVersions.acquireWriter(sys.argv[1])
+print("locked", flush=True)
+sys.stdin.read()
+"""
+
+@pytest.fixture
+def dataDir(tmp_path):
+    os.makedirs(tmp_path / "weeks" / "2024")
+    with open(tmp_path / "roster.v1.snap", 'w') as f:
+        f.write("roster")
+    return str(tmp_path)
+
+def publishWeek(dataDir, version):
+    """Publish a version with its own file for week 1 and the shared roster, then collect garbage like a save"""
+    path = os.path.join("weeks", "2024", f"1.v{version}.snap")
+    with open(os.path.join(dataDir, path), 'w') as f:
+        f.write(f"week 1 as of {version}")
+    storeVersions.publish(dataDir, {"version": version, "roster": "roster.v1.snap", "weeks": {"2024/1": path}})
+    storeVersions.collectGarbage(dataDir)
+
+def weekFiles(dataDir):
+    return sorted(os.listdir(os.path.join(dataDir, "weeks", "2024")))
+
+def test_second_writer_is_locked_out(dataDir, monkeypatch):
+    # this process may be the writer of another store from an earlier test
+    monkeypatch.setattr(storeVersions, "writerLock", None)
+    holder = subprocess.Popen([sys.executable, "-c", HOLD_WRITER, dataDir], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True, env=dict(os.environ, PYTHONPATH=REPO_DIR))
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        with pytest.raises(WriterLocked, match=f"pid {holder.pid}"):
+            storeVersions.acquireWriter(dataDir)
+        assert storeVersions.writerLock is None
+    finally:
+        holder.communicate("")
+
+    # the lock went away with the process holding it
+    storeVersions.acquireWriter(dataDir)
+    try:
+        assert storeVersions.writerLock is not None
+    finally:
+        storeVersions.releaseWriter()
+
+def test_pinned_version_survives_garbage_collection(dataDir):
+    publishWeek(dataDir, 1)
+    storeVersions.pin(dataDir, 1)
+    try:
+        for version in range(2, 6):
+            publishWeek(dataDir, version)
+        # the pinned version and the last KEEP_VERSIONS are kept, version 2 is in neither
+        assert weekFiles(dataDir) == ["1.v1.snap", "1.v3.snap", "1.v4.snap", "1.v5.snap"]
+        assert sorted(os.listdir(os.path.join(dataDir, "versions"))) == ["1.json", "3.json", "4.json", "5.json"]
+        assert storeVersions.readManifest(dataDir, 1)["weeks"] == {"2024/1": os.path.join("weeks", "2024", "1.v1.snap")}
+    finally:
+        storeVersions.unpin(dataDir)
+
+    storeVersions.collectGarbage(dataDir)
+    assert weekFiles(dataDir) == ["1.v3.snap", "1.v4.snap", "1.v5.snap"]
+    assert os.path.exists(os.path.join(dataDir, "roster.v1.snap"))
+
+def test_pins_of_dead_readers_are_cleared(dataDir):
+    reader = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    os.makedirs(os.path.join(dataDir, "readers"))
+    with open(os.path.join(dataDir, "readers", f"{int(reader.stdout)}.json"), 'w') as f:
+        json.dump({"version": 1}, f)
+    for version in range(1, 6):
+        publishWeek(dataDir, version)
+    assert weekFiles(dataDir) == ["1.v3.snap", "1.v4.snap", "1.v5.snap"]
+    assert os.listdir(os.path.join(dataDir, "readers")) == []
@@ -0,0 +1,73 @@
+import argparse
+from typing import List
+import numpy as np
+import pandas as pd
+import inputCache
+import rosterIndex
+import scoringRules
+from scoring import yardageScoring, tdScoring, fgScoring, dstScoring
+from localStorage import getPlayerRoster, getRoster
+
+# everything scoring reads, loaded once for all rule sets
+PLAY_COLUMNS = inputCache.unionColumns(
+    {'week': 'int8', 'touchdown': 'int8'}, tdScoring.PLAY_COLUMNS, fgScoring.PLAY_COLUMNS, dstScoring.PLAY_COLUMNS
+)
+WEEKLY_COLUMNS = inputCache.unionColumns({'week': 'int8'}, yardageScoring.WEEKLY_COLUMNS)
+
+def weekPoints(weekPlays, weekPlayers, rulesets: List[scoringRules.ScoringRules], positions=None) -> pd.DataFrame:
+    """Points of every player and defense in one week under each rule set (one column per set).
+    Filtering, roster lookups and defensive event counting are done once and shared by all of them"""
+    touchdownRows = weekPlays[weekPlays['touchdown'] == 1]
+    if positions is None:
+        positions = rosterIndex.positionIndex(getRoster())['position']
+    kickRows = weekPlays[(weekPlays['field_goal_result'] == 'made') | (weekPlays['extra_point_result'] == 'good')]
+    defenseTotals = dstScoring.aggregateDefense(weekPlays).droplevel('week')
+    playerIds = weekPlayers['player_id'].astype(object).to_numpy()
+
+    columns = {}
+    for rules in rulesets:
+        players = pd.concat([
+            pd.Series(yardageScoring.yardageColumns(weekPlayers, rules)[0], index=playerIds),
+            tdScoring.touchdownCredits(touchdownRows, positions, rules)['points'],
+            fgScoring.kickCredits(kickRows, rules)['points']
+        ])
+        players = players[players.index.notna()].groupby(level=0, sort=False).sum()
+        defense = pd.Series({team: data["points"]
+                             for team, data in dstScoring.defenseRecords(defenseTotals, rules=rules).items()}, dtype=np.int64)
+        columns[rules.name] = pd.concat([players, defense])
+    return pd.DataFrame(columns).fillna(0).astype(np.int64).rename_axis('id')
+
+def scoreWhatIf(year: int, weeks: List[int], rulesets: List[scoringRules.ScoringRules]) -> pd.DataFrame:
+    """Per-week points for a season under several rule sets, indexed by (week, id), without touching the store"""
+    plays = inputCache.loadSource("pbp", year, PLAY_COLUMNS)
+    players = inputCache.loadSource("weekly", year, WEEKLY_COLUMNS)
+    playsByWeek = dict(tuple(plays.groupby('week')))
+    playersByWeek = dict(tuple(players.groupby('week')))
+    positions = rosterIndex.positionIndex(getRoster())['position']
+
+    frames = {}
+    for week in weeks:
+        if week in playsByWeek or week in playersByWeek:
+            frames[week] = weekPoints(playsByWeek.get(week, plays.iloc[0:0]), playersByWeek.get(week, players.iloc[0:0]),
+                                      rulesets, positions)
+    return pd.concat(frames, names=['week']).fillna(0).astype(np.int64)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare season totals under the league rules and other rule sets")
+    parser.add_argument("year", type=int)
+    parser.add_argument("weeks", type=int, nargs="+")
+    parser.add_argument("--rules", nargs="+", default=[], help="TOML rules files to compare with the league defaults")
+    parser.add_argument("--top", type=int, default=25, help="how many leaders to print")
+    parser.add_argument("--csv", help="also write the per-week points of every rule set here")
+    args = parser.parse_args()
+
+    rulesets = [scoringRules.DEFAULT] + [scoringRules.loadRules(path) for path in args.rules]
+    points = scoreWhatIf(args.year, args.weeks, rulesets)
+    if args.csv:
+        points.to_csv(args.csv)
+
+    totals = points.groupby(level='id').sum().sort_values(rulesets[0].name, ascending=False)
+    for rules in rulesets[1:]:
+        totals[rules.name + " rank"] = totals[rules.name].rank(ascending=False, method='min').astype(int)
+    totals.insert(0, "name", [getPlayerRoster(playerId).get("name", playerId) for playerId in totals.index])
+    print(totals.head(args.top).to_string())